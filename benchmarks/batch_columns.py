@@ -0,0 +1,80 @@
+"""
+Compares encoding many messages given as parallel columns through
+`BatchJsonRequest` objects against encoding the columns directly.
+
+Only the batch body preparation is measured, no requests are sent.
+"""
+
+import json
+import timeit
+from typing import Any, List
+
+from qstash.message import (
+    DEFAULT_BATCH_CHUNK_SIZE,
+    BatchJsonRequest,
+    convert_to_batch_messages,
+    prepare_batch_columns_bodies,
+    prepare_batch_message_body,
+)
+
+N = 10_000
+
+URLS = [f"https://example.com/{i % 10}" for i in range(N)]
+BODIES = [{"event": "page_view", "user": i, "score": i * 0.5} for i in range(N)]
+DEDUPLICATION_IDS = [f"event-{i}" for i in range(N)]
+DELAYS = [i % 60 for i in range(N)]
+
+
+def with_requests() -> List[str]:
+    requests = [
+        BatchJsonRequest(
+            url=URLS[i],
+            body=BODIES[i],
+            deduplication_id=DEDUPLICATION_IDS[i],
+            delay=DELAYS[i],
+            retries=3,
+        )
+        for i in range(N)
+    ]
+
+    messages = convert_to_batch_messages(requests)
+    return [
+        prepare_batch_message_body(messages[i : i + DEFAULT_BATCH_CHUNK_SIZE])
+        for i in range(0, N, DEFAULT_BATCH_CHUNK_SIZE)
+    ]
+
+
+def with_columns() -> List[str]:
+    return list(
+        prepare_batch_columns_bodies(
+            urls=URLS,
+            bodies=BODIES,
+            deduplication_ids=DEDUPLICATION_IDS,
+            delays=DELAYS,
+            not_befores=None,
+            spread_over=None,
+            spread_profile=None,
+            defaults={"retries": 3},
+            chunk_size=DEFAULT_BATCH_CHUNK_SIZE,
+            json_bodies=True,
+        )
+    )
+
+
+def decode(bodies: List[str]) -> List[Any]:
+    return [json.loads(body) for body in bodies]
+
+
+def main() -> None:
+    assert decode(with_requests()) == decode(with_columns())
+
+    for name, fn in [
+        ("requests", with_requests),
+        ("columns", with_columns),
+    ]:
+        elapsed = min(timeit.repeat(fn, number=1, repeat=5))
+        print(f"{name:>8}: {elapsed * 1e3:.2f} ms for {N} messages")
+
+
+if __name__ == "__main__":
+    main()
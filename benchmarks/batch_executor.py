@@ -0,0 +1,65 @@
+"""
+Measures how the preparation of a large batch scales with the number
+of worker processes it is prepared on.
+
+Only the request body preparation is measured, no requests are sent.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from qstash.message import BatchJsonRequest, prepare_batch_request_body
+
+N = 200_000
+
+
+def main() -> None:
+    messages = [
+        BatchJsonRequest(
+            url="https://example.com",
+            body={"id": i, "user": f"user-{i}", "tags": ["a", "b", "c"]},
+            headers={"X-Tenant": "tenant-1"},
+            retries=3,
+            label="benchmark",
+        )
+        for i in range(N)
+    ]
+
+    start = time.perf_counter()
+    prepare_batch_request_body(
+        messages,
+        None,
+        json_bodies=True,
+        auto_deduplication_id=False,
+        collapse=False,
+    )
+    baseline = time.perf_counter() - start
+    print(f"   inline: {N / baseline:>9,.0f} messages/s")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ProcessPoolExecutor(workers) as executor:
+            # Warm up the worker processes
+            list(executor.map(abs, range(workers)))
+
+            start = time.perf_counter()
+            prepare_batch_request_body(
+                messages,
+                None,
+                json_bodies=True,
+                auto_deduplication_id=False,
+                collapse=False,
+                executor=executor,
+            )
+            elapsed = time.perf_counter() - start
+
+        print(
+            f"{workers:>3} procs: {N / elapsed:>9,.0f} messages/s"
+            f" ({baseline / elapsed:.2f}x)"
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
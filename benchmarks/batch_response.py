@@ -0,0 +1,43 @@
+"""
+Compares the memory retained by the parsed results of a large batch,
+with and without the compact result mode.
+"""
+
+import json
+import tracemalloc
+from typing import Any, Callable
+
+from qstash.message import parse_batch_response, parse_compact_batch_response
+
+N = 100_000
+
+
+def measure(parse: Callable[[Any], Any], raw_response: str) -> int:
+    tracemalloc.start()
+
+    response = json.loads(raw_response)
+    result = parse(response)
+    del response
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del result
+    return size
+
+
+def main() -> None:
+    raw_response = json.dumps(
+        [{"messageId": f"msg_2XhJnA6wa8ZPcUZzyTKTYM3b6PXbCK{i:08d}"} for i in range(N)]
+    )
+
+    for name, parse in [
+        ("objects", parse_batch_response),
+        ("compact", parse_compact_batch_response),
+    ]:
+        size = measure(parse, raw_response)
+        print(f"{name:>7}: {size / N:.1f} bytes/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Measures the throughput of publishing large bodies, and the number of
+bytes sent to QStash for them, with and without a claim check.
+
+Requests are answered by a mock transport, nothing is sent to QStash.
+The bodies are offloaded to a local file system blob store.
+"""
+
+import os
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+
+from qstash import QStash
+from qstash.claim_check import ClaimCheck, FileSystemBlobStore
+
+N = 200
+BODY_SIZE = 1024 * 1024
+
+
+def run(claim_check: Optional[ClaimCheck]) -> None:
+    sent = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal sent
+        sent += len(request.content)
+        return httpx.Response(200, json={"messageId": "msg"})
+
+    client = QStash("token", claim_check=claim_check)
+    client.http._client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    # Distinct bodies, so that the blob store writes each of them.
+    bodies = [os.urandom(8).hex() + "a" * BODY_SIZE for _ in range(N)]
+
+    start = time.perf_counter()
+    for body in bodies:
+        client.message.publish(url="https://example.com", body=body)
+    elapsed = time.perf_counter() - start
+
+    name = "claim check" if claim_check is not None else "inline"
+    print(f"{name:>12}: {N / elapsed:.1f} messages/s, {sent / N:.0f} bytes/message")
+
+
+def main() -> None:
+    run(None)
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(ClaimCheck(FileSystemBlobStore(directory)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares the memory retained by a large page of parsed log events,
+with the slotted models against the same models backed by a ``__dict__``.
+"""
+
+import dataclasses
+import json
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from qstash.log import Log, parse_logs_response
+
+N = 100_000
+
+DictLog = dataclasses.make_dataclass(
+    "DictLog", [(f.name, f.type) for f in dataclasses.fields(Log)]
+)
+
+
+def parse_dict_logs(response: List[Dict[str, Any]]) -> List[Any]:
+    return [DictLog(**dataclasses.asdict(log)) for log in parse_logs_response(response)]
+
+
+def measure(parse: Callable[[Any], Any], raw_response: str) -> int:
+    response = json.loads(raw_response)
+
+    tracemalloc.start()
+    result = parse(response)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del result
+    return size
+
+
+def main() -> None:
+    raw_response = json.dumps(
+        [
+            {
+                "time": 1700000000000 + i,
+                "messageId": f"msg_{i:08d}",
+                "state": "DELIVERED",
+                "url": "https://example.com",
+            }
+            for i in range(N)
+        ]
+    )
+
+    for name, parse in [
+        ("dict", parse_dict_logs),
+        ("slots", parse_logs_response),
+    ]:
+        size = measure(parse, raw_response)
+        print(f"{name:>5}: {size / N:.1f} bytes/event")
+
+
+if __name__ == "__main__":
+    main()
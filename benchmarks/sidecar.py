@@ -0,0 +1,57 @@
+"""
+Measures the latency of handing messages over to a sidecar publisher,
+and the number of requests it sends to QStash for them.
+
+Requests are answered by a mock transport, nothing is sent to QStash.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import httpx
+
+from qstash import QStash
+from qstash.message import BatchRequest
+from qstash.sidecar import SidecarPublisher, SidecarServer
+
+N = 20_000
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    messages = json.loads(request.content)
+    return httpx.Response(200, json=[{"messageId": "msg"} for _ in messages])
+
+
+def main() -> None:
+    client = QStash("token")
+    client.http._client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    path = os.path.join(tempfile.mkdtemp(), "qstash.sock")
+    server = SidecarServer(client, path)
+    server.start()
+
+    publisher = SidecarPublisher(path)
+    message = BatchRequest(url="https://example.com", body="hello")
+
+    latencies = []
+    for _ in range(N):
+        start = time.perf_counter()
+        publisher.publish(message)
+        latencies.append(time.perf_counter() - start)
+
+    publisher.close()
+    while server.sent_count < N:
+        time.sleep(0.01)
+
+    server.close()
+
+    latencies.sort()
+    print(f"    p50: {latencies[N // 2] * 1e6:.1f} us/message")
+    print(f"    p99: {latencies[N * 99 // 100] * 1e6:.1f} us/message")
+    print(f"requests: {server.request_count} for {N} messages")
+
+
+if __name__ == "__main__":
+    main()
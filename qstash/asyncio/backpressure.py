@@ -0,0 +1,200 @@
+import asyncio
+from typing import Any, List, Optional, Union
+
+from qstash.asyncio.client import AsyncQStash
+from qstash.backpressure import (
+    DEFAULT_HIGH_WATERMARK,
+    DEFAULT_POLL_INTERVAL,
+    BackpressureState,
+)
+from qstash.errors import QStashError
+from qstash.message import (
+    BatchJsonRequest,
+    BatchRequest,
+    BatchResponse,
+    BatchUrlGroupResponse,
+)
+
+
+class AsyncBackpressureEnqueuer:
+    """
+    Enqueues messages on a queue, suspending the producers while the
+    backlog of the queue is above the watermarks.
+
+    The backlog is the larger of the `lag` of the queue and the
+    `wait_list_size` of the flow control key, if given. They are polled
+    in a background task, started on the first enqueue, and the messages
+    enqueued between the polls are added to the last polled backlog, so
+    that a fast producer does not overshoot the high watermark by a whole
+    poll interval.
+    """
+
+    def __init__(
+        self,
+        client: AsyncQStash,
+        queue: str,
+        *,
+        flow_control_key: Optional[str] = None,
+        high_watermark: int = DEFAULT_HIGH_WATERMARK,
+        low_watermark: Optional[int] = None,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        :param client: Client used to poll the backlog and enqueue the messages.
+        :param queue: Name of the queue to enqueue the messages on.
+        :param flow_control_key: Flow control key of the messages, whose wait
+            list is counted in the backlog.
+        :param high_watermark: Backlog at which the producers start waiting.
+        :param low_watermark: Backlog at which the waiting producers resume.
+            Half of the high watermark by default.
+        :param poll_interval: Number of seconds between the polls of the backlog.
+        :param timeout: Maximum number of seconds a producer waits, before
+            `QStashError` is raised. Waits indefinitely by default.
+        """
+        self._client = client
+        self._flow_control_key = flow_control_key
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+
+        self._state = BackpressureState(high_watermark, low_watermark)
+        self._condition: Optional[asyncio.Condition] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+        self.queue = queue
+        """Name of the queue the messages are enqueued on."""
+
+        self.last_error: Optional[Exception] = None
+        """Error of the last poll, if it failed."""
+
+    @property
+    def backlog(self) -> int:
+        """
+        Estimated backlog, including the messages enqueued since the last poll.
+        """
+        return self._state.estimate
+
+    @property
+    def paused(self) -> bool:
+        """Whether the producers are waiting for the backlog to drain."""
+        return self._state.paused
+
+    async def poll(self) -> int:
+        """Polls the backlog from QStash, and returns it."""
+        backlog = (await self._client.queue.get(self.queue)).lag
+        if self._flow_control_key is not None:
+            info = await self._client.flow_control.get(self._flow_control_key)
+            backlog = max(backlog, info.wait_list_size)
+
+        self._state.update(backlog)
+        if self._condition is not None:
+            async with self._condition:
+                self._condition.notify_all()
+
+        return backlog
+
+    async def wait(self) -> None:
+        """
+        Waits until the backlog is below the watermarks.
+
+        Raises `QStashError` if it is not, in `timeout` seconds.
+        """
+        await self.start()
+
+        condition = self._condition
+        assert condition is not None
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: not self._state.paused),
+                    self._timeout,
+                )
+            except asyncio.TimeoutError:
+                raise QStashError(
+                    f"Timed out waiting for the backlog of the queue {self.queue} "
+                    f"to drop to {self._state.low_watermark}, "
+                    f"it is {self._state.estimate}."
+                )
+
+    async def enqueue(
+        self, message: BatchRequest
+    ) -> Union[BatchResponse, List[BatchUrlGroupResponse]]:
+        """Waits for the backlog, and enqueues the message."""
+        return (await self.batch([message]))[0]
+
+    async def enqueue_json(
+        self, message: BatchJsonRequest
+    ) -> Union[BatchResponse, List[BatchUrlGroupResponse]]:
+        """
+        Waits for the backlog, and enqueues the message, after serializing
+        its body as JSON string.
+        """
+        return (await self.batch_json([message]))[0]
+
+    async def batch(
+        self, messages: List[BatchRequest]
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """Waits for the backlog, and enqueues the messages in a single request."""
+        await self.wait()
+        res = await self._client.message.batch(
+            [{**message, "queue": self.queue} for message in messages]
+        )
+        self._state.add(len(messages))
+        return res
+
+    async def batch_json(
+        self, messages: List[BatchJsonRequest]
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """
+        Waits for the backlog, and enqueues the messages in a single request,
+        after serializing their bodies as JSON strings.
+        """
+        await self.wait()
+        res = await self._client.message.batch_json(
+            [{**message, "queue": self.queue} for message in messages]
+        )
+        self._state.add(len(messages))
+        return res
+
+    async def start(self) -> None:
+        """Polls the backlog, and starts polling it in the background."""
+        if self._task is not None:
+            return
+
+        # Created on the running loop, as the conditions are bound to
+        # the loop they are first used on.
+        self._condition = asyncio.Condition()
+        self._task = asyncio.ensure_future(self._poll_forever())
+        await self.poll()
+
+    async def close(self) -> None:
+        """Stops polling the backlog."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    async def __aenter__(self) -> "AsyncBackpressureEnqueuer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def _poll_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                # The last polled backlog is kept until a poll succeeds.
+                self.last_error = e
+                continue
+
+            self.last_error = None
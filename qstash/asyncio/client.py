@@ -1,5 +1,5 @@
 from os import environ
-from typing import Literal, Optional, Union
+from typing import Any, Literal, Optional, Union
 
 from qstash.asyncio.dlq import AsyncDlqApi
 from qstash.asyncio.flow_control import AsyncFlowControlApi
@@ -10,7 +10,11 @@ from qstash.asyncio.queue import AsyncQueueApi
 from qstash.asyncio.schedule import AsyncScheduleApi
 from qstash.asyncio.signing_key import AsyncSigningKeyApi
 from qstash.asyncio.url_group import AsyncUrlGroupApi
+from qstash.cache import LruCache
+from qstash.claim_check import ClaimCheck
 from qstash.http import RetryConfig
+from qstash.message import Message
+from qstash.rate_limit import FileRateLimiter
 
 
 class AsyncQStash:
@@ -20,17 +24,49 @@ class AsyncQStash:
         *,
         retry: Optional[Union[Literal[False], RetryConfig]] = None,
         base_url: Optional[str] = None,
+        publish_cache: Optional[LruCache[str, Any]] = None,
+        rate_limiter: Optional[FileRateLimiter] = None,
+        claim_check: Optional[ClaimCheck] = None,
+        bulk_concurrency: Optional[int] = None,
+        message_cache: Optional[LruCache[str, Message]] = None,
     ) -> None:
         """
         :param token: The authorization token from the Upstash console.
         :param retry: Configures how the client should retry requests.
+        :param publish_cache: Cache of the publish and enqueue responses, which
+            must have a `ttl`. When given, publishing a message with the same
+            destination, headers, and body as a cached one, inside the `ttl`,
+            returns a copy of the cached response without sending a request,
+            and the repeated messages of a batch are sent once.
+        :param rate_limiter: Burst rate limiter shared with the other processes
+            using the same token, that delays the requests when the burst
+            budget is exhausted.
+        :param claim_check: Offloads the bodies larger than its threshold
+            to a blob store, and publishes references to them instead.
+            It is used by the publish and enqueue methods, the message
+            templates, and `publish_many` and `enqueue_many`. Bodies of
+            the batch requests are not offloaded.
+        :param bulk_concurrency: Maximum number of bulk requests, which are
+            the batches and the log and DLQ listings, sent at the same time.
+            When given, they wait for each other instead of taking up the
+            connection pool, and the interactive requests, such as publishes,
+            get ahead of them. Not limited by default.
+        :param message_cache: Cache of the messages got by their ids, which
+            must have a `ttl`. When given, getting a cached message returns
+            a copy of it without sending a request, and cancelling a message
+            evicts it from the cache. The messages delivered, failed, or
+            cancelled elsewhere are returned until their entries expire.
         """
         self.http = AsyncHttpClient(
             token,
             retry,
             base_url or environ.get("QSTASH_URL"),
+            rate_limiter,
+            bulk_concurrency,
+        )
+        self.message = AsyncMessageApi(
+            self.http, publish_cache, claim_check, message_cache
         )
-        self.message = AsyncMessageApi(self.http)
         """Message api."""
 
         self.url_group = AsyncUrlGroupApi(self.http)
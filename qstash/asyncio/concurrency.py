@@ -0,0 +1,81 @@
+import asyncio
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from qstash.errors import QStashError
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def map_concurrently(
+    fn: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    concurrency: int,
+) -> List[Union[R, Exception]]:
+    """
+    Awaits `fn` for each item, running at most `concurrency` of them
+    at the same time.
+
+    Results are returned in the order of the items. Exceptions raised
+    for an item are returned in its place, instead of being raised.
+    """
+    if concurrency < 1:
+        raise QStashError("'concurrency' must be at least 1.")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(item: T) -> Union[R, Exception]:
+        async with semaphore:
+            try:
+                return await fn(item)
+            except Exception as e:
+                return e
+
+    return list(await asyncio.gather(*(call(item) for item in items)))
+
+
+async def hedge(
+    fn: Callable[[], Awaitable[R]],
+    delay: float,
+) -> Tuple[R, Optional["asyncio.Future[R]"]]:
+    """
+    Awaits `fn`, and calls it once more if the first call does not
+    complete in `delay` seconds.
+
+    Returns the result of the call that succeeds first, along with the
+    future of the other call, if it was made. The other call is left
+    running in the background. If both calls fail, the error of the
+    first one is raised.
+    """
+    first = asyncio.ensure_future(fn())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result(), None
+
+    second = asyncio.ensure_future(fn())
+    pending = {first, second}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future, other in ((first, second), (second, first)):
+            if future in done and future.exception() is None:
+                # The error of the other call is retrieved to not get it
+                # reported as never retrieved, in case nobody awaits it.
+                other.add_done_callback(retrieve_exception)
+                return future.result(), other
+
+    return first.result(), second
+
+
+def retrieve_exception(future: "asyncio.Future[Any]") -> None:
+    if not future.cancelled():
+        future.exception()
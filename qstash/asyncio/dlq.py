@@ -52,6 +52,7 @@ class AsyncDlqApi:
         response = await self._http.request(
             path="/v2/dlq",
             method="GET",
+            lane="bulk",
             params=params,
         )
 
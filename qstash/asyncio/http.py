@@ -1,18 +1,93 @@
 import asyncio
-from typing import Any, Dict, Literal, Optional, Union
+from typing import (
+    IO,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Literal,
+    Optional,
+    Union,
+    cast,
+)
 
 import httpx
 
+from qstash.rate_limit import FileRateLimiter
 from qstash.http import (
     BASE_URL,
+    BODY_CHUNK_SIZE,
     DEFAULT_RETRY,
     NO_RETRY,
     HttpMethod,
+    RequestBody,
+    Lane,
     RetryConfig,
+    check_bulk_concurrency,
+    file_position,
+    is_replayable,
+    iter_buffer,
+    prepare_body_headers,
     raise_for_non_ok_status,
     DEFAULT_TIMEOUT,
 )
 
+AsyncRequestBody = Union[RequestBody, AsyncIterable[bytes]]
+"""
+Body of a request.
+
+Buffers are sent without being copied as a whole, and file objects and
+sync or async byte iterators are streamed.
+"""
+
+
+async def aiter_file(file: IO[bytes]) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    while True:
+        # Read in the default executor not to block the event loop
+        chunk = await loop.run_in_executor(None, file.read, BODY_CHUNK_SIZE)
+        if not chunk:
+            return
+
+        yield chunk
+
+
+async def aiter_sync(iterable: Iterable[bytes]) -> AsyncIterator[bytes]:
+    for chunk in iterable:
+        yield chunk
+
+
+def async_request_content(
+    body: Optional[AsyncRequestBody],
+) -> Optional[Union[str, bytes, AsyncIterable[bytes]]]:
+    if body is None or isinstance(body, (str, bytes)):
+        return body
+
+    if isinstance(body, (bytearray, memoryview)):
+        return aiter_sync(iter_buffer(body))
+
+    if hasattr(body, "__aiter__"):
+        return cast(AsyncIterable[bytes], body)
+
+    if hasattr(body, "read"):
+        return aiter_file(cast(IO[bytes], body))
+
+    return aiter_sync(body)
+
+
+async def acquire_async(rate_limiter: FileRateLimiter) -> None:
+    """Waits without blocking the event loop until a request can be sent."""
+    loop = asyncio.get_running_loop()
+    while True:
+        # Wait for the file lock in the default executor not to block
+        # the event loop
+        delay = await loop.run_in_executor(None, rate_limiter.reserve)
+        if delay <= 0:
+            return
+
+        await asyncio.sleep(delay)
+
 
 class AsyncHttpClient:
     def __init__(
@@ -20,8 +95,19 @@ class AsyncHttpClient:
         token: str,
         retry: Optional[Union[Literal[False], RetryConfig]],
         base_url: Optional[str] = None,
+        rate_limiter: Optional[FileRateLimiter] = None,
+        bulk_concurrency: Optional[int] = None,
     ) -> None:
         self._token = f"Bearer {token}"
+        self._rate_limiter = rate_limiter
+        self._bulk_concurrency = (
+            check_bulk_concurrency(bulk_concurrency)
+            if bulk_concurrency is not None
+            else None
+        )
+        # Created on first use, as the semaphores are bound to the loop
+        # they are first used on.
+        self._bulk_lane: Optional[asyncio.Semaphore] = None
 
         if retry is None:
             self._retry = DEFAULT_RETRY
@@ -42,40 +128,73 @@ class AsyncHttpClient:
         path: str,
         method: HttpMethod,
         headers: Optional[Dict[str, str]] = None,
-        body: Optional[Union[str, bytes]] = None,
+        body: Optional[AsyncRequestBody] = None,
         params: Optional[Dict[str, str]] = None,
         parse_response: bool = True,
         base_url: Optional[str] = None,
         token: Optional[str] = None,
+        lane: Lane = "interactive",
     ) -> Any:
+        # Only the requests to QStash draw from its rate limit.
+        rate_limiter = self._rate_limiter if base_url is None else None
+        bulk_lane = self._get_bulk_lane() if lane == "bulk" else None
+
         base_url = base_url or self._base_url
         token = token or self._token
 
         url = base_url + path
-        headers = {"Authorization": token, **(headers or {})}
+        headers = prepare_body_headers(
+            {"Authorization": token, **(headers or {})}, body
+        )
+
+        # Streamed bodies can only be sent once, and file bodies
+        # must be rewound to their initial position before resending.
+        replayable = is_replayable(body)
+        position = file_position(body)
 
         max_attempts = 1 + max(0, self._retry["retries"])
         last_error = None
         response = None
         for attempt in range(max_attempts):
+            if attempt > 0 and position is not None:
+                cast(IO[bytes], body).seek(position)
+
+            if rate_limiter is not None:
+                await acquire_async(rate_limiter)
+
+            if bulk_lane is not None:
+                await bulk_lane.acquire()
+
             try:
                 response = await self._client.request(
                     method=method,
                     url=url,
                     params=params,
                     headers=headers,
-                    content=body,
+                    content=async_request_content(body),
                 )
                 break  # Break the loop as soon as we receive a proper response
             except Exception as e:
                 last_error = e
-                backoff = self._retry["backoff"](attempt) / 1000
-                await asyncio.sleep(backoff)
+                if not replayable:
+                    break
+            finally:
+                # The lane is not held during the backoff.
+                if bulk_lane is not None:
+                    bulk_lane.release()
+
+            backoff = self._retry["backoff"](attempt) / 1000
+            await asyncio.sleep(backoff)
 
         if not response:
             # Can't be None at this point
             raise last_error  # type:ignore[misc]
 
+        if rate_limiter is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, rate_limiter.update, response.status_code, response.headers
+            )
+
         raise_for_non_ok_status(response)
 
         if parse_response:
@@ -83,6 +202,15 @@ class AsyncHttpClient:
 
         return response.text
 
+    def _get_bulk_lane(self) -> Optional[asyncio.Semaphore]:
+        if self._bulk_concurrency is None:
+            return None
+
+        if self._bulk_lane is None:
+            self._bulk_lane = asyncio.Semaphore(self._bulk_concurrency)
+
+        return self._bulk_lane
+
     async def stream(
         self,
         *,
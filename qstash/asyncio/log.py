@@ -1,7 +1,10 @@
-from typing import Optional
+from typing import List, Optional
 
+from qstash.asyncio.concurrency import map_concurrently
 from qstash.asyncio.http import AsyncHttpClient
+from qstash.concurrency import DEFAULT_CONCURRENCY
 from qstash.log import (
+    LatestStates,
     LogFilter,
     ListLogsResponse,
     parse_logs_response,
@@ -37,6 +40,7 @@ class AsyncLogApi:
         response = await self._http.request(
             path="/v2/events",
             method="GET",
+            lane="bulk",
             params=params,
         )
 
@@ -46,3 +50,47 @@ class AsyncLogApi:
             cursor=response.get("cursor"),
             logs=logs,
         )
+
+    async def latest_states(
+        self,
+        message_ids: List[str],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> LatestStates:
+        """
+        Gets the latest states of the messages.
+
+        The message ids are queried in chunks, with at most `concurrency`
+        queries sent at the same time. Only the newest event of each message
+        is kept, so the memory use is bounded by the number of messages.
+
+        :param message_ids: Ids of the messages.
+        :param concurrency: Maximum number of events queries sent at the
+            same time.
+        """
+        states = LatestStates(message_ids)
+
+        async def query(chunk: List[str]) -> None:
+            cursor = None
+            while True:
+                response = await self._http.request(
+                    path="/v2/events",
+                    method="GET",
+                    lane="bulk",
+                    params=prepare_list_logs_request_params(
+                        cursor=cursor,
+                        count=1000,
+                        filter={"message_ids": chunk},
+                    ),
+                )
+
+                states.update(response["events"])
+                cursor = response.get("cursor")
+                if not cursor:
+                    return
+
+        for result in await map_concurrently(query, states.chunks(), concurrency):
+            if isinstance(result, Exception):
+                raise result
+
+        return states
@@ -1,7 +1,29 @@
+import asyncio
+import copy
 import json
-from typing import Any, Dict, List, Optional, Union
+from concurrent.futures import Executor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+    overload,
+)
 
-from qstash.asyncio.http import AsyncHttpClient
+from qstash.asyncio.concurrency import hedge, map_concurrently
+from qstash.asyncio.http import AsyncHttpClient, AsyncRequestBody
+from qstash.concurrency import DEFAULT_CONCURRENCY
+from qstash.errors import BatchChunkError, QStashError
+from qstash.cache import LruCache
+from qstash.claim_check import ClaimCheck
 from qstash.http import HttpMethod
 from qstash.message import (
     ApiT,
@@ -11,25 +33,366 @@ from qstash.message import (
     BatchRequest,
     BatchResponse,
     BatchUrlGroupResponse,
+    CompactBatchResponse,
+    DEFAULT_BATCH_CHUNK_SIZE,
+    DEFAULT_CANCEL_CHUNK_RETRIES,
+    DEFAULT_CANCEL_CHUNK_SIZE,
+    DEFAULT_WAIT_FOR_MAX_POLL_INTERVAL,
+    CancelProgress,
+    CancelTracker,
+    cancel_retry_delay,
+    check_cancel_where_options,
+    check_message_cache,
+    check_publish_cache,
+    filter_pending,
+    split_message_ids,
+    DEFAULT_WAIT_FOR_POLL_INTERVAL,
+    DeliveryWaiter,
     EnqueueResponse,
     EnqueueUrlGroupResponse,
     Message,
     PublishResponse,
     PublishUrlGroupResponse,
-    convert_to_batch_messages,
+    convert_to_batch_defaults,
     get_destination,
+    merge_template_headers,
     parse_batch_response,
+    parse_compact_batch_response,
     parse_enqueue_response,
     parse_message_response,
     parse_publish_response,
-    prepare_batch_message_body,
+    prepare_batch_columns_bodies,
+    join_batch_chunks,
+    prepare_batch_chunk,
+    split_batch_chunks,
+    publish_cache_key,
     prepare_headers,
+    prepare_hedge,
+    prepare_many_request,
+    reconcile_hedged_response,
+    prepare_template_headers,
+    serialize_json_body,
+    spread_batch_messages,
 )
+from qstash.spread import SpreadProfile
+
+if TYPE_CHECKING:
+    from qstash.log import Log, LogFilter
+
+
+async def async_prepare_batch_request_body(
+    messages: List[Any],
+    defaults: Optional[BatchRequest],
+    *,
+    json_bodies: bool,
+    auto_deduplication_id: Union[bool, str],
+    collapse: bool,
+    executor: Optional[Executor] = None,
+) -> Tuple[str, Optional[List[int]]]:
+    """
+    Prepares the body of a batch request, in chunks on the executor if
+    it is given, without blocking the event loop.
+    """
+    encode = not auto_deduplication_id and not collapse
+    if executor is None:
+        chunks = [prepare_batch_chunk(messages, defaults, json_bodies, encode)]
+    else:
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    executor,
+                    prepare_batch_chunk,
+                    chunk,
+                    defaults,
+                    json_bodies,
+                    encode,
+                )
+                for chunk in split_batch_chunks(messages)
+            )
+        )
+
+    return join_batch_chunks(
+        chunks,
+        auto_deduplication_id=auto_deduplication_id,
+        collapse=collapse,
+    )
+
+
+async def async_offload_body(
+    claim_check: Optional[ClaimCheck],
+    body: Optional[AsyncRequestBody],
+    headers: Dict[str, str],
+) -> Tuple[Optional[AsyncRequestBody], Dict[str, str]]:
+    if claim_check is None:
+        return body, headers
+
+    data = claim_check.data_to_offload(body)
+    if data is None:
+        return body, headers
+
+    # The blob store might block, so it is run in the default executor.
+    reference = await asyncio.get_running_loop().run_in_executor(
+        None, claim_check.put, data, headers.get("Content-Type")
+    )
+    return reference, {**headers, "Content-Type": "application/json"}
+
+
+async def async_send_hedged(
+    http: AsyncHttpClient,
+    *,
+    path: str,
+    headers: Dict[str, str],
+    body: Optional[AsyncRequestBody],
+    hedge_after: float,
+    generated_deduplication_id: bool,
+) -> Any:
+    response, other = await hedge(
+        lambda: http.request(path=path, method="POST", headers=headers, body=body),
+        hedge_after,
+    )
+
+    if other is None:
+        return response
+
+    results = response if isinstance(response, list) else [response]
+    if not any(r.get("deduplicated", False) for r in results):
+        return response
+
+    if generated_deduplication_id:
+        # No message could have had the id before the hedge.
+        return reconcile_hedged_response(response, None)
+
+    try:
+        other_response = await other
+    except Exception:
+        return response
+
+    return reconcile_hedged_response(response, other_response)
+
+
+class AsyncMessageTemplate:
+    """
+    Publish and enqueue options that are validated and prepared once,
+    and reused for every message sent through the template.
+
+    Use `AsyncMessageApi.template` to create one.
+    """
+
+    def __init__(
+        self,
+        http: AsyncHttpClient,
+        *,
+        destination: str,
+        publish_headers: Dict[str, str],
+        enqueue_headers: Dict[str, str],
+        claim_check: Optional[ClaimCheck] = None,
+    ) -> None:
+        self._http = http
+        self._destination = destination
+        self._publish_path = f"/v2/publish/{destination}"
+        self._publish_headers = publish_headers
+        self._enqueue_headers = enqueue_headers
+        self._claim_check = claim_check
+
+    async def publish(
+        self,
+        body: Optional[AsyncRequestBody] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message to QStash with the options of the template.
+
+        :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        :param delay: Delay the message delivery, overriding the delay of
+            the template.
+        :param not_before: Delay the message until a certain time in the future.
+            The format is a unix timestamp in seconds, based on the UTC timezone.
+        """
+        req_headers = merge_template_headers(
+            self._publish_headers,
+            content_type=None,
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=delay,
+            not_before=not_before,
+        )
+
+        req_body, req_headers = await async_offload_body(
+            self._claim_check, body, req_headers
+        )
+
+        response = await self._http.request(
+            path=self._publish_path,
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_publish_response(response)
+
+    async def publish_json(
+        self,
+        body: Optional[Any] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message to QStash with the options of the template,
+        automatically serializing the body as JSON string, and setting
+        content type to `application/json`.
+
+        :param body: The request message body passed to the destination after being
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        :param delay: Delay the message delivery, overriding the delay of
+            the template.
+        :param not_before: Delay the message until a certain time in the future.
+            The format is a unix timestamp in seconds, based on the UTC timezone.
+        """
+        req_headers = merge_template_headers(
+            self._publish_headers,
+            content_type="application/json",
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=delay,
+            not_before=not_before,
+        )
+
+        req_body, req_headers = await async_offload_body(
+            self._claim_check, serialize_json_body(body), req_headers
+        )
+
+        response = await self._http.request(
+            path=self._publish_path,
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_publish_response(response)
+
+    async def enqueue(
+        self,
+        queue: str,
+        body: Optional[AsyncRequestBody] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message with the options of the template, after
+        creating the queue if it does not exist.
+
+        The `delay` and `flow_control` options of the template are
+        not used while enqueueing.
+
+        :param queue: The name of the queue.
+        :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        """
+        req_headers = merge_template_headers(
+            self._enqueue_headers,
+            content_type=None,
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=None,
+            not_before=None,
+        )
+
+        req_body, req_headers = await async_offload_body(
+            self._claim_check, body, req_headers
+        )
+
+        response = await self._http.request(
+            path=f"/v2/enqueue/{queue}/{self._destination}",
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_enqueue_response(response)
+
+    async def enqueue_json(
+        self,
+        queue: str,
+        body: Optional[Any] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message with the options of the template, after
+        creating the queue if it does not exist. It automatically serializes
+        the body as JSON string, and setting content type to `application/json`.
+
+        The `delay` and `flow_control` options of the template are
+        not used while enqueueing.
+
+        :param queue: The name of the queue.
+        :param body: The request message body passed to the destination after being
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        """
+        req_headers = merge_template_headers(
+            self._enqueue_headers,
+            content_type="application/json",
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=None,
+            not_before=None,
+        )
+
+        req_body, req_headers = await async_offload_body(
+            self._claim_check, serialize_json_body(body), req_headers
+        )
+
+        response = await self._http.request(
+            path=f"/v2/enqueue/{queue}/{self._destination}",
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_enqueue_response(response)
 
 
 class AsyncMessageApi:
-    def __init__(self, http: AsyncHttpClient):
+    def __init__(
+        self,
+        http: AsyncHttpClient,
+        publish_cache: Optional[LruCache[str, Any]] = None,
+        claim_check: Optional[ClaimCheck] = None,
+        message_cache: Optional[LruCache[str, Message]] = None,
+    ):
         self._http = http
+        self._publish_cache = check_publish_cache(publish_cache)
+        self._claim_check = claim_check
+        self._message_cache = check_message_cache(message_cache)
 
     async def publish(
         self,
@@ -37,7 +400,7 @@ class AsyncMessageApi:
         url: Optional[str] = None,
         url_group: Optional[str] = None,
         api: Optional[ApiT] = None,
-        body: Optional[Union[str, bytes]] = None,
+        body: Optional[AsyncRequestBody] = None,
         content_type: Optional[str] = None,
         method: Optional[HttpMethod] = None,
         headers: Optional[Dict[str, str]] = None,
@@ -55,6 +418,7 @@ class AsyncMessageApi:
         flow_control: Optional[FlowControl] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
         """
         Publishes a message to QStash.
@@ -70,6 +434,9 @@ class AsyncMessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
         :param content_type: MIME type of the message.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
@@ -126,7 +493,20 @@ class AsyncMessageApi:
         :param flow_control: Settings for controlling the number of active requests,
             as well as the rate of requests with the same flow control key.
         :param label: Assign a label to the request to filter logs with it later.
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
+        generated_deduplication_id = False
+        if hedge_after is not None:
+            deduplication_id, generated_deduplication_id = prepare_hedge(
+                body=body,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+            )
+
         headers = headers or {}
         destination = get_destination(
             url=url,
@@ -155,14 +535,50 @@ class AsyncMessageApi:
             redact=redact,
         )
 
-        response = await self._http.request(
-            path=f"/v2/publish/{destination}",
-            method="POST",
-            headers=req_headers,
-            body=body,
+        path = f"/v2/publish/{destination}"
+
+        cache = self._publish_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = publish_cache_key(
+                path,
+                req_headers,
+                body,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+            cached = cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                return cast(
+                    Union[PublishResponse, List[PublishUrlGroupResponse]],
+                    copy.deepcopy(cached),
+                )
+
+        body, req_headers = await async_offload_body(
+            self._claim_check, body, req_headers
         )
 
-        return parse_publish_response(response)
+        if hedge_after is None:
+            response = await self._http.request(
+                path=path,
+                method="POST",
+                headers=req_headers,
+                body=body,
+            )
+        else:
+            response = await async_send_hedged(
+                self._http,
+                path=path,
+                headers=req_headers,
+                body=body,
+                hedge_after=hedge_after,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+
+        result = parse_publish_response(response)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, copy.deepcopy(result))
+
+        return result
 
     async def publish_json(
         self,
@@ -187,6 +603,7 @@ class AsyncMessageApi:
         flow_control: Optional[FlowControl] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
         """
         Publish a message to QStash, automatically serializing the
@@ -203,7 +620,8 @@ class AsyncMessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The request message body passed to the destination after being
-            serialized as JSON string.
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
         :param callback_headers: Headers to forward along with the callback message.
@@ -259,12 +677,17 @@ class AsyncMessageApi:
         :param flow_control: Settings for controlling the number of active requests,
             as well as the rate of requests with the same flow control key.
         :param label: Assign a label to the request to filter logs with it later.
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
         return await self.publish(
             url=url,
             url_group=url_group,
             api=api,
-            body=json.dumps(body),
+            body=serialize_json_body(body),
             content_type="application/json",
             method=method,
             headers=headers,
@@ -282,6 +705,7 @@ class AsyncMessageApi:
             flow_control=flow_control,
             label=label,
             redact=redact,
+            hedge_after=hedge_after,
         )
 
     async def enqueue(
@@ -291,7 +715,7 @@ class AsyncMessageApi:
         url: Optional[str] = None,
         url_group: Optional[str] = None,
         api: Optional[ApiT] = None,
-        body: Optional[Union[str, bytes]] = None,
+        body: Optional[AsyncRequestBody] = None,
         content_type: Optional[str] = None,
         method: Optional[HttpMethod] = None,
         headers: Optional[Dict[str, str]] = None,
@@ -306,6 +730,7 @@ class AsyncMessageApi:
         timeout: Optional[Union[str, int]] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
         """
         Enqueues a message, after creating the queue if it does
@@ -323,6 +748,9 @@ class AsyncMessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
         :param content_type: MIME type of the message.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
@@ -370,7 +798,20 @@ class AsyncMessageApi:
             value permitted by the QStash plan. It is useful in scenarios, where a message
             should be delivered with a shorter timeout.
         :param label: Assign a label to the request to filter logs with it later.
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
+        generated_deduplication_id = False
+        if hedge_after is not None:
+            deduplication_id, generated_deduplication_id = prepare_hedge(
+                body=body,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+            )
+
         headers = headers or {}
         destination = get_destination(
             url=url,
@@ -399,14 +840,50 @@ class AsyncMessageApi:
             redact=redact,
         )
 
-        response = await self._http.request(
-            path=f"/v2/enqueue/{queue}/{destination}",
-            method="POST",
-            headers=req_headers,
-            body=body,
+        path = f"/v2/enqueue/{queue}/{destination}"
+
+        cache = self._publish_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = publish_cache_key(
+                path,
+                req_headers,
+                body,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+            cached = cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                return cast(
+                    Union[EnqueueResponse, List[EnqueueUrlGroupResponse]],
+                    copy.deepcopy(cached),
+                )
+
+        body, req_headers = await async_offload_body(
+            self._claim_check, body, req_headers
         )
 
-        return parse_enqueue_response(response)
+        if hedge_after is None:
+            response = await self._http.request(
+                path=path,
+                method="POST",
+                headers=req_headers,
+                body=body,
+            )
+        else:
+            response = await async_send_hedged(
+                self._http,
+                path=path,
+                headers=req_headers,
+                body=body,
+                hedge_after=hedge_after,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+
+        result = parse_enqueue_response(response)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, copy.deepcopy(result))
+
+        return result
 
     async def enqueue_json(
         self,
@@ -429,6 +906,7 @@ class AsyncMessageApi:
         timeout: Optional[Union[str, int]] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
         """
         Enqueues a message, after creating the queue if it does
@@ -447,7 +925,8 @@ class AsyncMessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The request message body passed to the destination after being
-            serialized as JSON string.
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
         :param callback_headers: Headers to forward along with the callback message.
@@ -494,13 +973,18 @@ class AsyncMessageApi:
             value permitted by the QStash plan. It is useful in scenarios, where a message
             should be delivered with a shorter timeout.
         :param label: Assign a label to the request to filter logs with it later.
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
         return await self.enqueue(
             queue=queue,
             url=url,
             url_group=url_group,
             api=api,
-            body=json.dumps(body),
+            body=serialize_json_body(body),
             content_type="application/json",
             method=method,
             headers=headers,
@@ -515,11 +999,222 @@ class AsyncMessageApi:
             timeout=timeout,
             label=label,
             redact=redact,
+            hedge_after=hedge_after,
         )
 
+    async def publish_many(
+        self,
+        messages: List[BatchRequest],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[Union[PublishResponse, List[PublishUrlGroupResponse], Exception]]:
+        """
+        Publishes the messages with separate requests, running at most
+        `concurrency` of them at the same time.
+
+        Unlike `batch`, each message is published on its own, so that
+        messages to different apis can use different tokens, and a failure
+        of a message does not affect the others.
+
+        Results are returned in the order of the messages. If publishing a
+        message fails, the exception is returned in its place instead of
+        being raised.
+
+        :param messages: Messages to publish. Messages must not have a `queue`,
+            use `enqueue_many` to enqueue them.
+        :param concurrency: Maximum number of requests to run at the same time.
+        """
+
+        async def publish(
+            msg: BatchRequest,
+        ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+            if msg.get("queue") is not None:
+                raise QStashError("Use 'enqueue_many' to enqueue messages.")
+
+            path, headers = prepare_many_request(msg, None)
+            body, headers = await async_offload_body(
+                self._claim_check, msg.get("body"), headers
+            )
+            response = await self._http.request(
+                path=path,
+                method="POST",
+                headers=headers,
+                body=body,
+            )
+
+            return parse_publish_response(response)
+
+        return await map_concurrently(publish, messages, concurrency)
+
+    async def enqueue_many(
+        self,
+        messages: List[BatchRequest],
+        *,
+        queue: Optional[str] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[Union[EnqueueResponse, List[EnqueueUrlGroupResponse], Exception]]:
+        """
+        Enqueues the messages with separate requests, running at most
+        `concurrency` of them at the same time.
+
+        Results are returned in the order of the messages. If enqueueing a
+        message fails, the exception is returned in its place instead of
+        being raised.
+
+        Like `enqueue`, the `delay`, `not_before`, and `flow_control` options
+        of the messages are not used.
+
+        :param messages: Messages to enqueue.
+        :param queue: Name of the queue to use for the messages without
+            a `queue`.
+        :param concurrency: Maximum number of requests to run at the same time.
+        """
+
+        async def enqueue(
+            msg: BatchRequest,
+        ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+            msg_queue = msg.get("queue") or queue
+            if msg_queue is None:
+                raise QStashError("The queue of the message must be provided.")
+
+            path, headers = prepare_many_request(msg, msg_queue)
+            body, headers = await async_offload_body(
+                self._claim_check, msg.get("body"), headers
+            )
+            response = await self._http.request(
+                path=path,
+                method="POST",
+                headers=headers,
+                body=body,
+            )
+
+            return parse_enqueue_response(response)
+
+        return await map_concurrently(enqueue, messages, concurrency)
+
+    def template(
+        self,
+        *,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        content_type: Optional[str] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        flow_control: Optional[FlowControl] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+    ) -> AsyncMessageTemplate:
+        """
+        Creates a template from the options shared by many messages.
+
+        The destination and the headers are validated and prepared once,
+        so publishing or enqueueing through the template only needs to
+        merge the per-message fields.
+
+        :param url: Url to send the messages to.
+        :param url_group: Url group to send the messages to.
+        :param api: Api to send the messages to.
+        :param content_type: MIME type of the messages.
+        :param method: The HTTP method to use when sending a webhook to your API.
+        :param headers: Headers to forward along with the messages.
+        :param callback_headers: Headers to forward along with the callback messages.
+        :param failure_callback_headers: Headers to forward along with the failure
+            callback messages.
+        :param retries: How often should the messages be retried in case the
+            destination API is not available.
+        :param retry_delay: Delay between retries. See `publish` for the
+            supported expressions.
+        :param callback: A callback url that will be called after each attempt.
+        :param failure_callback: A failure callback url that will be called when a delivery
+            is failed, that is when all the defined retries are exhausted.
+        :param delay: Delay the message delivery. Only used while publishing.
+        :param content_based_deduplication: Automatically deduplicate messages based on
+            their content.
+        :param timeout: The HTTP timeout value to use while calling the destination URL.
+        :param flow_control: Settings for controlling the number of active requests,
+            as well as the rate of requests with the same flow control key. Only used
+            while publishing.
+        :param label: Assign a label to the requests to filter logs with it later.
+        :param redact: Configure which fields should be redacted in logs.
+        """
+        destination, publish_headers, enqueue_headers = prepare_template_headers(
+            url=url,
+            url_group=url_group,
+            api=api,
+            content_type=content_type,
+            method=method,
+            headers=headers,
+            callback_headers=callback_headers,
+            failure_callback_headers=failure_callback_headers,
+            retries=retries,
+            retry_delay=retry_delay,
+            callback=callback,
+            failure_callback=failure_callback,
+            delay=delay,
+            content_based_deduplication=content_based_deduplication,
+            timeout=timeout,
+            flow_control=flow_control,
+            label=label,
+            redact=redact,
+        )
+
+        return AsyncMessageTemplate(
+            self._http,
+            destination=destination,
+            publish_headers=publish_headers,
+            enqueue_headers=enqueue_headers,
+            claim_check=self._claim_check,
+        )
+
+    @overload
+    async def batch(
+        self,
+        messages: List[BatchRequest],
+        *,
+        defaults: Optional[BatchRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[False] = False,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]: ...
+
+    @overload
+    async def batch(
+        self,
+        messages: List[BatchRequest],
+        *,
+        defaults: Optional[BatchRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[True],
+    ) -> CompactBatchResponse: ...
+
     async def batch(
-        self, messages: List[BatchRequest]
-    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        self,
+        messages: List[BatchRequest],
+        *,
+        defaults: Optional[BatchRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: bool = False,
+    ) -> Union[
+        List[Union[BatchResponse, List[BatchUrlGroupResponse]]], CompactBatchResponse
+    ]:
         """
         Publishes or enqueues multiple messages in a single request.
 
@@ -532,21 +1227,93 @@ class AsyncMessageApi:
         If the message in the batch is sent to a url group,
         the corresponding item in the response is list of
         `BatchUrlGroupResponse`s, one for each url in the url group.
-        """
-        body = prepare_batch_message_body(messages)
 
-        response = await self._http.request(
-            path="/v2/batch",
-            body=body,
-            headers={"Content-Type": "application/json"},
-            method="POST",
+        :param messages: Messages to publish or enqueue.
+        :param defaults: Options shared by all the messages in the batch.
+            They are prepared once, and the options of each message
+            override them. Forwarded headers are merged, with the headers
+            of the message taking precedence. The default destination is
+            only used for the messages without a `url`, `url_group`,
+            or `api`.
+        :param auto_deduplication_id: Whether to set a deduplication id, derived
+            from the destination, queue, headers, and body, on the messages
+            without a `deduplication_id` or `content_based_deduplication`.
+            Sending the same messages again, such as after a timeout or a
+            failed response, then produces the same ids, and the messages
+            that were already accepted are reported as `deduplicated`.
+            The same messages sent on purpose in a later batch, within the
+            deduplication window of QStash, are deduplicated as well. To
+            tell such batches apart, give a string instead, such as an
+            idempotency key of the batch, which is mixed into the ids. The
+            key must not be empty.
+        :param executor: Executor to prepare the messages on, in chunks, such as
+            a `ProcessPoolExecutor` to encode large batches on multiple cores.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param compact: Whether to return the result as a `CompactBatchResponse`,
+            which stores the message ids in arrays, and creates the response
+            objects lazily on access.
+        """
+        if spread_over is not None:
+            messages = spread_batch_messages(
+                messages, spread_over, spread_profile, defaults
+            )
+
+        body, indexes = await async_prepare_batch_request_body(
+            messages,
+            defaults,
+            json_bodies=False,
+            auto_deduplication_id=auto_deduplication_id,
+            collapse=self._publish_cache is not None,
+            executor=executor,
         )
 
-        return parse_batch_response(response)
+        return await self._send_batch(body, indexes, compact)
+
+    @overload
+    async def batch_json(
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        defaults: Optional[BatchJsonRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[False] = False,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]: ...
+
+    @overload
+    async def batch_json(
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        defaults: Optional[BatchJsonRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[True],
+    ) -> CompactBatchResponse: ...
 
     async def batch_json(
-        self, messages: List[BatchJsonRequest]
-    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        defaults: Optional[BatchJsonRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: bool = False,
+    ) -> Union[
+        List[Union[BatchResponse, List[BatchUrlGroupResponse]]], CompactBatchResponse
+    ]:
         """
         Publishes or enqueues multiple messages in a single request,
         automatically serializing the message bodies as JSON strings,
@@ -561,20 +1328,342 @@ class AsyncMessageApi:
         If the message in the batch is sent to a url group,
         the corresponding item in the response is list of
         `BatchUrlGroupResponse`s, one for each url in the url group.
+
+        :param messages: Messages to publish or enqueue.
+        :param defaults: Options shared by all the messages in the batch.
+            They are prepared once, and the options of each message
+            override them. Forwarded headers are merged, with the headers
+            of the message taking precedence. The default destination is
+            only used for the messages without a `url`, `url_group`,
+            or `api`.
+        :param auto_deduplication_id: Whether to set a deduplication id, derived
+            from the destination, queue, headers, and body, on the messages
+            without a `deduplication_id` or `content_based_deduplication`.
+            Sending the same messages again, such as after a timeout or a
+            failed response, then produces the same ids, and the messages
+            that were already accepted are reported as `deduplicated`.
+            The same messages sent on purpose in a later batch, within the
+            deduplication window of QStash, are deduplicated as well. To
+            tell such batches apart, give a string instead, such as an
+            idempotency key of the batch, which is mixed into the ids. The
+            key must not be empty.
+        :param executor: Executor to prepare the messages on, in chunks, such as
+            a `ProcessPoolExecutor` to encode large batches on multiple cores.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param compact: Whether to return the result as a `CompactBatchResponse`,
+            which stores the message ids in arrays, and creates the response
+            objects lazily on access.
         """
-        batch_messages = convert_to_batch_messages(messages)
-        return await self.batch(batch_messages)
+        if spread_over is not None:
+            messages = spread_batch_messages(
+                messages, spread_over, spread_profile, defaults
+            )
+
+        body, indexes = await async_prepare_batch_request_body(
+            messages,
+            convert_to_batch_defaults(defaults) if defaults is not None else None,
+            json_bodies=True,
+            auto_deduplication_id=auto_deduplication_id,
+            collapse=self._publish_cache is not None,
+            executor=executor,
+        )
+
+        return await self._send_batch(body, indexes, compact)
+
+    async def _send_batch(
+        self,
+        body: str,
+        indexes: Optional[List[int]],
+        compact: bool,
+    ) -> Union[
+        List[Union[BatchResponse, List[BatchUrlGroupResponse]]], CompactBatchResponse
+    ]:
+        response = await self._http.request(
+            path="/v2/batch",
+            body=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+            lane="bulk",
+        )
+
+        if indexes is not None:
+            response = [response[i] for i in indexes]
+
+        if compact:
+            return parse_compact_batch_response(response)
+
+        return parse_batch_response(response)
+
+    async def batch_columns(
+        self,
+        *,
+        urls: Optional[Iterable[str]] = None,
+        bodies: Optional[Iterable[Union[str, bytes]]] = None,
+        deduplication_ids: Optional[Iterable[Optional[str]]] = None,
+        delays: Optional[Iterable[Optional[Union[str, int]]]] = None,
+        not_befores: Optional[Iterable[Optional[int]]] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        defaults: Optional[BatchRequest] = None,
+        chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE,
+    ) -> CompactBatchResponse:
+        """
+        Publishes or enqueues many messages given as parallel columns,
+        in batches of at most `chunk_size` messages.
+
+        The columns can be lists, tuples, or NumPy-style arrays, and all
+        of them must have the same length. The message at index `i`
+        is built from the `i`th item of each column, and the `defaults`.
+        `None` items in the columns fall back to the defaults.
+
+        The messages are encoded into the batch requests directly,
+        and the message ids are returned in a `CompactBatchResponse`,
+        in the order of the columns.
+
+        The chunks are sent one after another. If one of them fails,
+        `BatchChunkError` is raised with the `result` of the messages
+        accepted before it, so that only the messages from the index
+        `len(error.result)` on need to be sent again.
+
+        :param urls: Urls to send the messages to. When not provided,
+            the destination of the `defaults` is used.
+        :param bodies: The raw request message bodies passed to the
+            destinations as is.
+        :param deduplication_ids: Ids to use while deduplicating messages.
+        :param delays: Delays for the message deliveries.
+        :param not_befores: Unix timestamps in seconds, based on the UTC timezone,
+            to delay the messages until.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param defaults: Options shared by all the messages.
+        :param chunk_size: Maximum number of messages to send in a single
+            batch request.
+        """
+        result = CompactBatchResponse()
+        for body in prepare_batch_columns_bodies(
+            urls=urls,
+            bodies=bodies,
+            deduplication_ids=deduplication_ids,
+            delays=delays,
+            not_befores=not_befores,
+            spread_over=spread_over,
+            spread_profile=spread_profile,
+            defaults=defaults,
+            chunk_size=chunk_size,
+            json_bodies=False,
+        ):
+            try:
+                response = await self._http.request(
+                    path="/v2/batch",
+                    body=body,
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                    lane="bulk",
+                )
+            except Exception as e:
+                raise BatchChunkError(result, e) from e
+
+            result.extend(response)
+
+        return result
+
+    async def batch_json_columns(
+        self,
+        *,
+        urls: Optional[Iterable[str]] = None,
+        bodies: Optional[Iterable[Any]] = None,
+        deduplication_ids: Optional[Iterable[Optional[str]]] = None,
+        delays: Optional[Iterable[Optional[Union[str, int]]]] = None,
+        not_befores: Optional[Iterable[Optional[int]]] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        defaults: Optional[BatchJsonRequest] = None,
+        chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE,
+    ) -> CompactBatchResponse:
+        """
+        Publishes or enqueues many messages given as parallel columns,
+        in batches of at most `chunk_size` messages, automatically
+        serializing the message bodies as JSON strings, and setting
+        content type to `application/json`.
+
+        See `batch_columns` for the details.
+
+        :param urls: Urls to send the messages to. When not provided,
+            the destination of the `defaults` is used.
+        :param bodies: The request message bodies passed to the destinations
+            after being serialized as JSON strings. `RawJson` values and `bytes`
+            are treated as already serialized JSON and passed as is.
+        :param deduplication_ids: Ids to use while deduplicating messages.
+        :param delays: Delays for the message deliveries.
+        :param not_befores: Unix timestamps in seconds, based on the UTC timezone,
+            to delay the messages until.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param defaults: Options shared by all the messages.
+        :param chunk_size: Maximum number of messages to send in a single
+            batch request.
+        """
+        result = CompactBatchResponse()
+        for body in prepare_batch_columns_bodies(
+            urls=urls,
+            bodies=bodies,
+            deduplication_ids=deduplication_ids,
+            delays=delays,
+            not_befores=not_befores,
+            spread_over=spread_over,
+            spread_profile=spread_profile,
+            defaults=(
+                convert_to_batch_defaults(defaults) if defaults is not None else None
+            ),
+            chunk_size=chunk_size,
+            json_bodies=True,
+        ):
+            try:
+                response = await self._http.request(
+                    path="/v2/batch",
+                    body=body,
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                    lane="bulk",
+                )
+            except Exception as e:
+                raise BatchChunkError(result, e) from e
+
+            result.extend(response)
+
+        return result
+
+    async def wait_for(
+        self,
+        message_ids: List[str],
+        *,
+        timeout: Optional[float] = None,
+        poll_interval: float = DEFAULT_WAIT_FOR_POLL_INTERVAL,
+        max_poll_interval: float = DEFAULT_WAIT_FOR_MAX_POLL_INTERVAL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> Dict[str, "Log"]:
+        """
+        Waits until the messages are delivered, failed, or canceled.
+
+        Returns the final log of each message, by message id. The messages
+        that do not reach a final state before the timeout are left out.
+
+        All the outstanding messages are resolved with a few events queries
+        per poll, each filtered by a chunk of message ids.
+
+        :param message_ids: Ids of the messages to wait for.
+        :param timeout: Maximum number of seconds to wait. Waits until all
+            the messages are finished by default.
+        :param poll_interval: Initial number of seconds between the polls.
+        :param max_poll_interval: Maximum number of seconds between the polls.
+            The interval grows up to it while no message finishes.
+        :param concurrency: Maximum number of events queries sent at the same
+            time.
+        """
+        from qstash.asyncio.log import AsyncLogApi
+
+        log = AsyncLogApi(self._http)
+        waiter = DeliveryWaiter(
+            message_ids,
+            timeout=timeout,
+            poll_interval=poll_interval,
+            max_poll_interval=max_poll_interval,
+        )
+
+        async def query(log_filter: "LogFilter") -> List["Log"]:
+            logs: List["Log"] = []
+            cursor = None
+            while True:
+                res = await log.list(cursor=cursor, count=1000, filter=log_filter)
+                logs.extend(res.logs)
+                cursor = res.cursor
+                if not cursor:
+                    return logs
+
+        while waiter.pending:
+            pending_count = len(waiter.pending)
+            results = await map_concurrently(query, waiter.start_poll(), concurrency)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+
+                waiter.resolve(result)
+
+            delay = waiter.next_delay(len(waiter.pending) < pending_count)
+            if delay is None:
+                break
+
+            await asyncio.sleep(delay)
+
+        return waiter.results
 
     async def get(self, message_id: str) -> Message:
         """
         Gets the message by its id.
+
+        If the client has a message cache, a copy of the cached message is
+        returned without a request. It might be stale, as the messages are
+        deleted once they are delivered, failed, or cancelled elsewhere,
+        until the cached entry expires.
         """
+        if self._message_cache is not None:
+            cached = self._message_cache.get(message_id)
+            if cached is not None:
+                return copy.deepcopy(cached)
+
         response = await self._http.request(
             path=f"/v2/messages/{message_id}",
             method="GET",
         )
 
-        return parse_message_response(response)
+        message = parse_message_response(response)
+        if self._message_cache is not None:
+            self._message_cache.put(message_id, copy.deepcopy(message))
+
+        return message
+
+    async def get_many(
+        self,
+        message_ids: List[str],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[Union[Message, Exception]]:
+        """
+        Gets the messages by their ids, running at most `concurrency`
+        requests at the same time.
+
+        Repeated ids are fetched once, and the cached messages, if the
+        client has a message cache, are returned without a request, with
+        the same staleness as `get`.
+
+        Results are returned in the order of the message ids. If getting a
+        message fails, the exception is returned in its place instead of
+        being raised.
+
+        :param message_ids: Ids of the messages.
+        :param concurrency: Maximum number of requests to run at the same time.
+        """
+        unique_ids = list(dict.fromkeys(message_ids))
+        results = dict(
+            zip(unique_ids, await map_concurrently(self.get, unique_ids, concurrency))
+        )
+        return [results[message_id] for message_id in message_ids]
 
     async def cancel(self, message_id: str) -> None:
         """
@@ -590,7 +1679,18 @@ class AsyncMessageApi:
             parse_response=False,
         )
 
-    async def cancel_many(self, message_ids: List[str]) -> int:
+        if self._message_cache is not None:
+            self._message_cache.pop(message_id)
+
+    async def cancel_many(
+        self,
+        message_ids: List[str],
+        *,
+        chunk_size: int = DEFAULT_CANCEL_CHUNK_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retries: int = DEFAULT_CANCEL_CHUNK_RETRIES,
+        on_progress: Optional[CancelProgress] = None,
+    ) -> int:
         """
         Cancels delivery of existing messages.
 
@@ -598,18 +1698,142 @@ class AsyncMessageApi:
         delivered in the future. If a message is in flight to your API,
         it might be too late to cancel.
 
+        The message ids are cancelled in chunks, with at most `concurrency`
+        requests sent at the same time. A failed chunk is retried on its own,
+        and its error is raised once its retries are exhausted, after the
+        other chunks are done.
+
         Returns how many of the messages are cancelled.
-        """
-        body = json.dumps({"messageIds": message_ids})
 
-        response = await self._http.request(
-            path="/v2/messages",
-            method="DELETE",
-            headers={"Content-Type": "application/json"},
-            body=body,
+        :param message_ids: Ids of the messages to cancel.
+        :param chunk_size: Maximum number of message ids cancelled in a single
+            request.
+        :param concurrency: Maximum number of requests sent at the same time.
+        :param retries: Number of times a failed chunk is retried.
+        :param on_progress: Called after each chunk is cancelled, with the
+            number of processed message ids, the total number of message ids,
+            and the number of messages cancelled so far.
+        """
+        tracker = CancelTracker(len(message_ids), on_progress)
+
+        async def cancel_chunk(chunk: List[str]) -> None:
+            body = json.dumps({"messageIds": chunk})
+            for attempt in range(retries + 1):
+                try:
+                    response = await self._http.request(
+                        path="/v2/messages",
+                        method="DELETE",
+                        headers={"Content-Type": "application/json"},
+                        body=body,
+                    )
+                    break
+                except Exception:
+                    if attempt == retries:
+                        raise
+
+                    await asyncio.sleep(cancel_retry_delay(attempt))
+
+            if self._message_cache is not None:
+                for message_id in chunk:
+                    self._message_cache.pop(message_id)
+
+            tracker.add(len(chunk), response["cancelled"])
+
+        results = await map_concurrently(
+            cancel_chunk,
+            split_message_ids(message_ids, chunk_size),
+            concurrency,
         )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
 
-        return response["cancelled"]  # type:ignore[no-any-return]
+        return tracker.cancelled
+
+    async def cancel_where(
+        self,
+        filter: "LogFilter",
+        *,
+        dry_run: bool = False,
+        chunk_size: int = DEFAULT_CANCEL_CHUNK_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> int:
+        """
+        Cancels delivery of the messages matching the filter.
+
+        The ids of the matching messages are streamed from the events api
+        in chunks, and the pending messages of each chunk, which are the
+        messages whose latest state is `CREATED`, `ACTIVE`, or `RETRY`, are
+        cancelled while the listing continues. At most `concurrency` chunks
+        are processed at the same time, so the memory use does not depend
+        on the number of messages.
+
+        Returns how many of the messages are cancelled, or with `dry_run`,
+        how many of them are pending.
+
+        :param filter: Filter of the messages, such as a label, a queue,
+            or a schedule id. It must not have a `state`, as only the
+            pending messages are cancelled.
+        :param dry_run: Whether to only count the messages to cancel.
+        :param chunk_size: Maximum number of message ids cancelled in a single
+            request.
+        :param concurrency: Maximum number of chunks processed at the same time.
+        """
+        from qstash.asyncio.log import AsyncLogApi
+        from qstash.log import LogState
+
+        check_cancel_where_options(filter, chunk_size, concurrency)
+
+        log = AsyncLogApi(self._http)
+
+        # Every message has a single creation event.
+        log_filter: "LogFilter" = {**filter, "state": LogState.CREATED}
+
+        async def chunks() -> AsyncIterator[List[str]]:
+            chunk: List[str] = []
+            cursor = None
+            while True:
+                res = await log.list(cursor=cursor, count=1000, filter=log_filter)
+                for entry in res.logs:
+                    chunk.append(entry.message_id)
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+
+                cursor = res.cursor
+                if not cursor:
+                    break
+
+            if chunk:
+                yield chunk
+
+        async def process(chunk: List[str]) -> int:
+            states = await log.latest_states(chunk, concurrency=1)
+            pending = filter_pending(chunk, states)
+            if dry_run or not pending:
+                return len(pending)
+
+            return await self.cancel_many(pending, chunk_size=chunk_size, concurrency=1)
+
+        total = 0
+        tasks: "Set[asyncio.Task[int]]" = set()
+        try:
+            async for chunk in chunks():
+                if len(tasks) >= concurrency:
+                    done, tasks = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    total += sum(task.result() for task in done)
+
+                tasks.add(asyncio.ensure_future(process(chunk)))
+
+            for task in tasks:
+                total += await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return total
 
     async def cancel_all(self) -> int:
         """
@@ -626,4 +1850,7 @@ class AsyncMessageApi:
             method="DELETE",
         )
 
+        if self._message_cache is not None:
+            self._message_cache.clear()
+
         return response["cancelled"]  # type:ignore[no-any-return]
@@ -0,0 +1,441 @@
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from qstash.asyncio.client import AsyncQStash
+from qstash.asyncio.http import AsyncRequestBody
+from qstash.errors import QStashError
+from qstash.http import HttpMethod
+from qstash.message import (
+    ApiT,
+    BatchJsonRequest,
+    BatchRequest,
+    BatchResponse,
+    BatchUrlGroupResponse,
+    EnqueueResponse,
+    EnqueueUrlGroupResponse,
+    FlowControl,
+    PublishResponse,
+    PublishUrlGroupResponse,
+    Redact,
+)
+from qstash.sharding import (
+    ShardRouter,
+    ShardStats,
+    get_batch_shard_key,
+    get_shard_key,
+    is_limit_error,
+)
+
+R = TypeVar("R")
+
+
+class AsyncShardedQStash:
+    """
+    Spreads the publish, enqueue, and batch requests across multiple
+    clients, such as the clients of different QStash accounts, to go
+    beyond the burst and daily limits of a single token.
+
+    Requests are sent to the shards by smooth weighted round-robin, or by
+    consistent hashing when a `key` is given, so that the requests with
+    the same key go to the same shard as long as it is available. As the
+    queues and url groups belong to a single account, the messages using
+    them are sent only to the shard of the name of their queue or url
+    group when there is no key.
+
+    A shard that fails with `RateLimitExceededError` or
+    `DailyMessageLimitExceededError` is skipped until its limit resets,
+    and the request is sent to the next shard, except for the requests
+    pinned to the shard of their queue or url group, which raise the
+    error. Requests rejected with these errors are not accepted by QStash,
+    so they are safe to resend. Other errors are raised as they are.
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[AsyncQStash],
+        *,
+        weights: Optional[Sequence[int]] = None,
+    ) -> None:
+        """
+        :param clients: Clients of the shards.
+        :param weights: Relative share of the requests each shard gets,
+            in the order of the clients. All the shards have the same
+            weight by default.
+        """
+        if weights is not None and len(weights) != len(clients):
+            raise QStashError("'weights' must have one weight for each client.")
+
+        self.clients = list(clients)
+        """Clients of the shards."""
+
+        self._router = ShardRouter(weights or [1] * len(self.clients))
+
+    @property
+    def stats(self) -> List[ShardStats]:
+        """Stats of the shards, in the order of the clients."""
+        return self._router.snapshot()
+
+    async def run(
+        self,
+        fn: Callable[[AsyncQStash], Awaitable[R]],
+        *,
+        key: Optional[str] = None,
+        pinned: bool = False,
+        message_count: int = 1,
+    ) -> R:
+        """
+        Awaits `fn` with the client of the chosen shard, and with the client
+        of the next one while it fails with a limit error.
+
+        It can be used for the methods of the client that are not
+        covered by this class, such as `publish` with a hedged request.
+
+        :param fn: Function sending a request to QStash with the client.
+        :param key: Key to choose the shard by. Round-robin is used if not given.
+        :param pinned: Whether only the shard chosen by the key is tried,
+            raising its limit errors, as for the requests using a queue or
+            url group, which can't be sent to the other accounts.
+        :param message_count: Number of messages published by `fn`, for the stats.
+        """
+        last_error: Optional[Exception] = None
+        for shard in self._router.order(key, pinned=pinned):
+            try:
+                result = await fn(self.clients[shard])
+            except Exception as e:
+                self._router.record_error(shard, e)
+                if not is_limit_error(e):
+                    raise
+
+                last_error = e
+                continue
+
+            self._router.record_success(shard, message_count)
+            return result
+
+        # Can't be None at this point
+        raise last_error  # type:ignore[misc]
+
+    async def publish(
+        self,
+        *,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[AsyncRequestBody] = None,
+        content_type: Optional[str] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        flow_control: Optional[FlowControl] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message on one of the shards.
+
+        Messages to a `url_group` are sent to the shard chosen by the name
+        of the url group, unless a `key` is given, as the url groups belong
+        to a single account.
+
+        See `MessageApi.publish` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, url_group=url_group)
+        return await self.run(
+            lambda client: client.message.publish(
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                content_type=content_type,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                delay=delay,
+                not_before=not_before,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                flow_control=flow_control,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    async def publish_json(
+        self,
+        *,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[Any] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        flow_control: Optional[FlowControl] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message on one of the shards, automatically serializing
+        the body as JSON string, and setting content type to `application/json`.
+
+        Messages to a `url_group` are sent to the shard chosen by the name
+        of the url group, unless a `key` is given, as the url groups belong
+        to a single account.
+
+        See `MessageApi.publish_json` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, url_group=url_group)
+        return await self.run(
+            lambda client: client.message.publish_json(
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                delay=delay,
+                not_before=not_before,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                flow_control=flow_control,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    async def enqueue(
+        self,
+        *,
+        queue: str,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[AsyncRequestBody] = None,
+        content_type: Optional[str] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message on one of the shards.
+
+        Messages are sent to the shard chosen by the name of the queue,
+        unless a `key` is given, as the queues belong to a single account,
+        and splitting a queue across the shards would change its
+        parallelism and ordering.
+
+        See `MessageApi.enqueue` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, queue=queue)
+        return await self.run(
+            lambda client: client.message.enqueue(
+                queue=queue,
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                content_type=content_type,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    async def enqueue_json(
+        self,
+        *,
+        queue: str,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[Any] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message on one of the shards, automatically serializing
+        the body as JSON string, and setting content type to `application/json`.
+
+        Messages are sent to the shard chosen by the name of the queue,
+        unless a `key` is given, as the queues belong to a single account,
+        and splitting a queue across the shards would change its
+        parallelism and ordering.
+
+        See `MessageApi.enqueue_json` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, queue=queue)
+        return await self.run(
+            lambda client: client.message.enqueue_json(
+                queue=queue,
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    async def batch(
+        self,
+        messages: List[BatchRequest],
+        *,
+        key: Optional[str] = None,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """
+        Publishes or enqueues the messages in a single request, on one
+        of the shards.
+
+        :param messages: Messages to publish or enqueue.
+        :param key: Key to choose the shard by. If not given, the name of the
+            queue or url group of the messages is used, and round-robin if
+            they have none. It is required for the messages of multiple
+            queues or url groups.
+        """
+        shard_key, pinned = get_batch_shard_key(key, messages)
+        return await self.run(
+            lambda client: client.message.batch(messages),
+            key=shard_key,
+            pinned=pinned,
+            message_count=len(messages),
+        )
+
+    async def batch_json(
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        key: Optional[str] = None,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """
+        Publishes or enqueues the messages in a single request, on one
+        of the shards, after serializing their bodies as JSON strings.
+
+        :param messages: Messages to publish or enqueue.
+        :param key: Key to choose the shard by. If not given, the name of the
+            queue or url group of the messages is used, and round-robin if
+            they have none. It is required for the messages of multiple
+            queues or url groups.
+        """
+        shard_key, pinned = get_batch_shard_key(key, messages)
+        return await self.run(
+            lambda client: client.message.batch_json(messages),
+            key=shard_key,
+            pinned=pinned,
+            message_count=len(messages),
+        )
@@ -0,0 +1,258 @@
+import threading
+import time
+from typing import Any, List, Optional, Union
+
+from qstash.client import QStash
+from qstash.errors import QStashError
+from qstash.message import (
+    BatchJsonRequest,
+    BatchRequest,
+    BatchResponse,
+    BatchUrlGroupResponse,
+)
+
+DEFAULT_HIGH_WATERMARK = 10_000
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class BackpressureState:
+    """
+    Decides whether the producers should wait, from the backlog polled
+    from QStash and the messages enqueued since then.
+
+    Producers are paused once the backlog reaches the high watermark,
+    and resumed once it drops to the low watermark.
+    """
+
+    def __init__(self, high_watermark: int, low_watermark: Optional[int]) -> None:
+        if high_watermark < 1:
+            raise QStashError("'high_watermark' must be at least 1.")
+
+        if low_watermark is None:
+            low_watermark = high_watermark // 2
+
+        if not 0 <= low_watermark <= high_watermark:
+            raise QStashError("'low_watermark' must be between 0 and 'high_watermark'.")
+
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+
+        self.backlog = 0
+        """Backlog reported by QStash on the last poll."""
+
+        self.enqueued = 0
+        """Number of messages enqueued since the last poll."""
+
+        self.paused = False
+        """Whether the producers should wait."""
+
+    @property
+    def estimate(self) -> int:
+        """Estimated backlog, including the messages enqueued since the last poll."""
+        return self.backlog + self.enqueued
+
+    def update(self, backlog: int) -> None:
+        self.backlog = backlog
+        self.enqueued = 0
+        self._check()
+
+    def add(self, count: int) -> None:
+        self.enqueued += count
+        self._check()
+
+    def _check(self) -> None:
+        estimate = self.estimate
+        if self.paused and estimate <= self.low_watermark:
+            self.paused = False
+        elif not self.paused and estimate >= self.high_watermark:
+            self.paused = True
+
+
+class BackpressureEnqueuer:
+    """
+    Enqueues messages on a queue, blocking the producers while the backlog
+    of the queue is above the watermarks.
+
+    The backlog is the larger of the `lag` of the queue and the
+    `wait_list_size` of the flow control key, if given. They are polled
+    in a background thread, and the messages enqueued between the polls
+    are added to the last polled backlog, so that a fast producer does
+    not overshoot the high watermark by a whole poll interval.
+    """
+
+    def __init__(
+        self,
+        client: QStash,
+        queue: str,
+        *,
+        flow_control_key: Optional[str] = None,
+        high_watermark: int = DEFAULT_HIGH_WATERMARK,
+        low_watermark: Optional[int] = None,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        timeout: Optional[float] = None,
+        start: bool = True,
+    ) -> None:
+        """
+        :param client: Client used to poll the backlog and enqueue the messages.
+        :param queue: Name of the queue to enqueue the messages on.
+        :param flow_control_key: Flow control key of the messages, whose wait
+            list is counted in the backlog.
+        :param high_watermark: Backlog at which the producers start waiting.
+        :param low_watermark: Backlog at which the waiting producers resume.
+            Half of the high watermark by default.
+        :param poll_interval: Number of seconds between the polls of the backlog.
+        :param timeout: Maximum number of seconds a producer waits, before
+            `QStashError` is raised. Waits indefinitely by default.
+        :param start: Whether to poll the backlog right away.
+        """
+        self._client = client
+        self._flow_control_key = flow_control_key
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+
+        self._state = BackpressureState(high_watermark, low_watermark)
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.queue = queue
+        """Name of the queue the messages are enqueued on."""
+
+        self.last_error: Optional[Exception] = None
+        """Error of the last poll, if it failed."""
+
+        if start:
+            self.start()
+
+    @property
+    def backlog(self) -> int:
+        """
+        Estimated backlog, including the messages enqueued since the last poll.
+        """
+        with self._condition:
+            return self._state.estimate
+
+    @property
+    def paused(self) -> bool:
+        """Whether the producers are waiting for the backlog to drain."""
+        with self._condition:
+            return self._state.paused
+
+    def poll(self) -> int:
+        """Polls the backlog from QStash, and returns it."""
+        backlog = self._client.queue.get(self.queue).lag
+        if self._flow_control_key is not None:
+            info = self._client.flow_control.get(self._flow_control_key)
+            backlog = max(backlog, info.wait_list_size)
+
+        with self._condition:
+            self._state.update(backlog)
+            self._condition.notify_all()
+
+        return backlog
+
+    def wait(self) -> None:
+        """
+        Blocks until the backlog is below the watermarks.
+
+        Raises `QStashError` if it is not, in `timeout` seconds.
+        """
+        deadline = (
+            time.monotonic() + self._timeout if self._timeout is not None else None
+        )
+        with self._condition:
+            while self._state.paused:
+                remaining = (
+                    deadline - time.monotonic() if deadline is not None else None
+                )
+                if remaining is not None and remaining <= 0:
+                    raise QStashError(
+                        f"Timed out waiting for the backlog of the queue {self.queue} "
+                        f"to drop to {self._state.low_watermark}, "
+                        f"it is {self._state.estimate}."
+                    )
+
+                self._condition.wait(remaining)
+
+    def enqueue(
+        self, message: BatchRequest
+    ) -> Union[BatchResponse, List[BatchUrlGroupResponse]]:
+        """Waits for the backlog, and enqueues the message."""
+        return self.batch([message])[0]
+
+    def enqueue_json(
+        self, message: BatchJsonRequest
+    ) -> Union[BatchResponse, List[BatchUrlGroupResponse]]:
+        """
+        Waits for the backlog, and enqueues the message, after serializing
+        its body as JSON string.
+        """
+        return self.batch_json([message])[0]
+
+    def batch(
+        self, messages: List[BatchRequest]
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """Waits for the backlog, and enqueues the messages in a single request."""
+        self.wait()
+        res = self._client.message.batch(
+            [{**message, "queue": self.queue} for message in messages]
+        )
+        self._add(len(messages))
+        return res
+
+    def batch_json(
+        self, messages: List[BatchJsonRequest]
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """
+        Waits for the backlog, and enqueues the messages in a single request,
+        after serializing their bodies as JSON strings.
+        """
+        self.wait()
+        res = self._client.message.batch_json(
+            [{**message, "queue": self.queue} for message in messages]
+        )
+        self._add(len(messages))
+        return res
+
+    def start(self) -> None:
+        """Polls the backlog, and starts polling it in the background."""
+        if self._thread is not None:
+            return
+
+        self.poll()
+
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._poll_forever,
+            name="qstash-backpressure",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stops polling the backlog."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "BackpressureEnqueuer":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _add(self, count: int) -> None:
+        with self._condition:
+            self._state.add(count)
+
+    def _poll_forever(self) -> None:
+        while not self._stopped.wait(self._poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                # The last polled backlog is kept until a poll succeeds.
+                self.last_error = e
+                continue
+
+            self.last_error = None
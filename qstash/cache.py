@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Optional, Tuple, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LruCache(Generic[K, V]):
+    """
+    Thread-safe, in-memory cache that evicts the least recently used
+    entries, and optionally expires the entries after a time to live.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """
+        :param maxsize: Maximum number of entries to keep.
+        :param ttl: Number of seconds after which the entries expire.
+            If not given, entries are only evicted when the cache is full.
+        """
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> Optional[float]:
+        """Number of seconds after which the entries expire, if any."""
+        return self._ttl
+
+    def get(self, key: K) -> Optional[V]:
+        """Returns the value of the key, if it is cached and not expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        """Caches the value of the key, evicting the oldest entry if full."""
+        expires_at = (
+            time.monotonic() + self._ttl if self._ttl is not None else float("inf")
+        )
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        """Removes the key, and returns its value if it was cached."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        """Removes all the entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -4,6 +4,8 @@ import re
 
 @dataclasses.dataclass
 class LlmProvider:
+    __slots__ = ("name", "base_url", "token")
+
     name: str
     """Name of the LLM provider."""
 
@@ -0,0 +1,232 @@
+import abc
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+from typing import Optional
+
+from qstash.errors import ClaimCheckError
+
+CLAIM_CHECK_FIELD = "upstash_claim_check"
+
+DEFAULT_CLAIM_CHECK_THRESHOLD = 256 * 1024
+
+
+class BlobStore(abc.ABC):
+    """Storage for the bodies offloaded by `ClaimCheck`."""
+
+    @abc.abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Stores the data under the key, overwriting any existing data."""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> bytes:
+        """Returns the data stored under the key."""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Deletes the data stored under the key, if any."""
+
+
+class FileSystemBlobStore(BlobStore):
+    """Stores the blobs as files in a directory."""
+
+    def __init__(self, directory: str) -> None:
+        """
+        :param directory: Directory to store the blobs in. It is created
+            if it does not exist.
+        """
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            # Keys are content hashes, so the existing blob is the same.
+            return
+
+        # Written to a temporary file first, so that readers never see
+        # a partially written blob.
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ClaimCheckError(f"Blob not found: {key}")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, key: str) -> str:
+        if not key or os.sep in key or key.startswith("."):
+            raise ClaimCheckError(f"Invalid blob key: {key}")
+
+        return os.path.join(self._directory, key)
+
+
+@dataclasses.dataclass
+class ClaimCheckReference:
+    __slots__ = ("key", "sha256", "size", "content_type")
+
+    key: str
+    """Key of the blob in the blob store."""
+
+    sha256: str
+    """Hex encoded SHA-256 hash of the blob."""
+
+    size: int
+    """Size of the blob in bytes."""
+
+    content_type: Optional[str]
+    """MIME type of the original body."""
+
+
+class ClaimCheck:
+    """
+    Offloads the large message bodies to a blob store, and publishes
+    a small reference to them instead.
+
+    The references can be resolved on the receiving side with
+    `Receiver.resolve_body`.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore,
+        *,
+        threshold: int = DEFAULT_CLAIM_CHECK_THRESHOLD,
+    ) -> None:
+        """
+        :param store: Store to offload the bodies to.
+        :param threshold: Size in bytes above which the bodies are offloaded.
+        """
+        self.store = store
+        self.threshold = threshold
+
+    def offload(self, body: object, content_type: Optional[str]) -> Optional[str]:
+        """
+        Stores the body in the blob store if it is larger than the threshold,
+        and returns the reference to publish instead of it.
+
+        Returns `None` if the body is not offloaded. Bodies that are not
+        in memory, such as files and iterators, are never offloaded.
+        """
+        data = self.data_to_offload(body)
+        if data is None:
+            return None
+
+        return self.put(data, content_type)
+
+    def data_to_offload(self, body: object) -> Optional[bytes]:
+        """Returns the data of the body, if it should be offloaded."""
+        if isinstance(body, str):
+            data = body.encode()
+        elif isinstance(body, (bytes, bytearray, memoryview)):
+            data = bytes(body)
+        else:
+            return None
+
+        if len(data) <= self.threshold:
+            return None
+
+        return data
+
+    def put(self, data: bytes, content_type: Optional[str]) -> str:
+        """Stores the data in the blob store, and returns its reference."""
+        digest = hashlib.sha256(data).hexdigest()
+        self.store.put(digest, data)
+
+        return json.dumps(
+            {
+                CLAIM_CHECK_FIELD: {
+                    "key": digest,
+                    "sha256": digest,
+                    "size": len(data),
+                    "content_type": content_type,
+                }
+            }
+        )
+
+
+def parse_claim_check_reference(
+    body: Optional[str],
+) -> Optional[ClaimCheckReference]:
+    """Returns the claim check reference in the body, if it is one."""
+    if not body or CLAIM_CHECK_FIELD not in body[:64]:
+        return None
+
+    try:
+        reference = json.loads(body)[CLAIM_CHECK_FIELD]
+        return ClaimCheckReference(
+            key=reference["key"],
+            sha256=reference["sha256"],
+            size=reference["size"],
+            content_type=reference.get("content_type"),
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class ResolvedBody:
+    """
+    Body of a received message, whose data is fetched from the blob store
+    and verified on first access, if the message is a claim check reference.
+    """
+
+    def __init__(
+        self,
+        body: str,
+        reference: Optional[ClaimCheckReference],
+        store: BlobStore,
+    ) -> None:
+        self._body = body
+        self._store = store
+        self._data: Optional[bytes] = None
+
+        self.reference = reference
+        """The claim check reference, if the message is one."""
+
+    @property
+    def content_type(self) -> Optional[str]:
+        """MIME type of the original body, if the message is a reference."""
+        return self.reference.content_type if self.reference is not None else None
+
+    def read(self) -> bytes:
+        """
+        Returns the body, after fetching it from the blob store and
+        verifying its hash, if the message is a reference.
+        """
+        if self._data is not None:
+            return self._data
+
+        if self.reference is None:
+            self._data = self._body.encode()
+            return self._data
+
+        data = self._store.get(self.reference.key)
+        digest = hashlib.sha256(data).hexdigest()
+        if digest != self.reference.sha256:
+            raise ClaimCheckError(
+                f"Invalid blob hash: {digest}, want: {self.reference.sha256}"
+            )
+
+        self._data = data
+        return data
+
+    def text(self) -> str:
+        """Returns the body decoded as UTF-8."""
+        return self.read().decode()
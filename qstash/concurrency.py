@@ -0,0 +1,69 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from qstash.errors import QStashError
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_CONCURRENCY = 8
+
+
+def map_concurrently(
+    fn: Callable[[T], R],
+    items: Sequence[T],
+    concurrency: int,
+) -> List[Union[R, Exception]]:
+    """
+    Calls `fn` for each item on a pool of at most `concurrency` threads.
+
+    Results are returned in the order of the items. Exceptions raised
+    for an item are returned in its place, instead of being raised.
+    """
+    if concurrency < 1:
+        raise QStashError("'concurrency' must be at least 1.")
+
+    def call(item: T) -> Union[R, Exception]:
+        try:
+            return fn(item)
+        except Exception as e:
+            return e
+
+    if concurrency == 1 or len(items) <= 1:
+        return [call(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(call, items))
+
+
+def hedge(
+    fn: Callable[[], R],
+    delay: float,
+) -> Tuple[R, Optional["Future[R]"]]:
+    """
+    Calls `fn`, and calls it once more if the first call does not
+    complete in `delay` seconds.
+
+    Returns the result of the call that succeeds first, along with the
+    future of the other call, if it was made. The other call is left
+    running in the background. If both calls fail, the error of the
+    first one is raised.
+    """
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        first = executor.submit(fn)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result(), None
+
+        second = executor.submit(fn)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future, other in ((first, second), (second, first)):
+                if future in done and future.exception() is None:
+                    return future.result(), other
+
+        return first.result(), second
+    finally:
+        executor.shutdown(wait=False)
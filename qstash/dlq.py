@@ -8,6 +8,14 @@ from qstash.message import Message, parse_flow_control
 
 @dataclasses.dataclass
 class DlqMessage(Message):
+    __slots__ = (
+        "dlq_id",
+        "response_status",
+        "response_headers",
+        "response_body",
+        "response_body_base64",
+    )
+
     dlq_id: str
     """Unique id within the DLQ."""
 
@@ -70,6 +78,8 @@ class DlqFilter(TypedDict, total=False):
 
 @dataclasses.dataclass
 class ListDlqMessagesResponse:
+    __slots__ = ("cursor", "messages")
+
     cursor: Optional[str]
     """
     A cursor which can be used in subsequent requests to paginate through
@@ -204,6 +214,7 @@ class DlqApi:
         response = self._http.request(
             path="/v2/dlq",
             method="GET",
+            lane="bulk",
             params=params,
         )
 
@@ -1,9 +1,19 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from qstash.message import CompactBatchResponse
 
 
 class QStashError(Exception): ...
 
 
+class RequestError(QStashError):
+    def __init__(self, status_code: int, body: str) -> None:
+        super().__init__(f"Request failed with status: {status_code}, body: {body}")
+        self.status_code = status_code
+        self.body = body
+
+
 class SignatureError(QStashError):
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
@@ -31,3 +41,18 @@ class DailyMessageLimitExceededError(QStashError):
         self.limit = limit
         self.remaining = remaining
         self.reset = reset
+
+
+class BatchChunkError(QStashError):
+    def __init__(self, result: "CompactBatchResponse", error: Exception) -> None:
+        super().__init__(
+            f"Sending a batch chunk failed after {len(result)} of the messages "
+            f"were accepted: {error}"
+        )
+        self.result = result
+        self.error = error
+
+
+class ClaimCheckError(QStashError):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
@@ -8,6 +8,20 @@ from qstash.http import HttpClient
 class FlowControlInfo:
     """Information about a flow control key."""
 
+    __slots__ = (
+        "key",
+        "wait_list_size",
+        "parallelism_max",
+        "parallelism_count",
+        "rate_max",
+        "rate_count",
+        "rate_period",
+        "rate_period_start",
+        "is_paused",
+        "is_pinned_parallelism",
+        "is_pinned_rate",
+    )
+
     key: str
     """The flow control key."""
 
@@ -46,6 +60,8 @@ class FlowControlInfo:
 class GlobalParallelismInfo:
     """Information about global parallelism."""
 
+    __slots__ = ("parallelism_max", "parallelism_count")
+
     parallelism_max: int
     """The maximum global parallelism."""
 
@@ -1,6 +1,20 @@
+import io
 import math
+import threading
 import time
-from typing import TypedDict, Callable, Optional, Union, Literal, Any, Dict
+from typing import (
+    IO,
+    TypedDict,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+    Literal,
+    Any,
+    Dict,
+    cast,
+)
 
 import httpx
 
@@ -8,7 +22,9 @@ from qstash.errors import (
     RateLimitExceededError,
     QStashError,
     DailyMessageLimitExceededError,
+    RequestError,
 )
+from qstash.rate_limit import FileRateLimiter
 
 
 class RetryConfig(TypedDict, total=False):
@@ -38,6 +54,25 @@ BASE_URL = "https://qstash.upstash.io"
 
 HttpMethod = Literal["GET", "POST", "PUT", "DELETE", "PATCH"]
 
+Lane = Literal["interactive", "bulk"]
+"""
+Lane of a request.
+
+Bulk requests, such as batches and listings, can be limited to a number
+of concurrent requests, so that the rest of the connection pool stays
+available to the interactive requests.
+"""
+
+RequestBody = Union[str, bytes, bytearray, memoryview, IO[bytes], Iterable[bytes]]
+"""
+Body of a request.
+
+Buffers are sent without being copied as a whole, and file objects and
+byte iterators are streamed.
+"""
+
+BODY_CHUNK_SIZE = 64 * 1024
+
 
 def daily_message_limit_error(headers: httpx.Headers) -> DailyMessageLimitExceededError:
     limit = headers.get("RateLimit-Limit")
@@ -61,6 +96,88 @@ def burst_rate_limit_error(headers: httpx.Headers) -> RateLimitExceededError:
     )
 
 
+def file_position(body: Any) -> Optional[int]:
+    """
+    Returns the current position of the seekable file bodies,
+    to rewind them to before resending.
+    """
+    if not hasattr(body, "read"):
+        return None
+
+    try:
+        if not body.seekable():
+            return None
+
+        return body.tell()  # type:ignore[no-any-return]
+    except (AttributeError, OSError):
+        return None
+
+
+def is_replayable(body: Any) -> bool:
+    """
+    Returns whether the body can be sent more than once, so that the
+    request can be retried safely.
+    """
+    if body is None or isinstance(body, (str, bytes, bytearray, memoryview)):
+        return True
+
+    return file_position(body) is not None
+
+
+def body_length(body: Any) -> Optional[int]:
+    """
+    Returns the length of the buffer and seekable file bodies, which
+    are not computed by httpx while building the request.
+    """
+    if isinstance(body, (bytearray, memoryview)):
+        return memoryview(body).nbytes
+
+    position = file_position(body)
+    if position is None:
+        return None
+
+    file = cast(IO[bytes], body)
+    end = file.seek(0, io.SEEK_END)
+    file.seek(position)
+    return end - position
+
+
+def iter_buffer(buffer: Union[bytearray, memoryview]) -> Iterator[bytes]:
+    view = memoryview(buffer)
+    if not view.c_contiguous:
+        yield view.tobytes()
+        return
+
+    view = view.cast("B")
+    for start in range(0, len(view), BODY_CHUNK_SIZE):
+        # Slicing a memoryview does not copy the underlying buffer.
+        yield view[start : start + BODY_CHUNK_SIZE]  # type:ignore[misc]
+
+
+def request_content(
+    body: Optional[RequestBody],
+) -> Optional[Union[str, bytes, Iterable[bytes]]]:
+    if isinstance(body, (bytearray, memoryview)):
+        return iter_buffer(body)
+
+    return body
+
+
+def prepare_body_headers(headers: Dict[str, str], body: Any) -> Dict[str, str]:
+    length = body_length(body)
+    if length is not None:
+        headers["Content-Length"] = str(length)
+
+    return headers
+
+
+def check_bulk_concurrency(bulk_concurrency: int) -> int:
+    if bulk_concurrency < 1:
+        raise QStashError("'bulk_concurrency' must be at least 1.")
+
+    return bulk_concurrency
+
+
 def raise_for_non_ok_status(response: httpx.Response) -> None:
     if response.is_success:
         return
@@ -72,8 +189,21 @@ def raise_for_non_ok_status(response: httpx.Response) -> None:
         else:
             raise burst_rate_limit_error(headers)
 
-    raise QStashError(
-        f"Request failed with status: {response.status_code}, body: {response.text}"
+    raise RequestError(response.status_code, response.text)
+
+
+def is_rejected(error: Exception) -> bool:
+    """
+    Returns whether the request was rejected for its content, such as
+    an invalid destination, so that sending it again can not succeed.
+
+    Authorization and rate limit errors are not counted, as they are not
+    caused by the content of the request.
+    """
+    return (
+        isinstance(error, RequestError)
+        and 400 <= error.status_code < 500
+        and error.status_code not in (401, 403, 408, 429)
     )
 
 
@@ -83,8 +213,16 @@ class HttpClient:
         token: str,
         retry: Optional[Union[Literal[False], RetryConfig]],
         base_url: Optional[str] = None,
+        rate_limiter: Optional[FileRateLimiter] = None,
+        bulk_concurrency: Optional[int] = None,
     ) -> None:
         self._token = f"Bearer {token}"
+        self._rate_limiter = rate_limiter
+        self._bulk_lane = (
+            threading.BoundedSemaphore(check_bulk_concurrency(bulk_concurrency))
+            if bulk_concurrency is not None
+            else None
+        )
 
         if retry is None:
             self._retry = DEFAULT_RETRY
@@ -105,40 +243,71 @@ class HttpClient:
         path: str,
         method: HttpMethod,
         headers: Optional[Dict[str, str]] = None,
-        body: Optional[Union[str, bytes]] = None,
+        body: Optional[RequestBody] = None,
         params: Optional[Dict[str, str]] = None,
         parse_response: bool = True,
         base_url: Optional[str] = None,
         token: Optional[str] = None,
+        lane: Lane = "interactive",
     ) -> Any:
+        # Only the requests to QStash draw from its rate limit.
+        rate_limiter = self._rate_limiter if base_url is None else None
+        bulk_lane = self._bulk_lane if lane == "bulk" else None
+
         base_url = base_url or self._base_url
         token = token or self._token
 
         url = base_url + path
-        headers = {"Authorization": token, **(headers or {})}
+        headers = prepare_body_headers(
+            {"Authorization": token, **(headers or {})}, body
+        )
+
+        # Streamed bodies can only be sent once, and file bodies
+        # must be rewound to their initial position before resending.
+        replayable = is_replayable(body)
+        position = file_position(body)
 
         max_attempts = 1 + max(0, self._retry["retries"])
         last_error = None
         response = None
         for attempt in range(max_attempts):
+            if attempt > 0 and position is not None:
+                cast(IO[bytes], body).seek(position)
+
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+
+            if bulk_lane is not None:
+                bulk_lane.acquire()
+
             try:
                 response = self._client.request(
                     method=method,
                     url=url,
                     params=params,
                     headers=headers,
-                    content=body,
+                    content=request_content(body),
                 )
                 break  # Break the loop as soon as we receive a proper response
             except Exception as e:
                 last_error = e
-                backoff = self._retry["backoff"](attempt) / 1000
-                time.sleep(backoff)
+                if not replayable:
+                    break
+            finally:
+                # The lane is not held during the backoff.
+                if bulk_lane is not None:
+                    bulk_lane.release()
+
+            backoff = self._retry["backoff"](attempt) / 1000
+            time.sleep(backoff)
 
         if not response:
             # Can't be None at this point
             raise last_error  # type:ignore[misc]
 
+        if rate_limiter is not None:
+            rate_limiter.update(response.status_code, response.headers)
+
         raise_for_non_ok_status(response)
 
         if parse_response:
@@ -1,7 +1,18 @@
+import array
 import dataclasses
 import enum
-from typing import Any, Dict, List, Optional, TypedDict
-
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    TypedDict,
+)
+
+from qstash.concurrency import DEFAULT_CONCURRENCY, map_concurrently
 from qstash.http import HttpClient, HttpMethod
 from qstash.message import parse_flow_control, FlowControlProperties
 
@@ -45,6 +56,34 @@ class LogState(enum.Enum):
 
 @dataclasses.dataclass
 class Log:
+    __slots__ = (
+        "time",
+        "message_id",
+        "state",
+        "error",
+        "next_delivery_time",
+        "url",
+        "url_group",
+        "endpoint",
+        "queue",
+        "schedule_id",
+        "body_base64",
+        "headers",
+        "callback_headers",
+        "failure_callback_headers",
+        "response_status",
+        "response_headers",
+        "response_body",
+        "timeout",
+        "method",
+        "callback",
+        "failure_callback",
+        "max_retries",
+        "retry_delay_expression",
+        "flow_control",
+        "label",
+    )
+
     time: int
     """Unix time of the log entry, in milliseconds."""
 
@@ -158,6 +197,8 @@ class LogFilter(TypedDict, total=False):
 
 @dataclasses.dataclass
 class ListLogsResponse:
+    __slots__ = ("cursor", "logs")
+
     cursor: Optional[str]
     """
     A cursor which can be used in subsequent requests to paginate through 
@@ -254,6 +295,89 @@ def parse_logs_response(response: List[Dict[str, Any]]) -> List[Log]:
     return logs
 
 
+LATEST_STATES_CHUNK_SIZE = 50
+"""Maximum number of message ids queried in a single events request."""
+
+LOG_STATES = list(LogState)
+LOG_STATE_CODES = {state.value: code for code, state in enumerate(LOG_STATES, 1)}
+
+
+class LatestStates(Mapping[str, LogState]):
+    """
+    Latest states of a set of messages, by message id.
+
+    Only the time and the state of the newest event of each message are
+    kept, in arrays indexed by the position of the message id, so the
+    memory use does not depend on the number of events of the messages.
+
+    Messages without any events are not included.
+    """
+
+    def __init__(self, message_ids: Iterable[str]) -> None:
+        self._indexes: Dict[str, int] = {}
+        for message_id in message_ids:
+            self._indexes.setdefault(message_id, len(self._indexes))
+
+        count = len(self._indexes)
+        self._times = array.array("q", bytes(8 * count))
+        # Codes of the states in `LOG_STATE_CODES`, or `0` if unknown.
+        self._states = bytearray(count)
+
+    def __getitem__(self, message_id: str) -> LogState:
+        code = self._states[self._indexes[message_id]]
+        if code == 0:
+            raise KeyError(message_id)
+
+        return LOG_STATES[code - 1]
+
+    def __iter__(self) -> Iterator[str]:
+        states = self._states
+        return (
+            message_id
+            for message_id, index in self._indexes.items()
+            if states[index] != 0
+        )
+
+    def __len__(self) -> int:
+        return len(self._states) - self._states.count(0)
+
+    def __contains__(self, message_id: object) -> bool:
+        index = self._indexes.get(message_id)  # type:ignore[call-overload]
+        return index is not None and self._states[index] != 0
+
+    def time(self, message_id: str) -> Optional[int]:
+        """Unix time of the newest event of the message, in milliseconds."""
+        index = self._indexes[message_id]
+        return self._times[index] if self._states[index] != 0 else None
+
+    def missing(self) -> List[str]:
+        """Ids of the messages without any events."""
+        states = self._states
+        return [
+            message_id
+            for message_id, index in self._indexes.items()
+            if states[index] == 0
+        ]
+
+    def chunks(self, chunk_size: int = LATEST_STATES_CHUNK_SIZE) -> List[List[str]]:
+        ids = list(self._indexes)
+        return [ids[i : i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+    def update(self, events: List[Dict[str, Any]]) -> None:
+        """Keeps the newest event of each message among the raw events."""
+        for event in events:
+            index = self._indexes.get(event["messageId"])
+            if index is None:
+                continue
+
+            event_time = event["time"]
+            if self._states[index] != 0 and self._times[index] >= event_time:
+                continue
+
+            self._times[index] = event_time
+            self._states[index] = LOG_STATE_CODES[event["state"]]
+
+
 class LogApi:
     def __init__(self, http: HttpClient) -> None:
         self._http = http
@@ -282,14 +406,57 @@ class LogApi:
         response = self._http.request(
             path="/v2/events",
             method="GET",
+            lane="bulk",
             params=params,
         )
 
-        print(response)
-
         logs = parse_logs_response(response["events"])
 
         return ListLogsResponse(
             cursor=response.get("cursor"),
             logs=logs,
         )
+
+    def latest_states(
+        self,
+        message_ids: List[str],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> LatestStates:
+        """
+        Gets the latest states of the messages.
+
+        The message ids are queried in chunks, with at most `concurrency`
+        queries sent at the same time. Only the newest event of each message
+        is kept, so the memory use is bounded by the number of messages.
+
+        :param message_ids: Ids of the messages.
+        :param concurrency: Maximum number of events queries sent at the
+            same time.
+        """
+        states = LatestStates(message_ids)
+
+        def query(chunk: List[str]) -> None:
+            cursor = None
+            while True:
+                response = self._http.request(
+                    path="/v2/events",
+                    method="GET",
+                    lane="bulk",
+                    params=prepare_list_logs_request_params(
+                        cursor=cursor,
+                        count=1000,
+                        filter={"message_ids": chunk},
+                    ),
+                )
+
+                states.update(response["events"])
+                cursor = response.get("cursor")
+                if not cursor:
+                    return
+
+        for result in map_concurrently(query, states.chunks(), concurrency):
+            if isinstance(result, Exception):
+                raise result
+
+        return states
@@ -1,18 +1,56 @@
+import array
+import copy
 import dataclasses
+import hashlib
 import json
+import threading
+import time
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import repeat
 from typing import (
+    Callable,
     Union,
     Optional,
     Literal,
     Dict,
     Any,
+    Iterable,
+    Iterator,
     List,
+    Mapping,
+    Sequence,
+    Set,
+    TYPE_CHECKING,
+    Tuple,
     TypedDict,
+    TypeVar,
+    cast,
+    overload,
 )
 
+from qstash.cache import LruCache
+from qstash.claim_check import ClaimCheck
 from qstash.chat import LlmProvider
-from qstash.errors import QStashError
-from qstash.http import HttpClient, HttpMethod
+from qstash.concurrency import DEFAULT_CONCURRENCY, hedge, map_concurrently
+from qstash.errors import BatchChunkError, QStashError
+from qstash.http import HttpClient, HttpMethod, RequestBody, is_rejected
+from qstash.spread import (
+    SpreadProfile,
+    check_spread_window,
+    delay_seconds,
+    spread_delay,
+)
+
+if TYPE_CHECKING:
+    # Imported lazily at runtime, as the log module depends on this one.
+    from qstash.log import Log, LogFilter
 
 
 class LlmApi(TypedDict):
@@ -59,8 +97,33 @@ class Redact(TypedDict, total=False):
     """
 
 
+@dataclasses.dataclass(frozen=True)
+class RawJson:
+    """
+    An already serialized JSON value.
+
+    When used as the body of the JSON variants of the publish, enqueue,
+    and batch methods, the value is sent as is, instead of being
+    serialized once more.
+    """
+
+    __slots__ = ("value",)
+
+    value: Union[str, bytes]
+    """Serialized JSON value."""
+
+    def __getstate__(self) -> Union[str, bytes]:
+        return self.value
+
+    def __setstate__(self, state: Union[str, bytes]) -> None:
+        # Frozen instances can not be assigned to, even when unpickled.
+        object.__setattr__(self, "value", state)
+
+
 @dataclasses.dataclass
 class FlowControlProperties:
+    __slots__ = ("key", "parallelism", "rate", "period")
+
     key: str
     """Flow control key."""
 
@@ -76,6 +139,8 @@ class FlowControlProperties:
 
 @dataclasses.dataclass
 class PublishResponse:
+    __slots__ = ("message_id", "deduplicated")
+
     message_id: str
     """Unique id of the message."""
 
@@ -85,6 +150,8 @@ class PublishResponse:
 
 @dataclasses.dataclass
 class PublishUrlGroupResponse:
+    __slots__ = ("message_id", "url", "deduplicated")
+
     message_id: str
     """Unique id of the message."""
 
@@ -97,6 +164,8 @@ class PublishUrlGroupResponse:
 
 @dataclasses.dataclass
 class EnqueueResponse:
+    __slots__ = ("message_id", "deduplicated")
+
     message_id: str
     """Unique id of the message."""
 
@@ -106,6 +175,8 @@ class EnqueueResponse:
 
 @dataclasses.dataclass
 class EnqueueUrlGroupResponse:
+    __slots__ = ("message_id", "url", "deduplicated")
+
     message_id: str
     """Unique id of the message."""
 
@@ -118,6 +189,8 @@ class EnqueueUrlGroupResponse:
 
 @dataclasses.dataclass
 class BatchResponse:
+    __slots__ = ("message_id", "deduplicated")
+
     message_id: str
     """Unique id of the message."""
 
@@ -127,6 +200,8 @@ class BatchResponse:
 
 @dataclasses.dataclass
 class BatchUrlGroupResponse:
+    __slots__ = ("message_id", "url", "deduplicated")
+
     message_id: str
     """Unique id of the message."""
 
@@ -137,6 +212,182 @@ class BatchUrlGroupResponse:
     """Whether the message is a duplicate and was not sent to the destination."""
 
 
+def get_bit(bitmap: bytearray, index: int) -> bool:
+    return bool(bitmap[index >> 3] & (1 << (index & 7)))
+
+
+def append_bit(bitmap: bytearray, index: int, value: bool) -> None:
+    if index & 7 == 0:
+        bitmap.append(0)
+
+    if value:
+        bitmap[index >> 3] |= 1 << (index & 7)
+
+
+class CompactBatchResponse:
+    """
+    Memory compact result of a batch.
+
+    Instead of creating objects for every message, the message ids,
+    urls, and deduplication flags are stored in arrays, and the messages
+    sent to url groups are tracked with offsets into these arrays.
+
+    Indexing or iterating over it returns the same `BatchResponse`
+    or list of `BatchUrlGroupResponse` items as `batch`, which
+    are created lazily on access.
+
+    The methods taking a message index operate on the flattened list of
+    messages, where the messages of a url group take up one index for
+    each url in the group.
+    """
+
+    def __init__(self) -> None:
+        self._message_ids = bytearray()
+        self._message_id_ends = array.array("L")
+        self._urls = bytearray()
+        self._url_ends = array.array("L")
+        self._deduplicated = bytearray()
+        self._item_starts = array.array("L")
+        self._url_group_items = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._item_starts)
+
+    @overload
+    def __getitem__(
+        self, index: int
+    ) -> Union[BatchResponse, List[BatchUrlGroupResponse]]: ...
+
+    @overload
+    def __getitem__(
+        self, index: slice
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]: ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[
+        BatchResponse,
+        List[BatchUrlGroupResponse],
+        List[Union[BatchResponse, List[BatchUrlGroupResponse]]],
+    ]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        messages = self.item_messages(index)
+        if not get_bit(self._url_group_items, index):
+            return BatchResponse(
+                message_id=self.message_id(messages.start),
+                deduplicated=self.is_deduplicated(messages.start),
+            )
+
+        return [
+            BatchUrlGroupResponse(
+                message_id=self.message_id(i),
+                url=self.url(i) or "",
+                deduplicated=self.is_deduplicated(i),
+            )
+            for i in messages
+        ]
+
+    def __iter__(
+        self,
+    ) -> Iterator[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def message_count(self) -> int:
+        """Number of messages, counting each url of the url groups separately."""
+        return len(self._message_id_ends)
+
+    @property
+    def message_ids(self) -> List[str]:
+        """Ids of all the messages, in the order of the batch."""
+        return [self.message_id(i) for i in range(self.message_count)]
+
+    def item_messages(self, index: int) -> range:
+        """
+        Returns the range of the message indexes belonging to the
+        batch item at the given index.
+
+        It contains a single index, unless the item was sent to a url group.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("batch response index out of range")
+
+        start = self._item_starts[index]
+        end = (
+            self._item_starts[index + 1]
+            if index + 1 < len(self)
+            else self.message_count
+        )
+        return range(start, end)
+
+    def message_id(self, index: int) -> str:
+        """Returns the id of the message at the given message index."""
+        index = self._message_index(index)
+        start = self._message_id_ends[index - 1] if index > 0 else 0
+        return self._message_ids[start : self._message_id_ends[index]].decode()
+
+    def url(self, index: int) -> Optional[str]:
+        """
+        Returns the url of the message at the given message index,
+        if it was sent to a url group.
+        """
+        index = self._message_index(index)
+        start = self._url_ends[index - 1] if index > 0 else 0
+        end = self._url_ends[index]
+        if start == end:
+            return None
+
+        return self._urls[start:end].decode()
+
+    def is_deduplicated(self, index: int) -> bool:
+        """Returns whether the message at the given message index is a duplicate."""
+        return get_bit(self._deduplicated, self._message_index(index))
+
+    def extend(
+        self, response: List[Union[List[Dict[str, Any]], Dict[str, Any]]]
+    ) -> None:
+        """Appends the items of a batch response."""
+        for resp in response:
+            item_index = len(self._item_starts)
+            self._item_starts.append(self.message_count)
+
+            is_url_group = isinstance(resp, list)
+            append_bit(self._url_group_items, item_index, is_url_group)
+
+            if isinstance(resp, list):
+                for ug_resp in resp:
+                    self._append_message(ug_resp, ug_resp["url"])
+            else:
+                self._append_message(resp, None)
+
+    def _append_message(self, resp: Dict[str, Any], url: Optional[str]) -> None:
+        index = self.message_count
+
+        self._message_ids += resp["messageId"].encode()
+        self._message_id_ends.append(len(self._message_ids))
+
+        if url is not None:
+            self._urls += url.encode()
+        self._url_ends.append(len(self._urls))
+
+        append_bit(self._deduplicated, index, resp.get("deduplicated", False))
+
+    def _message_index(self, index: int) -> int:
+        if index < 0:
+            index += self.message_count
+
+        if not 0 <= index < self.message_count:
+            raise IndexError("message index out of range")
+
+        return index
+
+
 class BatchRequest(TypedDict, total=False):
     url: str
     """Url to send the message to."""
@@ -287,6 +538,9 @@ class BatchJsonRequest(TypedDict, total=False):
     """
     The request body passed to the endpoints after being serialized to 
     JSON string.
+
+    `RawJson` values and `bytes` are treated as already serialized JSON
+    and passed as is.
     """
 
     method: HttpMethod
@@ -405,6 +659,30 @@ class BatchJsonRequest(TypedDict, total=False):
 
 @dataclasses.dataclass
 class Message:
+    __slots__ = (
+        "message_id",
+        "url",
+        "url_group",
+        "endpoint",
+        "queue",
+        "body",
+        "body_base64",
+        "method",
+        "headers",
+        "callback_headers",
+        "failure_callback_headers",
+        "max_retries",
+        "retry_delay_expression",
+        "not_before",
+        "created_at",
+        "callback",
+        "failure_callback",
+        "schedule_id",
+        "caller_ip",
+        "flow_control",
+        "label",
+    )
+
     message_id: str
     """Id of the message."""
 
@@ -632,6 +910,136 @@ def prepare_headers(
     return h
 
 
+def serialize_json_body(body: Any) -> Union[str, bytes]:
+    if isinstance(body, RawJson):
+        return body.value
+
+    if isinstance(body, bytes):
+        return body
+
+    return json.dumps(body)
+
+
+def prepare_template_headers(
+    *,
+    url: Optional[str],
+    url_group: Optional[str],
+    api: Optional[ApiT],
+    content_type: Optional[str],
+    method: Optional[HttpMethod],
+    headers: Optional[Dict[str, str]],
+    callback_headers: Optional[Dict[str, str]],
+    failure_callback_headers: Optional[Dict[str, str]],
+    retries: Optional[int],
+    retry_delay: Optional[str],
+    callback: Optional[str],
+    failure_callback: Optional[str],
+    delay: Optional[Union[str, int]],
+    content_based_deduplication: Optional[bool],
+    timeout: Optional[Union[str, int]],
+    flow_control: Optional[FlowControl],
+    label: Optional[str],
+    redact: Optional[Redact],
+) -> Tuple[str, Dict[str, str], Dict[str, str]]:
+    """
+    Returns the destination, along with the headers to use for
+    publishing and enqueueing messages with the given options.
+    """
+    headers = dict(headers or {})
+    destination = get_destination(
+        url=url,
+        url_group=url_group,
+        api=api,
+        headers=headers,
+    )
+
+    enqueue_headers = prepare_headers(
+        content_type=content_type,
+        method=method,
+        headers=headers,
+        callback_headers=callback_headers,
+        failure_callback_headers=failure_callback_headers,
+        retries=retries,
+        retry_delay=retry_delay,
+        callback=callback,
+        failure_callback=failure_callback,
+        delay=None,
+        not_before=None,
+        deduplication_id=None,
+        content_based_deduplication=content_based_deduplication,
+        timeout=timeout,
+        flow_control=None,
+        label=label,
+        redact=redact,
+    )
+
+    publish_headers = {
+        **enqueue_headers,
+        **prepare_headers(
+            content_type=None,
+            method=None,
+            headers=None,
+            callback_headers=None,
+            failure_callback_headers=None,
+            retries=None,
+            retry_delay=None,
+            callback=None,
+            failure_callback=None,
+            delay=delay,
+            not_before=None,
+            deduplication_id=None,
+            content_based_deduplication=None,
+            timeout=None,
+            flow_control=flow_control,
+            label=None,
+            redact=None,
+        ),
+    }
+
+    return destination, publish_headers, enqueue_headers
+
+
+def merge_template_headers(
+    template_headers: Dict[str, str],
+    *,
+    content_type: Optional[str],
+    headers: Optional[Dict[str, str]],
+    deduplication_id: Optional[str],
+    delay: Optional[Union[str, int]],
+    not_before: Optional[int],
+) -> Dict[str, str]:
+    if (
+        content_type is None
+        and not headers
+        and deduplication_id is None
+        and delay is None
+        and not_before is None
+    ):
+        return template_headers
+
+    message_headers = prepare_headers(
+        content_type=content_type,
+        method=None,
+        headers=headers,
+        callback_headers=None,
+        failure_callback_headers=None,
+        retries=None,
+        retry_delay=None,
+        callback=None,
+        failure_callback=None,
+        delay=delay,
+        not_before=not_before,
+        deduplication_id=deduplication_id,
+        content_based_deduplication=None,
+        timeout=None,
+        flow_control=None,
+        label=None,
+        redact=None,
+    )
+
+    return {**template_headers, **message_headers}
+
+
 def parse_publish_response(
     response: Union[List[Dict[str, Any]], Dict[str, Any]],
 ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
@@ -676,48 +1084,390 @@ def parse_enqueue_response(
     )
 
 
-def prepare_batch_message_body(messages: List[BatchRequest]) -> str:
+def has_destination(msg: BatchRequest) -> bool:
+    return (
+        msg.get("url") is not None
+        or msg.get("url_group") is not None
+        or msg.get("api") is not None
+    )
+
+
+def prepare_batch_headers(
+    msg: BatchRequest,
+    headers: Optional[Dict[str, str]],
+) -> Dict[str, str]:
+    return prepare_headers(
+        content_type=msg.get("content_type"),
+        method=msg.get("method"),
+        headers=headers,
+        callback_headers=msg.get("callback_headers"),
+        failure_callback_headers=msg.get("failure_callback_headers"),
+        retries=msg.get("retries"),
+        retry_delay=msg.get("retry_delay"),
+        callback=msg.get("callback"),
+        failure_callback=msg.get("failure_callback"),
+        delay=msg.get("delay"),
+        not_before=msg.get("not_before"),
+        deduplication_id=msg.get("deduplication_id"),
+        content_based_deduplication=msg.get("content_based_deduplication"),
+        timeout=msg.get("timeout"),
+        flow_control=msg.get("flow_control"),
+        label=msg.get("label"),
+        redact=msg.get("redact"),
+    )
+
+
+def prepare_enqueue_headers(
+    msg: BatchRequest,
+    headers: Optional[Dict[str, str]],
+) -> Dict[str, str]:
+    """
+    Prepares the headers of a message to enqueue, leaving out the delay,
+    not before, and flow control options, the same way as `enqueue`.
+    """
+    return prepare_headers(
+        content_type=msg.get("content_type"),
+        method=msg.get("method"),
+        headers=headers,
+        callback_headers=msg.get("callback_headers"),
+        failure_callback_headers=msg.get("failure_callback_headers"),
+        retries=msg.get("retries"),
+        retry_delay=msg.get("retry_delay"),
+        callback=msg.get("callback"),
+        failure_callback=msg.get("failure_callback"),
+        delay=None,
+        not_before=None,
+        deduplication_id=msg.get("deduplication_id"),
+        content_based_deduplication=msg.get("content_based_deduplication"),
+        timeout=msg.get("timeout"),
+        flow_control=None,
+        label=msg.get("label"),
+        redact=msg.get("redact"),
+    )
+
+
+def generate_deduplication_id(
+    batch_message: Dict[str, Any],
+    occurrences: Dict[str, int],
+    key: Optional[str] = None,
+) -> str:
+    """
+    Derives a deduplication id from the destination, queue, headers,
+    and body of a batch message, so that sending the same batch again
+    produces the same ids.
+
+    Identical messages of a batch are told apart by the number of times
+    the same message occurred before them, which is tracked in `occurrences`.
+    Identical messages of different batches are only told apart by the
+    `key` of the batches, if given.
+    """
+    content = json.dumps(batch_message, sort_keys=True)
+    if key is not None:
+        content = json.dumps(key) + content
+
+    digest = hashlib.sha256(content.encode()).hexdigest()[:32]
+
+    count = occurrences.get(digest, 0)
+    occurrences[digest] = count + 1
+    if count == 0:
+        return digest
+
+    return f"{digest}-{count}"
+
+
+def prepare_batch_messages(
+    messages: List[BatchRequest],
+    defaults: Optional[BatchRequest] = None,
+    *,
+    auto_deduplication_id: Union[bool, str] = False,
+) -> List[Dict[str, Any]]:
+    check_auto_deduplication_id(auto_deduplication_id)
+
+    default_destination = None
+    default_destination_headers: Dict[str, str] = {}
+    default_headers: Dict[str, str] = {}
+    default_queue = None
+
+    if defaults:
+        if has_destination(defaults):
+            # Authorization header of the api is only forwarded to the
+            # messages using the default destination.
+            api_headers: Dict[str, str] = {}
+            default_destination = get_destination(
+                url=defaults.get("url"),
+                url_group=defaults.get("url_group"),
+                api=defaults.get("api"),
+                headers=api_headers,
+            )
+            default_destination_headers = prepare_batch_headers({}, api_headers)
+
+        default_headers = prepare_batch_headers(defaults, defaults.get("headers"))
+        default_queue = defaults.get("queue")
+
     batch_messages = []
 
     for msg in messages:
         user_headers = msg.get("headers", {})
-        destination = get_destination(
-            url=msg.get("url"),
-            url_group=msg.get("url_group"),
-            api=msg.get("api"),
-            headers=user_headers,
-        )
+        if default_destination is not None and not has_destination(msg):
+            destination = default_destination
+            headers = {
+                **default_headers,
+                **default_destination_headers,
+                **prepare_batch_headers(msg, user_headers),
+            }
+        else:
+            destination = get_destination(
+                url=msg.get("url"),
+                url_group=msg.get("url_group"),
+                api=msg.get("api"),
+                headers=user_headers,
+            )
 
-        headers = prepare_headers(
-            content_type=msg.get("content_type"),
-            method=msg.get("method"),
-            headers=user_headers,
-            callback_headers=msg.get("callback_headers"),
-            failure_callback_headers=msg.get("failure_callback_headers"),
-            retries=msg.get("retries"),
-            retry_delay=msg.get("retry_delay"),
-            callback=msg.get("callback"),
-            failure_callback=msg.get("failure_callback"),
-            delay=msg.get("delay"),
-            not_before=msg.get("not_before"),
-            deduplication_id=msg.get("deduplication_id"),
-            content_based_deduplication=msg.get("content_based_deduplication"),
-            timeout=msg.get("timeout"),
-            flow_control=msg.get("flow_control"),
-            label=msg.get("label"),
-            redact=msg.get("redact"),
-        )
+            headers = prepare_batch_headers(msg, user_headers)
+            if default_headers:
+                headers = {**default_headers, **headers}
+
+        body = msg.get("body")
+        if isinstance(body, bytes):
+            body = body.decode()
+
+        queue = msg.get("queue")
+        if queue is None:
+            queue = default_queue
 
         batch_messages.append(
             {
                 "destination": destination,
                 "headers": headers,
-                "body": msg.get("body"),
-                "queue": msg.get("queue"),
+                "body": body,
+                "queue": queue,
             }
         )
 
-    return json.dumps(batch_messages)
+    if auto_deduplication_id:
+        apply_deduplication_ids(batch_messages, auto_deduplication_id)
+
+    return batch_messages
+
+
+def check_auto_deduplication_id(auto_deduplication_id: Union[bool, str]) -> None:
+    if auto_deduplication_id == "":
+        raise QStashError("The key of 'auto_deduplication_id' must not be empty.")
+
+
+def needs_deduplication_id(headers: Dict[str, str]) -> bool:
+    """
+    Returns whether a prepared batch message has neither a deduplication
+    id nor content based deduplication enabled.
+    """
+    return (
+        "Upstash-Deduplication-Id" not in headers
+        and headers.get("Upstash-Content-Based-Deduplication") != "True"
+    )
+
+
+def apply_deduplication_ids(
+    batch_messages: List[Dict[str, Any]],
+    auto_deduplication_id: Union[bool, str],
+) -> None:
+    """
+    Sets a deduplication id derived from the content, and the key if
+    `auto_deduplication_id` is a string, on the prepared batch messages
+    without a deduplication id or content based deduplication.
+    """
+    key = auto_deduplication_id if isinstance(auto_deduplication_id, str) else None
+    occurrences: Dict[str, int] = {}
+    for batch_message in batch_messages:
+        headers = batch_message["headers"]
+        if needs_deduplication_id(headers):
+            headers["Upstash-Deduplication-Id"] = generate_deduplication_id(
+                batch_message, occurrences, key
+            )
+
+
+def ensure_deduplication_id(batch_message: Dict[str, Any]) -> None:
+    """
+    Gives a random deduplication id to a prepared batch message, unless it
+    has one or uses content based deduplication, so that it can be sent
+    again safely.
+    """
+    headers = batch_message["headers"]
+    if needs_deduplication_id(headers):
+        headers["Upstash-Deduplication-Id"] = uuid.uuid4().hex
+
+
+def prepare_batch_message_body(
+    messages: List[BatchRequest],
+    defaults: Optional[BatchRequest] = None,
+    *,
+    auto_deduplication_id: Union[bool, str] = False,
+) -> str:
+    return json.dumps(
+        prepare_batch_messages(
+            messages, defaults, auto_deduplication_id=auto_deduplication_id
+        )
+    )
+
+
+PREPARE_BATCH_CHUNK_SIZE = 1000
+
+
+def prepare_batch_chunk(
+    messages: List[Any],
+    defaults: Optional[BatchRequest],
+    json_bodies: bool,
+    encode: bool,
+) -> Union[str, List[Dict[str, Any]]]:
+    """
+    Prepares a chunk of the messages of a batch, possibly in another process.
+
+    If `encode` is set, returns the prepared messages encoded as a JSON
+    array, without the enclosing brackets.
+    """
+    if json_bodies:
+        messages = convert_to_batch_messages(messages)
+
+    batch_messages = prepare_batch_messages(messages, defaults)
+    if not encode:
+        return batch_messages
+
+    return json.dumps(batch_messages)[1:-1]
+
+
+def split_batch_chunks(messages: List[Any]) -> List[List[Any]]:
+    return [
+        messages[i : i + PREPARE_BATCH_CHUNK_SIZE]
+        for i in range(0, len(messages), PREPARE_BATCH_CHUNK_SIZE)
+    ]
+
+
+def join_batch_chunks(
+    chunks: List[Union[str, List[Dict[str, Any]]]],
+    *,
+    auto_deduplication_id: Union[bool, str],
+    collapse: bool,
+) -> Tuple[str, Optional[List[int]]]:
+    """
+    Joins the chunks prepared by `prepare_batch_chunk` into the body of
+    a batch request.
+
+    Returns the body, along with the indexes of the unique messages that
+    each of the messages correspond to, if the messages are collapsed.
+    """
+    check_auto_deduplication_id(auto_deduplication_id)
+
+    if not auto_deduplication_id and not collapse:
+        return "[" + ",".join(cast(str, chunk) for chunk in chunks if chunk) + "]", None
+
+    batch_messages = [
+        batch_message
+        for chunk in chunks
+        for batch_message in cast(List[Dict[str, Any]], chunk)
+    ]
+
+    if auto_deduplication_id:
+        apply_deduplication_ids(batch_messages, auto_deduplication_id)
+
+    indexes = None
+    if collapse:
+        batch_messages, indexes = collapse_batch_messages(batch_messages)
+
+    return json.dumps(batch_messages), indexes
+
+
+def prepare_batch_request_body(
+    messages: List[Any],
+    defaults: Optional[BatchRequest],
+    *,
+    json_bodies: bool,
+    auto_deduplication_id: Union[bool, str],
+    collapse: bool,
+    executor: Optional[Executor] = None,
+) -> Tuple[str, Optional[List[int]]]:
+    """
+    Prepares the body of a batch request, in chunks on the executor if
+    it is given.
+
+    When the messages are given a deduplication id or collapsed, only the
+    preparation of the messages is run on the executor, and they are
+    encoded as JSON by the caller.
+    """
+    encode = not auto_deduplication_id and not collapse
+    if executor is None:
+        chunks = [prepare_batch_chunk(messages, defaults, json_bodies, encode)]
+    else:
+        chunks = list(
+            executor.map(
+                prepare_batch_chunk,
+                split_batch_chunks(messages),
+                repeat(defaults),
+                repeat(json_bodies),
+                repeat(encode),
+            )
+        )
+
+    return join_batch_chunks(
+        chunks,
+        auto_deduplication_id=auto_deduplication_id,
+        collapse=collapse,
+    )
+
+
+def collapse_batch_messages(
+    batch_messages: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Removes the repeated messages of a batch.
+
+    Returns the unique messages, along with the index of the unique
+    message that each of the given messages corresponds to.
+    """
+    unique_messages: List[Dict[str, Any]] = []
+    unique_indexes: Dict[str, int] = {}
+    indexes = []
+
+    for batch_message in batch_messages:
+        key = json.dumps(batch_message, sort_keys=True)
+        index = unique_indexes.get(key)
+        if index is None:
+            index = len(unique_messages)
+            unique_indexes[key] = index
+            unique_messages.append(batch_message)
+
+        indexes.append(index)
+
+    return unique_messages, indexes
+
+
+def publish_cache_key(
+    path: str,
+    headers: Dict[str, str],
+    body: object,
+    *,
+    generated_deduplication_id: bool = False,
+) -> Optional[str]:
+    """
+    Returns the key of a publish or enqueue request in the publish cache,
+    derived from its destination, headers, and body.
+
+    Requests with bodies that are not in memory are not cached.
+    """
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode()
+    elif not isinstance(body, (bytes, bytearray, memoryview)):
+        return None
+
+    if generated_deduplication_id:
+        # Generated ids are unique to each request.
+        headers = {k: v for k, v in headers.items() if k != "Upstash-Deduplication-Id"}
+
+    digest = hashlib.sha256()
+    digest.update(path.encode())
+    digest.update(json.dumps(headers, sort_keys=True).encode())
+    digest.update(body)
+    return digest.hexdigest()
 
 
 def parse_batch_response(
@@ -749,6 +1499,172 @@ def parse_batch_response(
     return result
 
 
+DEFAULT_BATCH_CHUNK_SIZE = 100
+
+
+def to_column(values: Optional[Iterable[Any]]) -> Optional[Sequence[Any]]:
+    if values is None or isinstance(values, (list, tuple)):
+        return values
+
+    # NumPy-style arrays convert their items to Python scalars
+    # in a single call.
+    tolist = getattr(values, "tolist", None)
+    if tolist is not None:
+        return tolist()  # type:ignore[no-any-return]
+
+    return list(values)
+
+
+def prepare_batch_columns_bodies(
+    *,
+    urls: Optional[Iterable[str]],
+    bodies: Optional[Iterable[Any]],
+    deduplication_ids: Optional[Iterable[Optional[str]]],
+    delays: Optional[Iterable[Optional[Union[str, int]]]],
+    not_befores: Optional[Iterable[Optional[int]]],
+    spread_over: Optional[int],
+    spread_profile: Optional[SpreadProfile],
+    defaults: Optional[BatchRequest],
+    chunk_size: int,
+    json_bodies: bool,
+) -> Iterator[str]:
+    """
+    Encodes the columns directly into batch request bodies of at most
+    `chunk_size` messages, without creating a request object for every
+    message.
+    """
+    url_column = to_column(urls)
+    body_column = to_column(bodies)
+    deduplication_id_column = to_column(deduplication_ids)
+    delay_column = to_column(delays)
+    not_before_column = to_column(not_befores)
+
+    columns = [
+        c
+        for c in (
+            url_column,
+            body_column,
+            deduplication_id_column,
+            delay_column,
+            not_before_column,
+        )
+        if c is not None
+    ]
+
+    if not columns:
+        raise QStashError("At least one column must be provided.")
+
+    count = len(columns[0])
+    if any(len(c) != count for c in columns):
+        raise QStashError("All the columns must have the same length.")
+
+    if chunk_size <= 0:
+        raise QStashError("Chunk size must be positive.")
+
+    if spread_over is not None:
+        check_spread_window(spread_over)
+
+    defaults = cast(BatchRequest, dict(defaults or {}))
+    start_not_before, start_delay = get_spread_start(defaults)
+    if json_bodies:
+        defaults["content_type"] = "application/json"
+
+    default_headers = prepare_batch_headers(defaults, defaults.get("headers"))
+    default_destination_json = "null"
+    if url_column is None:
+        api_headers: Dict[str, str] = {}
+        default_destination_json = json.dumps(
+            get_destination(
+                url=defaults.get("url"),
+                url_group=defaults.get("url_group"),
+                api=defaults.get("api"),
+                headers=api_headers,
+            )
+        )
+        default_headers.update(prepare_batch_headers({}, api_headers))
+    elif any(url is None for url in url_column):
+        raise QStashError("All the urls must be provided.")
+
+    default_headers_json = json.dumps(default_headers)
+    queue_json = json.dumps(defaults.get("queue"))
+
+    # Per message headers are spliced into the encoded default headers,
+    # unless they might override one of them.
+    can_splice = not (
+        default_headers.keys()
+        & {"Upstash-Deduplication-Id", "Upstash-Delay", "Upstash-Not-Before"}
+    )
+    splice_prefix = default_headers_json[:-1] + (", " if default_headers else "")
+
+    for start in range(0, count, chunk_size):
+        encoded = []
+
+        for i in range(start, min(start + chunk_size, count)):
+            message_headers = {}
+
+            if deduplication_id_column is not None:
+                deduplication_id = deduplication_id_column[i]
+                if deduplication_id is not None:
+                    message_headers["Upstash-Deduplication-Id"] = deduplication_id
+
+            delay = delay_column[i] if delay_column is not None else None
+            not_before = not_before_column[i] if not_before_column is not None else None
+
+            if spread_over is not None and delay is None and not_before is None:
+                offset = spread_delay(i, count, spread_over, spread_profile)
+                if start_not_before is not None:
+                    not_before = start_not_before + offset
+                else:
+                    delay = start_delay + offset
+
+            if delay is not None:
+                if isinstance(delay, int):
+                    delay = f"{delay}s"
+
+                message_headers["Upstash-Delay"] = delay
+
+            if not_before is not None:
+                message_headers["Upstash-Not-Before"] = str(not_before)
+
+            if not message_headers:
+                headers_json = default_headers_json
+            elif can_splice:
+                headers_json = splice_prefix + json.dumps(message_headers)[1:]
+            else:
+                headers_json = json.dumps({**default_headers, **message_headers})
+
+            if url_column is not None:
+                destination_json = json.dumps(url_column[i])
+            else:
+                destination_json = default_destination_json
+
+            body: Any = None
+            if body_column is not None:
+                body = body_column[i]
+                if json_bodies:
+                    body = serialize_json_body(body)
+
+                if isinstance(body, bytes):
+                    body = body.decode()
+
+            encoded.append(
+                f'{{"destination": {destination_json}, '
+                f'"headers": {headers_json}, '
+                f'"body": {json.dumps(body)}, '
+                f'"queue": {queue_json}}}'
+            )
+
+        yield "[" + ", ".join(encoded) + "]"
+
+
+def parse_compact_batch_response(
+    response: List[Union[List[Dict[str, Any]], Dict[str, Any]]],
+) -> CompactBatchResponse:
+    result = CompactBatchResponse()
+    result.extend(response)
+    return result
+
+
 def convert_to_batch_messages(
     messages: List[BatchJsonRequest],
 ) -> List[BatchRequest]:
@@ -768,7 +1684,7 @@ def convert_to_batch_messages(
         if "api" in msg:
             batch_msg["api"] = msg["api"]
 
-        batch_msg["body"] = json.dumps(msg.get("body"))
+        batch_msg["body"] = serialize_json_body(msg.get("body"))
         batch_msg["content_type"] = "application/json"
 
         if "method" in msg:
@@ -823,24 +1739,465 @@ def convert_to_batch_messages(
     return batch_messages
 
 
-def parse_flow_control(response: Dict[str, Any]) -> Optional[FlowControlProperties]:
-    if "flowControlKey" not in response:
-        return None
+BatchT = TypeVar("BatchT", BatchRequest, BatchJsonRequest)
 
-    return FlowControlProperties(
-        key=response["flowControlKey"],
-        parallelism=response.get("parallelism"),
-        rate=response.get("rate"),
-        period=response.get("period"),
-    )
 
+def get_spread_start(
+    defaults: Optional[Union[BatchRequest, BatchJsonRequest]],
+) -> Tuple[Optional[int], int]:
+    """
+    Returns the default `not_before`, if any, and otherwise the default
+    delay in seconds, which the spread offsets are added to.
+    """
+    if defaults is None:
+        return None, 0
 
-def parse_message_response(response: Dict[str, Any]) -> Message:
-    flow_control = parse_flow_control(response)
-    return Message(
-        message_id=response["messageId"],
-        url=response["url"],
-        url_group=response.get("topicName"),
+    not_before = defaults.get("not_before")
+    if not_before is not None:
+        return not_before, 0
+
+    delay = defaults.get("delay")
+    return None, delay_seconds(delay) if delay is not None else 0
+
+
+def spread_batch_messages(
+    messages: List[BatchT],
+    window: int,
+    profile: Optional[SpreadProfile],
+    defaults: Optional[Union[BatchRequest, BatchJsonRequest]] = None,
+) -> List[BatchT]:
+    """
+    Gives the messages without a `delay` or `not_before` increasing delays,
+    spreading their deliveries over the window along the profile.
+
+    The offsets are added to the default `not_before` or `delay`, if any.
+    """
+    check_spread_window(window)
+    start_not_before, start_delay = get_spread_start(defaults)
+
+    count = len(messages)
+    spread = []
+    for i, message in enumerate(messages):
+        if message.get("delay") is None and message.get("not_before") is None:
+            offset = spread_delay(i, count, window, profile)
+            if start_not_before is not None:
+                message = cast(
+                    BatchT, {**message, "not_before": start_not_before + offset}
+                )
+            else:
+                message = cast(BatchT, {**message, "delay": start_delay + offset})
+
+        spread.append(message)
+
+    return spread
+
+
+def check_publish_cache(
+    publish_cache: Optional[LruCache[str, Any]],
+) -> Optional[LruCache[str, Any]]:
+    if publish_cache is not None and publish_cache.ttl is None:
+        raise QStashError(
+            "'publish_cache' must have a 'ttl', as the repeated messages are "
+            "only deduplicated inside its window."
+        )
+
+    return publish_cache
+
+
+def check_message_cache(
+    message_cache: Optional[LruCache[str, Message]],
+) -> Optional[LruCache[str, Message]]:
+    if message_cache is not None and message_cache.ttl is None:
+        raise QStashError(
+            "'message_cache' must have a 'ttl', as the messages are deleted "
+            "once they are delivered."
+        )
+
+    return message_cache
+
+
+def convert_to_batch_defaults(defaults: BatchJsonRequest) -> BatchRequest:
+    batch_defaults: BatchRequest = {}
+    for key, value in defaults.items():
+        if key != "body":
+            batch_defaults[key] = value  # type:ignore[literal-required]
+
+    return batch_defaults
+
+
+def prepare_many_request(
+    msg: BatchRequest,
+    queue: Optional[str],
+) -> Tuple[str, Dict[str, str]]:
+    headers = dict(msg.get("headers") or {})
+    destination = get_destination(
+        url=msg.get("url"),
+        url_group=msg.get("url_group"),
+        api=msg.get("api"),
+        headers=headers,
+    )
+
+    if queue is None:
+        return f"/v2/publish/{destination}", prepare_batch_headers(msg, headers)
+
+    return f"/v2/enqueue/{queue}/{destination}", prepare_enqueue_headers(msg, headers)
+
+
+def offload_body(
+    claim_check: Optional[ClaimCheck],
+    body: Optional[RequestBody],
+    headers: Dict[str, str],
+) -> Tuple[Optional[RequestBody], Dict[str, str]]:
+    """
+    Returns the body and headers to send, with the body replaced by
+    the reference to it in the blob store, if the claim check offloads it.
+
+    It should be called after the request is validated, so that the
+    invalid requests do not leave blobs behind.
+    """
+    if claim_check is None:
+        return body, headers
+
+    reference = claim_check.offload(body, headers.get("Content-Type"))
+    if reference is None:
+        return body, headers
+
+    return reference, {**headers, "Content-Type": "application/json"}
+
+
+ItemT = TypeVar("ItemT")
+
+
+def send_batch_isolating_rejected(
+    http: HttpClient,
+    items: List[ItemT],
+    encode: Callable[[List[ItemT]], RequestBody],
+    on_sent: Callable[[List[ItemT]], None],
+    on_rejected: Callable[[ItemT, Exception], None],
+) -> None:
+    """
+    Sends the items, encoded as the body of a batch request.
+
+    When QStash rejects the batch for its content, such as an invalid
+    destination, its halves are sent on their own, so that only the
+    rejected items are given to `on_rejected`, and the others to `on_sent`.
+    Other errors are raised, leaving the items that are not given to any
+    of the callbacks unsent.
+    """
+    try:
+        http.request(
+            path="/v2/batch",
+            method="POST",
+            headers={"Content-Type": "application/json"},
+            body=encode(items),
+            lane="bulk",
+        )
+    except Exception as e:
+        if not is_rejected(e):
+            raise
+
+        if len(items) == 1:
+            on_rejected(items[0], e)
+            return
+
+        middle = len(items) // 2
+        send_batch_isolating_rejected(
+            http, items[:middle], encode, on_sent, on_rejected
+        )
+        send_batch_isolating_rejected(
+            http, items[middle:], encode, on_sent, on_rejected
+        )
+        return
+
+    on_sent(items)
+
+
+def prepare_hedge(
+    *,
+    body: object,
+    deduplication_id: Optional[str],
+    content_based_deduplication: Optional[bool],
+) -> Tuple[Optional[str], bool]:
+    """
+    Returns the deduplication id to use for a hedged request, and
+    whether it was generated for the hedge.
+    """
+    if body is not None and not isinstance(body, (str, bytes, bytearray, memoryview)):
+        raise QStashError("Hedged requests must have an in-memory body.")
+
+    if deduplication_id is not None or content_based_deduplication:
+        return deduplication_id, False
+
+    return uuid.uuid4().hex, True
+
+
+def reconcile_hedged_response(
+    response: Union[List[Dict[str, Any]], Dict[str, Any]],
+    other_response: Optional[Union[List[Dict[str, Any]], Dict[str, Any]]],
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Marks the messages of a hedged request as deduplicated only if the
+    other request of the hedge found them deduplicated as well.
+
+    Otherwise, the message was created by one of the two requests, and
+    was only deduplicated against the other one.
+    """
+    if isinstance(response, list):
+        other_deduplicated = {}
+        if isinstance(other_response, list):
+            other_deduplicated = {
+                r["url"]: r.get("deduplicated", False) for r in other_response
+            }
+
+        return [
+            {
+                **r,
+                "deduplicated": r.get("deduplicated", False)
+                and other_deduplicated.get(r["url"], False),
+            }
+            for r in response
+        ]
+
+    return {
+        **response,
+        "deduplicated": response.get("deduplicated", False)
+        and isinstance(other_response, dict)
+        and other_response.get("deduplicated", False),
+    }
+
+
+def send_hedged(
+    http: HttpClient,
+    *,
+    path: str,
+    headers: Dict[str, str],
+    body: Optional[RequestBody],
+    hedge_after: float,
+    generated_deduplication_id: bool,
+) -> Any:
+    response, other = hedge(
+        lambda: http.request(path=path, method="POST", headers=headers, body=body),
+        hedge_after,
+    )
+
+    if other is None:
+        return response
+
+    results = response if isinstance(response, list) else [response]
+    if not any(r.get("deduplicated", False) for r in results):
+        return response
+
+    if generated_deduplication_id:
+        # No message could have had the id before the hedge.
+        return reconcile_hedged_response(response, None)
+
+    try:
+        other_response = other.result()
+    except Exception:
+        return response
+
+    return reconcile_hedged_response(response, other_response)
+
+
+TERMINAL_LOG_STATES = frozenset(("DELIVERED", "FAILED", "CANCELED"))
+"""Values of the log states after which a message is not delivered again."""
+
+DEFAULT_WAIT_FOR_POLL_INTERVAL = 0.5
+DEFAULT_WAIT_FOR_MAX_POLL_INTERVAL = 10.0
+
+PENDING_LOG_STATES = frozenset(("CREATED", "ACTIVE", "RETRY"))
+"""Values of the log states of the messages that can still be cancelled."""
+
+WAIT_FOR_CHUNK_SIZE = 50
+"""Maximum number of message ids queried in a single events request."""
+
+WAIT_FOR_CLOCK_SKEW = 5000
+"""
+Milliseconds the events are queried before the previous poll, in case
+the clocks of the client and QStash differ.
+"""
+
+
+class DeliveryWaiter:
+    """
+    Tracks the messages waited by `wait_for`, and the events queries and
+    poll intervals to resolve them with.
+
+    All the outstanding messages are queried in chunks of message ids on
+    each poll. After the first poll, only the events since the previous
+    poll are queried. The poll interval grows while no message is resolved,
+    and is reset once one is.
+    """
+
+    def __init__(
+        self,
+        message_ids: Iterable[str],
+        *,
+        timeout: Optional[float],
+        poll_interval: float,
+        max_poll_interval: float,
+    ) -> None:
+        if poll_interval <= 0 or max_poll_interval < poll_interval:
+            raise QStashError(
+                "'poll_interval' must be positive, and at most 'max_poll_interval'."
+            )
+
+        self.pending = dict.fromkeys(message_ids)
+        self.results: Dict[str, "Log"] = {}
+
+        self._min_interval = poll_interval
+        self._max_interval = max_poll_interval
+        self._interval = poll_interval
+        self._deadline = time.monotonic() + timeout if timeout is not None else None
+        self._from_time: Optional[int] = None
+        self._poll_time: Optional[int] = None
+
+    def start_poll(self) -> List["LogFilter"]:
+        """Returns the filters of the events queries of the next poll."""
+        self._from_time = self._poll_time
+        self._poll_time = int(time.time() * 1000) - WAIT_FOR_CLOCK_SKEW
+
+        ids = list(self.pending)
+        filters = []
+        for start in range(0, len(ids), WAIT_FOR_CHUNK_SIZE):
+            log_filter: "LogFilter" = {
+                "message_ids": ids[start : start + WAIT_FOR_CHUNK_SIZE]
+            }
+            if self._from_time is not None:
+                log_filter["from_time"] = self._from_time
+
+            filters.append(log_filter)
+
+        return filters
+
+    def resolve(self, logs: List["Log"]) -> None:
+        """Resolves the messages with a terminal event among the logs."""
+        for log in logs:
+            if log.state.value not in TERMINAL_LOG_STATES:
+                continue
+
+            previous = self.results.get(log.message_id)
+            if previous is None and log.message_id not in self.pending:
+                continue
+
+            # Events are not ordered across the pages of the queries.
+            if previous is not None and previous.time >= log.time:
+                continue
+
+            self.pending.pop(log.message_id, None)
+            self.results[log.message_id] = log
+
+    def next_delay(self, resolved: bool) -> Optional[float]:
+        """
+        Returns the number of seconds to wait before the next poll, or
+        `None` if there are no messages to wait or the timeout is reached.
+        """
+        if not self.pending:
+            return None
+
+        if resolved:
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._interval * 1.5, self._max_interval)
+
+        delay = self._interval
+        if self._deadline is not None:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            delay = min(delay, remaining)
+
+        return delay
+
+
+DEFAULT_CANCEL_CHUNK_SIZE = 1000
+DEFAULT_CANCEL_CHUNK_RETRIES = 2
+
+CancelProgress = Callable[[int, int, int], None]
+"""
+Called with the number of message ids processed so far, the total number
+of message ids, and the number of messages cancelled so far.
+"""
+
+
+def split_message_ids(message_ids: List[str], chunk_size: int) -> List[List[str]]:
+    if chunk_size <= 0:
+        raise QStashError("Chunk size must be positive.")
+
+    return [
+        message_ids[start : start + chunk_size]
+        for start in range(0, len(message_ids), chunk_size)
+    ]
+
+
+def filter_pending(message_ids: List[str], states: Mapping[str, Any]) -> List[str]:
+    """Returns the ids of the messages whose latest log state is pending."""
+    pending = []
+    for message_id in message_ids:
+        state = states.get(message_id)
+        if state is not None and state.value in PENDING_LOG_STATES:
+            pending.append(message_id)
+
+    return pending
+
+
+def check_cancel_where_options(
+    filter: "LogFilter", chunk_size: int, concurrency: int
+) -> None:
+    if filter.get("state") is not None:
+        raise QStashError(
+            "'state' can not be used to cancel messages, "
+            "only the pending messages are cancelled."
+        )
+
+    if chunk_size < 1:
+        raise QStashError("'chunk_size' must be at least 1.")
+
+    if concurrency < 1:
+        raise QStashError("'concurrency' must be at least 1.")
+
+
+def cancel_retry_delay(attempt: int) -> float:
+    return float(min(2**attempt, 30))
+
+
+class CancelTracker:
+    """Sums up the results of the cancelled chunks, and reports the progress."""
+
+    def __init__(self, total: int, on_progress: Optional[CancelProgress]) -> None:
+        self._lock = threading.Lock()
+        self._on_progress = on_progress
+        self.total = total
+        self.processed = 0
+        self.cancelled = 0
+
+    def add(self, processed: int, cancelled: int) -> None:
+        with self._lock:
+            self.processed += processed
+            self.cancelled += cancelled
+            if self._on_progress is not None:
+                self._on_progress(self.processed, self.total, self.cancelled)
+
+
+def parse_flow_control(response: Dict[str, Any]) -> Optional[FlowControlProperties]:
+    if "flowControlKey" not in response:
+        return None
+
+    return FlowControlProperties(
+        key=response["flowControlKey"],
+        parallelism=response.get("parallelism"),
+        rate=response.get("rate"),
+        period=response.get("period"),
+    )
+
+
+def parse_message_response(response: Dict[str, Any]) -> Message:
+    flow_control = parse_flow_control(response)
+    return Message(
+        message_id=response["messageId"],
+        url=response["url"],
+        url_group=response.get("topicName"),
         endpoint=response.get("endpointName"),
         queue=response.get("queueName"),
         body=response.get("body"),
@@ -862,9 +2219,224 @@ def parse_message_response(response: Dict[str, Any]) -> Message:
     )
 
 
+class MessageTemplate:
+    """
+    Publish and enqueue options that are validated and prepared once,
+    and reused for every message sent through the template.
+
+    Use `MessageApi.template` to create one.
+    """
+
+    def __init__(
+        self,
+        http: HttpClient,
+        *,
+        destination: str,
+        publish_headers: Dict[str, str],
+        enqueue_headers: Dict[str, str],
+        claim_check: Optional[ClaimCheck] = None,
+    ) -> None:
+        self._http = http
+        self._destination = destination
+        self._publish_path = f"/v2/publish/{destination}"
+        self._publish_headers = publish_headers
+        self._enqueue_headers = enqueue_headers
+        self._claim_check = claim_check
+
+    def publish(
+        self,
+        body: Optional[RequestBody] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message to QStash with the options of the template.
+
+        :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        :param delay: Delay the message delivery, overriding the delay of
+            the template.
+        :param not_before: Delay the message until a certain time in the future.
+            The format is a unix timestamp in seconds, based on the UTC timezone.
+        """
+        req_headers = merge_template_headers(
+            self._publish_headers,
+            content_type=None,
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=delay,
+            not_before=not_before,
+        )
+
+        req_body, req_headers = offload_body(self._claim_check, body, req_headers)
+
+        response = self._http.request(
+            path=self._publish_path,
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_publish_response(response)
+
+    def publish_json(
+        self,
+        body: Optional[Any] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message to QStash with the options of the template,
+        automatically serializing the body as JSON string, and setting
+        content type to `application/json`.
+
+        :param body: The request message body passed to the destination after being
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        :param delay: Delay the message delivery, overriding the delay of
+            the template.
+        :param not_before: Delay the message until a certain time in the future.
+            The format is a unix timestamp in seconds, based on the UTC timezone.
+        """
+        req_headers = merge_template_headers(
+            self._publish_headers,
+            content_type="application/json",
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=delay,
+            not_before=not_before,
+        )
+
+        req_body, req_headers = offload_body(
+            self._claim_check, serialize_json_body(body), req_headers
+        )
+
+        response = self._http.request(
+            path=self._publish_path,
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_publish_response(response)
+
+    def enqueue(
+        self,
+        queue: str,
+        body: Optional[RequestBody] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message with the options of the template, after
+        creating the queue if it does not exist.
+
+        The `delay` and `flow_control` options of the template are
+        not used while enqueueing.
+
+        :param queue: The name of the queue.
+        :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        """
+        req_headers = merge_template_headers(
+            self._enqueue_headers,
+            content_type=None,
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=None,
+            not_before=None,
+        )
+
+        req_body, req_headers = offload_body(self._claim_check, body, req_headers)
+
+        response = self._http.request(
+            path=f"/v2/enqueue/{queue}/{self._destination}",
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_enqueue_response(response)
+
+    def enqueue_json(
+        self,
+        queue: str,
+        body: Optional[Any] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        deduplication_id: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message with the options of the template, after
+        creating the queue if it does not exist. It automatically serializes
+        the body as JSON string, and setting content type to `application/json`.
+
+        The `delay` and `flow_control` options of the template are
+        not used while enqueueing.
+
+        :param queue: The name of the queue.
+        :param body: The request message body passed to the destination after being
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
+        :param headers: Headers to forward along with the message, in addition
+            to the headers of the template.
+        :param deduplication_id: Id to use while deduplicating messages.
+        """
+        req_headers = merge_template_headers(
+            self._enqueue_headers,
+            content_type="application/json",
+            headers=headers,
+            deduplication_id=deduplication_id,
+            delay=None,
+            not_before=None,
+        )
+
+        req_body, req_headers = offload_body(
+            self._claim_check, serialize_json_body(body), req_headers
+        )
+
+        response = self._http.request(
+            path=f"/v2/enqueue/{queue}/{self._destination}",
+            method="POST",
+            headers=req_headers,
+            body=req_body,
+        )
+
+        return parse_enqueue_response(response)
+
+
 class MessageApi:
-    def __init__(self, http: HttpClient):
+    def __init__(
+        self,
+        http: HttpClient,
+        publish_cache: Optional[LruCache[str, Any]] = None,
+        claim_check: Optional[ClaimCheck] = None,
+        message_cache: Optional[LruCache[str, Message]] = None,
+    ):
         self._http = http
+        self._publish_cache = check_publish_cache(publish_cache)
+        self._claim_check = claim_check
+        self._message_cache = check_message_cache(message_cache)
 
     def publish(
         self,
@@ -872,7 +2444,7 @@ class MessageApi:
         url: Optional[str] = None,
         url_group: Optional[str] = None,
         api: Optional[ApiT] = None,
-        body: Optional[Union[str, bytes]] = None,
+        body: Optional[RequestBody] = None,
         content_type: Optional[str] = None,
         method: Optional[HttpMethod] = None,
         headers: Optional[Dict[str, str]] = None,
@@ -890,6 +2462,7 @@ class MessageApi:
         flow_control: Optional[FlowControl] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
         """
         Publishes a message to QStash.
@@ -905,6 +2478,9 @@ class MessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
         :param content_type: MIME type of the message.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
@@ -965,7 +2541,20 @@ class MessageApi:
             - `{"body": True}` to redact the request body
             - `{"header": True}` to redact all headers
             - `{"header": ["Authorization"]}` to redact specific headers
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
+        generated_deduplication_id = False
+        if hedge_after is not None:
+            deduplication_id, generated_deduplication_id = prepare_hedge(
+                body=body,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+            )
+
         headers = headers or {}
         destination = get_destination(
             url=url,
@@ -994,14 +2583,48 @@ class MessageApi:
             redact=redact,
         )
 
-        response = self._http.request(
-            path=f"/v2/publish/{destination}",
-            method="POST",
-            headers=req_headers,
-            body=body,
-        )
+        path = f"/v2/publish/{destination}"
 
-        return parse_publish_response(response)
+        cache = self._publish_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = publish_cache_key(
+                path,
+                req_headers,
+                body,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+            cached = cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                return cast(
+                    Union[PublishResponse, List[PublishUrlGroupResponse]],
+                    copy.deepcopy(cached),
+                )
+
+        body, req_headers = offload_body(self._claim_check, body, req_headers)
+
+        if hedge_after is None:
+            response = self._http.request(
+                path=path,
+                method="POST",
+                headers=req_headers,
+                body=body,
+            )
+        else:
+            response = send_hedged(
+                self._http,
+                path=path,
+                headers=req_headers,
+                body=body,
+                hedge_after=hedge_after,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+
+        result = parse_publish_response(response)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, copy.deepcopy(result))
+
+        return result
 
     def publish_json(
         self,
@@ -1026,6 +2649,7 @@ class MessageApi:
         flow_control: Optional[FlowControl] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
         """
         Publish a message to QStash, automatically serializing the
@@ -1042,7 +2666,8 @@ class MessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The request message body passed to the destination after being
-            serialized as JSON string.
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
         :param callback_headers: Headers to forward along with the callback message.
@@ -1102,12 +2727,17 @@ class MessageApi:
             - `{"body": True}` to redact the request body
             - `{"header": True}` to redact all headers
             - `{"header": ["Authorization"]}` to redact specific headers
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
         return self.publish(
             url=url,
             url_group=url_group,
             api=api,
-            body=json.dumps(body),
+            body=serialize_json_body(body),
             content_type="application/json",
             method=method,
             headers=headers,
@@ -1125,6 +2755,7 @@ class MessageApi:
             flow_control=flow_control,
             label=label,
             redact=redact,
+            hedge_after=hedge_after,
         )
 
     def enqueue(
@@ -1134,7 +2765,7 @@ class MessageApi:
         url: Optional[str] = None,
         url_group: Optional[str] = None,
         api: Optional[ApiT] = None,
-        body: Optional[Union[str, bytes]] = None,
+        body: Optional[RequestBody] = None,
         content_type: Optional[str] = None,
         method: Optional[HttpMethod] = None,
         headers: Optional[Dict[str, str]] = None,
@@ -1149,6 +2780,7 @@ class MessageApi:
         timeout: Optional[Union[str, int]] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
         """
         Enqueues a message, after creating the queue if it does
@@ -1166,6 +2798,9 @@ class MessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The raw request message body passed to the destination as is.
+            Buffers are sent without being copied, and file objects and byte
+            iterators are streamed. Requests with bodies that can't be rewound
+            are not retried.
         :param content_type: MIME type of the message.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
@@ -1217,7 +2852,20 @@ class MessageApi:
             - `{"body": True}` to redact the request body
             - `{"header": True}` to redact all headers
             - `{"header": ["Authorization"]}` to redact specific headers
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
+        generated_deduplication_id = False
+        if hedge_after is not None:
+            deduplication_id, generated_deduplication_id = prepare_hedge(
+                body=body,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+            )
+
         headers = headers or {}
         destination = get_destination(
             url=url,
@@ -1246,14 +2894,48 @@ class MessageApi:
             redact=redact,
         )
 
-        response = self._http.request(
-            path=f"/v2/enqueue/{queue}/{destination}",
-            method="POST",
-            headers=req_headers,
-            body=body,
-        )
+        path = f"/v2/enqueue/{queue}/{destination}"
 
-        return parse_enqueue_response(response)
+        cache = self._publish_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = publish_cache_key(
+                path,
+                req_headers,
+                body,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+            cached = cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                return cast(
+                    Union[EnqueueResponse, List[EnqueueUrlGroupResponse]],
+                    copy.deepcopy(cached),
+                )
+
+        body, req_headers = offload_body(self._claim_check, body, req_headers)
+
+        if hedge_after is None:
+            response = self._http.request(
+                path=path,
+                method="POST",
+                headers=req_headers,
+                body=body,
+            )
+        else:
+            response = send_hedged(
+                self._http,
+                path=path,
+                headers=req_headers,
+                body=body,
+                hedge_after=hedge_after,
+                generated_deduplication_id=generated_deduplication_id,
+            )
+
+        result = parse_enqueue_response(response)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, copy.deepcopy(result))
+
+        return result
 
     def enqueue_json(
         self,
@@ -1276,6 +2958,7 @@ class MessageApi:
         timeout: Optional[Union[str, int]] = None,
         label: Optional[str] = None,
         redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
     ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
         """
         Enqueues a message, after creating the queue if it does
@@ -1294,7 +2977,8 @@ class MessageApi:
         :param url_group: Url group to send the message to.
         :param api: Api to send the message to.
         :param body: The request message body passed to the destination after being
-            serialized as JSON string.
+            serialized as JSON string. `RawJson` values and `bytes` are treated as
+            already serialized JSON and passed as is.
         :param method: The HTTP method to use when sending a webhook to your API.
         :param headers: Headers to forward along with the message.
         :param callback_headers: Headers to forward along with the callback message.
@@ -1345,13 +3029,18 @@ class MessageApi:
             - `{"body": True}` to redact the request body
             - `{"header": True}` to redact all headers
             - `{"header": ["Authorization"]}` to redact specific headers
+        :param hedge_after: Sends a second copy of the request, if the first one
+            does not complete in this many seconds, and returns the response of
+            the one that completes first. A deduplication id is generated, unless
+            `deduplication_id` or `content_based_deduplication` is given, so that
+            only one message is created. Requires an in-memory body.
         """
         return self.enqueue(
             queue=queue,
             url=url,
             url_group=url_group,
             api=api,
-            body=json.dumps(body),
+            body=serialize_json_body(body),
             content_type="application/json",
             method=method,
             headers=headers,
@@ -1366,11 +3055,218 @@ class MessageApi:
             timeout=timeout,
             label=label,
             redact=redact,
+            hedge_after=hedge_after,
+        )
+
+    def publish_many(
+        self,
+        messages: List[BatchRequest],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[Union[PublishResponse, List[PublishUrlGroupResponse], Exception]]:
+        """
+        Publishes the messages with separate requests, running at most
+        `concurrency` of them at the same time.
+
+        Unlike `batch`, each message is published on its own, so that
+        messages to different apis can use different tokens, and a failure
+        of a message does not affect the others.
+
+        Results are returned in the order of the messages. If publishing a
+        message fails, the exception is returned in its place instead of
+        being raised.
+
+        :param messages: Messages to publish. Messages must not have a `queue`,
+            use `enqueue_many` to enqueue them.
+        :param concurrency: Maximum number of requests to run at the same time.
+        """
+
+        def publish(
+            msg: BatchRequest,
+        ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+            if msg.get("queue") is not None:
+                raise QStashError("Use 'enqueue_many' to enqueue messages.")
+
+            path, headers = prepare_many_request(msg, None)
+            body, headers = offload_body(self._claim_check, msg.get("body"), headers)
+            response = self._http.request(
+                path=path,
+                method="POST",
+                headers=headers,
+                body=body,
+            )
+
+            return parse_publish_response(response)
+
+        return map_concurrently(publish, messages, concurrency)
+
+    def enqueue_many(
+        self,
+        messages: List[BatchRequest],
+        *,
+        queue: Optional[str] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[Union[EnqueueResponse, List[EnqueueUrlGroupResponse], Exception]]:
+        """
+        Enqueues the messages with separate requests, running at most
+        `concurrency` of them at the same time.
+
+        Results are returned in the order of the messages. If enqueueing a
+        message fails, the exception is returned in its place instead of
+        being raised.
+
+        Like `enqueue`, the `delay`, `not_before`, and `flow_control` options
+        of the messages are not used.
+
+        :param messages: Messages to enqueue.
+        :param queue: Name of the queue to use for the messages without
+            a `queue`.
+        :param concurrency: Maximum number of requests to run at the same time.
+        """
+
+        def enqueue(
+            msg: BatchRequest,
+        ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+            msg_queue = msg.get("queue") or queue
+            if msg_queue is None:
+                raise QStashError("The queue of the message must be provided.")
+
+            path, headers = prepare_many_request(msg, msg_queue)
+            body, headers = offload_body(self._claim_check, msg.get("body"), headers)
+            response = self._http.request(
+                path=path,
+                method="POST",
+                headers=headers,
+                body=body,
+            )
+
+            return parse_enqueue_response(response)
+
+        return map_concurrently(enqueue, messages, concurrency)
+
+    def template(
+        self,
+        *,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        content_type: Optional[str] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        flow_control: Optional[FlowControl] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+    ) -> MessageTemplate:
+        """
+        Creates a template from the options shared by many messages.
+
+        The destination and the headers are validated and prepared once,
+        so publishing or enqueueing through the template only needs to
+        merge the per-message fields.
+
+        :param url: Url to send the messages to.
+        :param url_group: Url group to send the messages to.
+        :param api: Api to send the messages to.
+        :param content_type: MIME type of the messages.
+        :param method: The HTTP method to use when sending a webhook to your API.
+        :param headers: Headers to forward along with the messages.
+        :param callback_headers: Headers to forward along with the callback messages.
+        :param failure_callback_headers: Headers to forward along with the failure
+            callback messages.
+        :param retries: How often should the messages be retried in case the
+            destination API is not available.
+        :param retry_delay: Delay between retries. See `publish` for the
+            supported expressions.
+        :param callback: A callback url that will be called after each attempt.
+        :param failure_callback: A failure callback url that will be called when a delivery
+            is failed, that is when all the defined retries are exhausted.
+        :param delay: Delay the message delivery. Only used while publishing.
+        :param content_based_deduplication: Automatically deduplicate messages based on
+            their content.
+        :param timeout: The HTTP timeout value to use while calling the destination URL.
+        :param flow_control: Settings for controlling the number of active requests,
+            as well as the rate of requests with the same flow control key. Only used
+            while publishing.
+        :param label: Assign a label to the requests to filter logs with it later.
+        :param redact: Configure which fields should be redacted in logs.
+        """
+        destination, publish_headers, enqueue_headers = prepare_template_headers(
+            url=url,
+            url_group=url_group,
+            api=api,
+            content_type=content_type,
+            method=method,
+            headers=headers,
+            callback_headers=callback_headers,
+            failure_callback_headers=failure_callback_headers,
+            retries=retries,
+            retry_delay=retry_delay,
+            callback=callback,
+            failure_callback=failure_callback,
+            delay=delay,
+            content_based_deduplication=content_based_deduplication,
+            timeout=timeout,
+            flow_control=flow_control,
+            label=label,
+            redact=redact,
+        )
+
+        return MessageTemplate(
+            self._http,
+            destination=destination,
+            publish_headers=publish_headers,
+            enqueue_headers=enqueue_headers,
+            claim_check=self._claim_check,
         )
 
+    @overload
     def batch(
-        self, messages: List[BatchRequest]
-    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        self,
+        messages: List[BatchRequest],
+        *,
+        defaults: Optional[BatchRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[False] = False,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]: ...
+
+    @overload
+    def batch(
+        self,
+        messages: List[BatchRequest],
+        *,
+        defaults: Optional[BatchRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[True],
+    ) -> CompactBatchResponse: ...
+
+    def batch(
+        self,
+        messages: List[BatchRequest],
+        *,
+        defaults: Optional[BatchRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: bool = False,
+    ) -> Union[
+        List[Union[BatchResponse, List[BatchUrlGroupResponse]]], CompactBatchResponse
+    ]:
         """
         Publishes or enqueues multiple messages in a single request.
 
@@ -1383,21 +3279,93 @@ class MessageApi:
         If the message in the batch is sent to a url group,
         the corresponding item in the response is list of
         `BatchUrlGroupResponse`s, one for each url in the url group.
+
+        :param messages: Messages to publish or enqueue.
+        :param defaults: Options shared by all the messages in the batch.
+            They are prepared once, and the options of each message
+            override them. Forwarded headers are merged, with the headers
+            of the message taking precedence. The default destination is
+            only used for the messages without a `url`, `url_group`,
+            or `api`.
+        :param auto_deduplication_id: Whether to set a deduplication id, derived
+            from the destination, queue, headers, and body, on the messages
+            without a `deduplication_id` or `content_based_deduplication`.
+            Sending the same messages again, such as after a timeout or a
+            failed response, then produces the same ids, and the messages
+            that were already accepted are reported as `deduplicated`.
+            The same messages sent on purpose in a later batch, within the
+            deduplication window of QStash, are deduplicated as well. To
+            tell such batches apart, give a string instead, such as an
+            idempotency key of the batch, which is mixed into the ids. The
+            key must not be empty.
+        :param executor: Executor to prepare the messages on, in chunks, such as
+            a `ProcessPoolExecutor` to encode large batches on multiple cores.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param compact: Whether to return the result as a `CompactBatchResponse`,
+            which stores the message ids in arrays, and creates the response
+            objects lazily on access.
         """
-        body = prepare_batch_message_body(messages)
+        if spread_over is not None:
+            messages = spread_batch_messages(
+                messages, spread_over, spread_profile, defaults
+            )
 
-        response = self._http.request(
-            path="/v2/batch",
-            body=body,
-            headers={"Content-Type": "application/json"},
-            method="POST",
+        body, indexes = prepare_batch_request_body(
+            messages,
+            defaults,
+            json_bodies=False,
+            auto_deduplication_id=auto_deduplication_id,
+            collapse=self._publish_cache is not None,
+            executor=executor,
         )
 
-        return parse_batch_response(response)
+        return self._send_batch(body, indexes, compact)
+
+    @overload
+    def batch_json(
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        defaults: Optional[BatchJsonRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[False] = False,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]: ...
+
+    @overload
+    def batch_json(
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        defaults: Optional[BatchJsonRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: Literal[True],
+    ) -> CompactBatchResponse: ...
 
     def batch_json(
-        self, messages: List[BatchJsonRequest]
-    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        defaults: Optional[BatchJsonRequest] = None,
+        auto_deduplication_id: Union[bool, str] = False,
+        executor: Optional[Executor] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        compact: bool = False,
+    ) -> Union[
+        List[Union[BatchResponse, List[BatchUrlGroupResponse]]], CompactBatchResponse
+    ]:
         """
         Publishes or enqueues multiple messages in a single request,
         automatically serializing the message bodies as JSON strings,
@@ -1412,20 +3380,342 @@ class MessageApi:
         If the message in the batch is sent to a url group,
         the corresponding item in the response is list of
         `BatchUrlGroupResponse`s, one for each url in the url group.
+
+        :param messages: Messages to publish or enqueue.
+        :param defaults: Options shared by all the messages in the batch.
+            They are prepared once, and the options of each message
+            override them. Forwarded headers are merged, with the headers
+            of the message taking precedence. The default destination is
+            only used for the messages without a `url`, `url_group`,
+            or `api`.
+        :param auto_deduplication_id: Whether to set a deduplication id, derived
+            from the destination, queue, headers, and body, on the messages
+            without a `deduplication_id` or `content_based_deduplication`.
+            Sending the same messages again, such as after a timeout or a
+            failed response, then produces the same ids, and the messages
+            that were already accepted are reported as `deduplicated`.
+            The same messages sent on purpose in a later batch, within the
+            deduplication window of QStash, are deduplicated as well. To
+            tell such batches apart, give a string instead, such as an
+            idempotency key of the batch, which is mixed into the ids. The
+            key must not be empty.
+        :param executor: Executor to prepare the messages on, in chunks, such as
+            a `ProcessPoolExecutor` to encode large batches on multiple cores.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param compact: Whether to return the result as a `CompactBatchResponse`,
+            which stores the message ids in arrays, and creates the response
+            objects lazily on access.
+        """
+        if spread_over is not None:
+            messages = spread_batch_messages(
+                messages, spread_over, spread_profile, defaults
+            )
+
+        body, indexes = prepare_batch_request_body(
+            messages,
+            convert_to_batch_defaults(defaults) if defaults is not None else None,
+            json_bodies=True,
+            auto_deduplication_id=auto_deduplication_id,
+            collapse=self._publish_cache is not None,
+            executor=executor,
+        )
+
+        return self._send_batch(body, indexes, compact)
+
+    def _send_batch(
+        self,
+        body: str,
+        indexes: Optional[List[int]],
+        compact: bool,
+    ) -> Union[
+        List[Union[BatchResponse, List[BatchUrlGroupResponse]]], CompactBatchResponse
+    ]:
+        response = self._http.request(
+            path="/v2/batch",
+            body=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+            lane="bulk",
+        )
+
+        if indexes is not None:
+            response = [response[i] for i in indexes]
+
+        if compact:
+            return parse_compact_batch_response(response)
+
+        return parse_batch_response(response)
+
+    def batch_columns(
+        self,
+        *,
+        urls: Optional[Iterable[str]] = None,
+        bodies: Optional[Iterable[Union[str, bytes]]] = None,
+        deduplication_ids: Optional[Iterable[Optional[str]]] = None,
+        delays: Optional[Iterable[Optional[Union[str, int]]]] = None,
+        not_befores: Optional[Iterable[Optional[int]]] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        defaults: Optional[BatchRequest] = None,
+        chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE,
+    ) -> CompactBatchResponse:
+        """
+        Publishes or enqueues many messages given as parallel columns,
+        in batches of at most `chunk_size` messages.
+
+        The columns can be lists, tuples, or NumPy-style arrays, and all
+        of them must have the same length. The message at index `i`
+        is built from the `i`th item of each column, and the `defaults`.
+        `None` items in the columns fall back to the defaults.
+
+        The messages are encoded into the batch requests directly,
+        and the message ids are returned in a `CompactBatchResponse`,
+        in the order of the columns.
+
+        The chunks are sent one after another. If one of them fails,
+        `BatchChunkError` is raised with the `result` of the messages
+        accepted before it, so that only the messages from the index
+        `len(error.result)` on need to be sent again.
+
+        :param urls: Urls to send the messages to. When not provided,
+            the destination of the `defaults` is used.
+        :param bodies: The raw request message bodies passed to the
+            destinations as is.
+        :param deduplication_ids: Ids to use while deduplicating messages.
+        :param delays: Delays for the message deliveries.
+        :param not_befores: Unix timestamps in seconds, based on the UTC timezone,
+            to delay the messages until.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param defaults: Options shared by all the messages.
+        :param chunk_size: Maximum number of messages to send in a single
+            batch request.
+        """
+        result = CompactBatchResponse()
+        for body in prepare_batch_columns_bodies(
+            urls=urls,
+            bodies=bodies,
+            deduplication_ids=deduplication_ids,
+            delays=delays,
+            not_befores=not_befores,
+            spread_over=spread_over,
+            spread_profile=spread_profile,
+            defaults=defaults,
+            chunk_size=chunk_size,
+            json_bodies=False,
+        ):
+            try:
+                response = self._http.request(
+                    path="/v2/batch",
+                    body=body,
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                    lane="bulk",
+                )
+            except Exception as e:
+                raise BatchChunkError(result, e) from e
+
+            result.extend(response)
+
+        return result
+
+    def batch_json_columns(
+        self,
+        *,
+        urls: Optional[Iterable[str]] = None,
+        bodies: Optional[Iterable[Any]] = None,
+        deduplication_ids: Optional[Iterable[Optional[str]]] = None,
+        delays: Optional[Iterable[Optional[Union[str, int]]]] = None,
+        not_befores: Optional[Iterable[Optional[int]]] = None,
+        spread_over: Optional[int] = None,
+        spread_profile: Optional[SpreadProfile] = None,
+        defaults: Optional[BatchJsonRequest] = None,
+        chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE,
+    ) -> CompactBatchResponse:
         """
-        batch_messages = convert_to_batch_messages(messages)
-        return self.batch(batch_messages)
+        Publishes or enqueues many messages given as parallel columns,
+        in batches of at most `chunk_size` messages, automatically
+        serializing the message bodies as JSON strings, and setting
+        content type to `application/json`.
+
+        See `batch_columns` for the details.
+
+        :param urls: Urls to send the messages to. When not provided,
+            the destination of the `defaults` is used.
+        :param bodies: The request message bodies passed to the destinations
+            after being serialized as JSON strings. `RawJson` values and `bytes`
+            are treated as already serialized JSON and passed as is.
+        :param deduplication_ids: Ids to use while deduplicating messages.
+        :param delays: Delays for the message deliveries.
+        :param not_befores: Unix timestamps in seconds, based on the UTC timezone,
+            to delay the messages until.
+        :param spread_over: Number of seconds to spread the deliveries of the
+            messages over, by giving them increasing delays, so that the
+            consumers get a smooth arrival rate instead of a burst. The
+            messages with their own `delay` or `not_before` keep them, and
+            the offsets of the others are added to the default ones.
+        :param spread_profile: Shape of the arrival rate over the window,
+            such as `qstash.spread.ramp_up`. Uniform by default.
+        :param defaults: Options shared by all the messages.
+        :param chunk_size: Maximum number of messages to send in a single
+            batch request.
+        """
+        result = CompactBatchResponse()
+        for body in prepare_batch_columns_bodies(
+            urls=urls,
+            bodies=bodies,
+            deduplication_ids=deduplication_ids,
+            delays=delays,
+            not_befores=not_befores,
+            spread_over=spread_over,
+            spread_profile=spread_profile,
+            defaults=(
+                convert_to_batch_defaults(defaults) if defaults is not None else None
+            ),
+            chunk_size=chunk_size,
+            json_bodies=True,
+        ):
+            try:
+                response = self._http.request(
+                    path="/v2/batch",
+                    body=body,
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                    lane="bulk",
+                )
+            except Exception as e:
+                raise BatchChunkError(result, e) from e
+
+            result.extend(response)
+
+        return result
+
+    def wait_for(
+        self,
+        message_ids: List[str],
+        *,
+        timeout: Optional[float] = None,
+        poll_interval: float = DEFAULT_WAIT_FOR_POLL_INTERVAL,
+        max_poll_interval: float = DEFAULT_WAIT_FOR_MAX_POLL_INTERVAL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> Dict[str, "Log"]:
+        """
+        Waits until the messages are delivered, failed, or canceled.
+
+        Returns the final log of each message, by message id. The messages
+        that do not reach a final state before the timeout are left out.
+
+        All the outstanding messages are resolved with a few events queries
+        per poll, each filtered by a chunk of message ids.
+
+        :param message_ids: Ids of the messages to wait for.
+        :param timeout: Maximum number of seconds to wait. Waits until all
+            the messages are finished by default.
+        :param poll_interval: Initial number of seconds between the polls.
+        :param max_poll_interval: Maximum number of seconds between the polls.
+            The interval grows up to it while no message finishes.
+        :param concurrency: Maximum number of events queries sent at the same
+            time.
+        """
+        from qstash.log import LogApi
+
+        log = LogApi(self._http)
+        waiter = DeliveryWaiter(
+            message_ids,
+            timeout=timeout,
+            poll_interval=poll_interval,
+            max_poll_interval=max_poll_interval,
+        )
+
+        def query(log_filter: "LogFilter") -> List["Log"]:
+            logs: List["Log"] = []
+            cursor = None
+            while True:
+                res = log.list(cursor=cursor, count=1000, filter=log_filter)
+                logs.extend(res.logs)
+                cursor = res.cursor
+                if not cursor:
+                    return logs
+
+        while waiter.pending:
+            pending_count = len(waiter.pending)
+            results = map_concurrently(query, waiter.start_poll(), concurrency)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+
+                waiter.resolve(result)
+
+            delay = waiter.next_delay(len(waiter.pending) < pending_count)
+            if delay is None:
+                break
+
+            time.sleep(delay)
+
+        return waiter.results
 
     def get(self, message_id: str) -> Message:
         """
         Gets the message by its id.
+
+        If the client has a message cache, a copy of the cached message is
+        returned without a request. It might be stale, as the messages are
+        deleted once they are delivered, failed, or cancelled elsewhere,
+        until the cached entry expires.
         """
+        if self._message_cache is not None:
+            cached = self._message_cache.get(message_id)
+            if cached is not None:
+                return copy.deepcopy(cached)
+
         response = self._http.request(
             path=f"/v2/messages/{message_id}",
             method="GET",
         )
 
-        return parse_message_response(response)
+        message = parse_message_response(response)
+        if self._message_cache is not None:
+            self._message_cache.put(message_id, copy.deepcopy(message))
+
+        return message
+
+    def get_many(
+        self,
+        message_ids: List[str],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[Union[Message, Exception]]:
+        """
+        Gets the messages by their ids, running at most `concurrency`
+        requests at the same time.
+
+        Repeated ids are fetched once, and the cached messages, if the
+        client has a message cache, are returned without a request, with
+        the same staleness as `get`.
+
+        Results are returned in the order of the message ids. If getting a
+        message fails, the exception is returned in its place instead of
+        being raised.
+
+        :param message_ids: Ids of the messages.
+        :param concurrency: Maximum number of requests to run at the same time.
+        """
+        unique_ids = list(dict.fromkeys(message_ids))
+        results = dict(
+            zip(unique_ids, map_concurrently(self.get, unique_ids, concurrency))
+        )
+        return [results[message_id] for message_id in message_ids]
 
     def cancel(self, message_id: str) -> None:
         """
@@ -1441,7 +3731,18 @@ class MessageApi:
             parse_response=False,
         )
 
-    def cancel_many(self, message_ids: List[str]) -> int:
+        if self._message_cache is not None:
+            self._message_cache.pop(message_id)
+
+    def cancel_many(
+        self,
+        message_ids: List[str],
+        *,
+        chunk_size: int = DEFAULT_CANCEL_CHUNK_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retries: int = DEFAULT_CANCEL_CHUNK_RETRIES,
+        on_progress: Optional[CancelProgress] = None,
+    ) -> int:
         """
         Cancels delivery of existing messages.
 
@@ -1449,18 +3750,135 @@ class MessageApi:
         delivered in the future. If a message is in flight to your API,
         it might be too late to cancel.
 
+        The message ids are cancelled in chunks, with at most `concurrency`
+        requests sent at the same time. A failed chunk is retried on its own,
+        and its error is raised once its retries are exhausted, after the
+        other chunks are done.
+
         Returns how many of the messages are cancelled.
+
+        :param message_ids: Ids of the messages to cancel.
+        :param chunk_size: Maximum number of message ids cancelled in a single
+            request.
+        :param concurrency: Maximum number of requests sent at the same time.
+        :param retries: Number of times a failed chunk is retried.
+        :param on_progress: Called after each chunk is cancelled, with the
+            number of processed message ids, the total number of message ids,
+            and the number of messages cancelled so far.
         """
-        body = json.dumps({"messageIds": message_ids})
+        tracker = CancelTracker(len(message_ids), on_progress)
+
+        def cancel_chunk(chunk: List[str]) -> None:
+            body = json.dumps({"messageIds": chunk})
+            for attempt in range(retries + 1):
+                try:
+                    response = self._http.request(
+                        path="/v2/messages",
+                        method="DELETE",
+                        headers={"Content-Type": "application/json"},
+                        body=body,
+                    )
+                    break
+                except Exception:
+                    if attempt == retries:
+                        raise
 
-        response = self._http.request(
-            path="/v2/messages",
-            method="DELETE",
-            headers={"Content-Type": "application/json"},
-            body=body,
+                    time.sleep(cancel_retry_delay(attempt))
+
+            if self._message_cache is not None:
+                for message_id in chunk:
+                    self._message_cache.pop(message_id)
+
+            tracker.add(len(chunk), response["cancelled"])
+
+        results = map_concurrently(
+            cancel_chunk,
+            split_message_ids(message_ids, chunk_size),
+            concurrency,
         )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
 
-        return response["cancelled"]  # type:ignore[no-any-return]
+        return tracker.cancelled
+
+    def cancel_where(
+        self,
+        filter: "LogFilter",
+        *,
+        dry_run: bool = False,
+        chunk_size: int = DEFAULT_CANCEL_CHUNK_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> int:
+        """
+        Cancels delivery of the messages matching the filter.
+
+        The ids of the matching messages are streamed from the events api
+        in chunks, and the pending messages of each chunk, which are the
+        messages whose latest state is `CREATED`, `ACTIVE`, or `RETRY`, are
+        cancelled while the listing continues. At most `concurrency` chunks
+        are processed at the same time, so the memory use does not depend
+        on the number of messages.
+
+        Returns how many of the messages are cancelled, or with `dry_run`,
+        how many of them are pending.
+
+        :param filter: Filter of the messages, such as a label, a queue,
+            or a schedule id. It must not have a `state`, as only the
+            pending messages are cancelled.
+        :param dry_run: Whether to only count the messages to cancel.
+        :param chunk_size: Maximum number of message ids cancelled in a single
+            request.
+        :param concurrency: Maximum number of chunks processed at the same time.
+        """
+        from qstash.log import LogApi, LogState
+
+        check_cancel_where_options(filter, chunk_size, concurrency)
+
+        log = LogApi(self._http)
+
+        # Every message has a single creation event.
+        log_filter: "LogFilter" = {**filter, "state": LogState.CREATED}
+
+        def chunks() -> Iterator[List[str]]:
+            chunk: List[str] = []
+            cursor = None
+            while True:
+                res = log.list(cursor=cursor, count=1000, filter=log_filter)
+                for entry in res.logs:
+                    chunk.append(entry.message_id)
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+
+                cursor = res.cursor
+                if not cursor:
+                    break
+
+            if chunk:
+                yield chunk
+
+        def process(chunk: List[str]) -> int:
+            states = log.latest_states(chunk, concurrency=1)
+            pending = filter_pending(chunk, states)
+            if dry_run or not pending:
+                return len(pending)
+
+            return self.cancel_many(pending, chunk_size=chunk_size, concurrency=1)
+
+        total = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures: "Set[Future[int]]" = set()
+            for chunk in chunks():
+                if len(futures) >= concurrency:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    total += sum(future.result() for future in done)
+
+                futures.add(executor.submit(process, chunk))
+
+            total += sum(future.result() for future in futures)
+
+        return total
 
     def cancel_all(self) -> int:
         """
@@ -1477,4 +3895,7 @@ class MessageApi:
             method="DELETE",
         )
 
+        if self._message_cache is not None:
+            self._message_cache.clear()
+
         return response["cancelled"]  # type:ignore[no-any-return]
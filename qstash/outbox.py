@@ -0,0 +1,343 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from qstash.client import QStash
+from qstash.errors import QStashError
+from qstash.message import (
+    BatchJsonRequest,
+    BatchRequest,
+    convert_to_batch_messages,
+    ensure_deduplication_id,
+    prepare_batch_messages,
+    send_batch_isolating_rejected,
+)
+
+DEFAULT_OUTBOX_BATCH_SIZE = 100
+DEFAULT_OUTBOX_MAX_ATTEMPTS = 10
+
+
+class Outbox:
+    """
+    Durable, local outbox for publishing and enqueueing messages.
+
+    Messages are appended to an SQLite database in WAL mode and the calls
+    return right away. A background thread sends the stored messages to
+    QStash in batches, retrying failed batches with an exponential backoff.
+    Messages that are not sent yet are picked up again after a restart.
+
+    Transient errors, such as timeouts, connection errors, and 5xx
+    responses, are retried without a limit, so that the messages survive
+    QStash or network incidents. When QStash rejects a batch for its
+    content, such as an invalid destination, the batch is split in halves
+    which are sent on their own, and only the rejected messages count
+    their attempts.
+
+    Each message gets a deduplication id when it is stored, unless it has
+    a `deduplication_id` or `content_based_deduplication`, so that a batch
+    that is sent again after an ambiguous failure does not create
+    duplicate messages.
+
+    The messages are stored as prepared for the batch api, so the
+    Authorization header of the `api` destinations is stored as well.
+    """
+
+    def __init__(
+        self,
+        client: QStash,
+        path: str,
+        *,
+        batch_size: int = DEFAULT_OUTBOX_BATCH_SIZE,
+        drain_interval: float = 1.0,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+        max_attempts: int = DEFAULT_OUTBOX_MAX_ATTEMPTS,
+        start: bool = True,
+    ) -> None:
+        """
+        :param client: Client used to send the messages.
+        :param path: Path of the SQLite database of the outbox.
+        :param batch_size: Maximum number of messages sent in a single batch.
+        :param drain_interval: Number of seconds to wait before checking
+            for new messages, when the outbox is empty.
+        :param retry_delay: Number of seconds to wait before retrying a failed
+            batch. It is doubled on each consecutive failure.
+        :param max_retry_delay: Maximum number of seconds to wait before
+            retrying a failed batch.
+        :param max_attempts: Number of times a message is rejected by QStash
+            before it is marked as failed. Failed messages are kept in the
+            database, and are not sent again, unless they are requeued with
+            `requeue_failed`.
+        :param start: Whether to start sending the messages right away.
+        """
+        self._client = client
+        self._batch_size = batch_size
+        self._drain_interval = drain_interval
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                message TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if start:
+            self.start()
+
+    def publish(self, message: BatchRequest) -> None:
+        """
+        Stores the message to be published, or enqueued if it has a `queue`.
+        """
+        self.batch([message])
+
+    def publish_json(self, message: BatchJsonRequest) -> None:
+        """
+        Stores the message to be published, or enqueued if it has a `queue`,
+        after serializing its body as JSON string.
+        """
+        self.batch_json([message])
+
+    def enqueue(self, queue: str, message: BatchRequest) -> None:
+        """Stores the message to be enqueued on the queue."""
+        self.batch([{**message, "queue": queue}])
+
+    def enqueue_json(self, queue: str, message: BatchJsonRequest) -> None:
+        """
+        Stores the message to be enqueued on the queue, after serializing
+        its body as JSON string.
+        """
+        self.batch_json([{**message, "queue": queue}])
+
+    def batch(self, messages: List[BatchRequest]) -> None:
+        """Stores the messages in a single transaction."""
+        created_at = time.time()
+        rows = []
+        for batch_message in prepare_batch_messages(messages):
+            ensure_deduplication_id(batch_message)
+
+            rows.append((created_at, json.dumps(batch_message)))
+
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "INSERT INTO outbox (created_at, message) VALUES (?, ?)", rows
+            )
+            self._connection.execute("COMMIT")
+
+        self._wakeup.set()
+
+    def batch_json(self, messages: List[BatchJsonRequest]) -> None:
+        """
+        Stores the messages in a single transaction, after serializing
+        their bodies as JSON strings.
+        """
+        self.batch(convert_to_batch_messages(messages))
+
+    @property
+    def pending_count(self) -> int:
+        """Number of messages waiting to be sent."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE failed = 0"
+            ).fetchone()
+
+        return int(row[0])
+
+    @property
+    def failed_count(self) -> int:
+        """Number of messages rejected by QStash `max_attempts` times."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE failed = 1"
+            ).fetchone()
+
+        return int(row[0])
+
+    def requeue_failed(self) -> int:
+        """
+        Marks the failed messages as waiting to be sent again, such as
+        after fixing their destination, and returns how many there were.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE outbox SET attempts = 0, failed = 0 WHERE failed = 1"
+            )
+
+        self._wakeup.set()
+        return cursor.rowcount
+
+    @property
+    def lag(self) -> float:
+        """
+        Number of seconds the oldest message waiting to be sent has been
+        in the outbox, or `0` if there are no such messages.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE failed = 0"
+            ).fetchone()
+
+        if row[0] is None:
+            return 0.0
+
+        return max(0.0, time.time() - float(row[0]))
+
+    def start(self) -> None:
+        """Starts sending the stored messages in the background."""
+        if self._thread is not None:
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._drain,
+            name="qstash-outbox",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until all the stored messages are sent or failed.
+
+        Returns whether the outbox was emptied before the timeout. Raises
+        `QStashError` if there are messages to send, but the outbox is not
+        sending them, as it is not started or its thread has stopped.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.pending_count > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                raise QStashError("The outbox is not sending the messages.")
+
+            self._wakeup.set()
+            time.sleep(0.05)
+
+        return True
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Stops the background thread, after waiting for the stored messages
+        to be sent for at most `timeout` seconds. The messages that are not
+        sent yet stay in the database, and are sent by the next outbox
+        opened on it.
+        """
+        thread = self._thread
+        if (
+            thread is not None
+            and thread.is_alive()
+            and (timeout is None or timeout > 0)
+        ):
+            self.flush(timeout)
+
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> "Outbox":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _drain(self) -> None:
+        failures = 0
+        while not self._stopped.is_set():
+            rows = self._next_batch()
+            if not rows:
+                self._wakeup.wait(self._drain_interval)
+                self._wakeup.clear()
+                continue
+
+            rejected: List[int] = []
+            succeeded = True
+            try:
+                send_batch_isolating_rejected(
+                    self._client.http,
+                    rows,
+                    lambda rows: "[" + ",".join(message for _, message in rows) + "]",
+                    lambda rows: self._delete([row_id for row_id, _ in rows]),
+                    lambda row, _: rejected.append(row[0]),
+                )
+            except Exception:
+                # Transient errors do not count as attempts, the rows that
+                # are not sent yet are tried again after the backoff.
+                succeeded = False
+
+            if rejected:
+                self._record_rejections(rejected)
+                succeeded = False
+
+            if not succeeded:
+                failures += 1
+                delay = min(
+                    self._retry_delay * 2 ** (failures - 1),
+                    self._max_retry_delay,
+                )
+                self._stopped.wait(delay)
+                continue
+
+            failures = 0
+
+    def _next_batch(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, message FROM outbox WHERE failed = 0 ORDER BY id LIMIT ?",
+                (self._batch_size,),
+            ).fetchall()
+
+        return [(int(row_id), str(message)) for row_id, message in rows]
+
+    def _record_rejections(self, ids: List[int]) -> None:
+        params: List[Dict[str, Any]] = [
+            {"id": row_id, "max_attempts": self._max_attempts} for row_id in ids
+        ]
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                """
+                UPDATE outbox
+                SET attempts = attempts + 1,
+                    failed = attempts + 1 >= :max_attempts
+                WHERE id = :id AND failed = 0
+                """,
+                params,
+            )
+            self._connection.execute("COMMIT")
+
+    def _delete(self, ids: List[int]) -> None:
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in ids]
+            )
+            self._connection.execute("COMMIT")
@@ -7,6 +7,8 @@ from qstash.http import HttpClient
 
 @dataclasses.dataclass
 class Queue:
+    __slots__ = ("name", "parallelism", "created_at", "updated_at", "lag", "paused")
+
     name: str
     """Name of the queue."""
 
@@ -0,0 +1,183 @@
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Mapping, Optional, Tuple
+
+from qstash.errors import QStashError
+
+if sys.platform != "win32":
+    import fcntl
+
+STATE = struct.Struct("!ddd")
+"""Limit, remaining requests, and reset time of the burst window."""
+
+UNKNOWN = -1.0
+
+
+def parse_reset(value: str, now: float) -> Optional[float]:
+    """
+    Returns the unix time the burst window resets at, given as either
+    a unix timestamp in seconds or milliseconds, or a number of seconds.
+    """
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+
+    if reset > 1e12:
+        return reset / 1000
+
+    if reset > 1e9:
+        return reset
+
+    return now + reset
+
+
+class FileRateLimiter:
+    """
+    Burst rate limiter shared by the processes of a host through a
+    lock-protected file.
+
+    Every request to QStash draws one request from the burst budget
+    stored in the file, and the budget is updated from the
+    `Burst-RateLimit-*` headers of the responses. When the budget is
+    exhausted, requests wait until the burst window resets, instead of
+    failing with `429 Too Many Requests` together.
+
+    All the processes using the same token should use the same file.
+    It is only supported on platforms with `fcntl`.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Path of the file holding the shared state. It is
+            created if it does not exist.
+        """
+        if sys.platform == "win32":
+            raise QStashError("FileRateLimiter is not supported on Windows.")
+
+        self._path = path
+        self._fd: Optional[int] = None
+        self._pid = os.getpid()
+
+        # File locks do not exclude the threads of the same process.
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Tries to draw a request from the budget.
+
+        Returns `0` if the request can be sent, otherwise the number of
+        seconds to wait before trying again.
+        """
+        now = time.time()
+        with self._lock, LockedState(self._file()) as state:
+            limit, remaining, reset_at = state.read()
+            if reset_at != UNKNOWN and now >= reset_at:
+                # A new window has started, the budget is not known until
+                # the next response, unless the limit is known.
+                remaining = limit
+                reset_at = UNKNOWN
+
+            if remaining == UNKNOWN or remaining >= 1:
+                if remaining != UNKNOWN:
+                    remaining -= 1
+
+                state.write(limit, remaining, reset_at)
+                return 0.0
+
+            if reset_at == UNKNOWN:
+                return 0.0
+
+            return max(reset_at - now, 0.001)
+
+    def acquire(self) -> None:
+        """Blocks until a request can be sent, and draws it from the budget."""
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return
+
+            time.sleep(delay)
+
+    def update(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Updates the budget from the headers of a QStash response."""
+        if "Burst-RateLimit-Remaining" not in headers:
+            return
+
+        now = time.time()
+        try:
+            server_limit = float(headers.get("Burst-RateLimit-Limit", UNKNOWN))
+            server_remaining = float(headers["Burst-RateLimit-Remaining"])
+        except ValueError:
+            return
+
+        reset_header = headers.get("Burst-RateLimit-Reset")
+        server_reset = parse_reset(reset_header, now) if reset_header else None
+
+        if status_code == 429:
+            server_remaining = 0
+
+        with self._lock, LockedState(self._file()) as state:
+            _, remaining, reset_at = state.read()
+
+            # The other processes might have drawn from the budget since
+            # the response was sent, so the smaller one is kept within
+            # the same window.
+            same_window = reset_at != UNKNOWN and (
+                server_reset is None or abs(server_reset - reset_at) < 1
+            )
+            if same_window and remaining != UNKNOWN:
+                server_remaining = min(server_remaining, remaining)
+
+            state.write(
+                server_limit,
+                server_remaining,
+                server_reset if server_reset is not None else reset_at,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _file(self) -> int:
+        if self._fd is not None and self._pid != os.getpid():
+            # The file is shared with the parent process after a fork,
+            # and would not exclude it from the lock unless reopened.
+            os.close(self._fd)
+            self._fd = None
+
+        if self._fd is None:
+            self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+
+        return self._fd
+
+
+class LockedState:
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+
+    def __enter__(self) -> "LockedState":
+        if sys.platform != "win32":
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        if sys.platform != "win32":
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def read(self) -> Tuple[float, float, float]:
+        data = os.pread(self._fd, STATE.size, 0)
+        if len(data) < STATE.size:
+            return UNKNOWN, UNKNOWN, UNKNOWN
+
+        limit, remaining, reset_at = STATE.unpack(data)
+        return limit, remaining, reset_at
+
+    def write(self, limit: float, remaining: float, reset_at: float) -> None:
+        os.pwrite(self._fd, STATE.pack(limit, remaining, reset_at), 0)
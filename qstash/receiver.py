@@ -4,6 +4,11 @@ from typing import Optional
 
 import jwt
 
+from qstash.claim_check import (
+    BlobStore,
+    ResolvedBody,
+    parse_claim_check_reference,
+)
 from qstash.errors import SignatureError
 
 
@@ -97,3 +102,19 @@ class Receiver:
                 url=url,
                 clock_tolerance=clock_tolerance,
             )
+
+    def resolve_body(self, *, body: str, store: BlobStore) -> ResolvedBody:
+        """
+        Resolves the body of a message published with a `ClaimCheck`.
+
+        If the body is a claim check reference, the original body is fetched
+        from the store and its hash is verified lazily, when it is read. Other
+        bodies are returned as they are.
+
+        The signature should be verified against the received body, before
+        resolving it.
+
+        :param body: The raw request body.
+        :param store: The blob store the body was offloaded to.
+        """
+        return ResolvedBody(body, parse_claim_check_reference(body), store)
@@ -20,6 +20,34 @@ class ScheduleState(enum.Enum):
 
 @dataclasses.dataclass
 class Schedule:
+    __slots__ = (
+        "schedule_id",
+        "destination",
+        "cron",
+        "created_at",
+        "body",
+        "body_base64",
+        "method",
+        "headers",
+        "callback_headers",
+        "failure_callback_headers",
+        "retries",
+        "retry_delay_expression",
+        "callback",
+        "failure_callback",
+        "queue",
+        "delay",
+        "timeout",
+        "caller_ip",
+        "paused",
+        "flow_control",
+        "last_schedule_time",
+        "next_schedule_time",
+        "last_schedule_states",
+        "error",
+        "label",
+    )
+
     schedule_id: str
     """Id of the schedule."""
 
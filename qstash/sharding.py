@@ -0,0 +1,673 @@
+import bisect
+import dataclasses
+import hashlib
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from qstash.client import QStash
+from qstash.errors import (
+    DailyMessageLimitExceededError,
+    QStashError,
+    RateLimitExceededError,
+)
+from qstash.http import HttpMethod, RequestBody
+from qstash.message import (
+    ApiT,
+    BatchJsonRequest,
+    BatchRequest,
+    BatchResponse,
+    BatchUrlGroupResponse,
+    EnqueueResponse,
+    EnqueueUrlGroupResponse,
+    FlowControl,
+    PublishResponse,
+    PublishUrlGroupResponse,
+    Redact,
+)
+from qstash.rate_limit import parse_reset
+
+R = TypeVar("R")
+
+DEFAULT_VIRTUAL_NODES = 64
+"""Number of points each unit of weight gets on the hash ring."""
+
+BURST_LIMIT_BACKOFF = 1.0
+"""Seconds a shard is skipped after a burst rate limit without a reset."""
+
+DAILY_LIMIT_BACKOFF = 60.0
+"""Seconds a shard is skipped after a daily limit without a reset."""
+
+
+@dataclasses.dataclass
+class ShardStats:
+    __slots__ = (
+        "request_count",
+        "message_count",
+        "error_count",
+        "rate_limited_count",
+        "daily_limited_count",
+        "exhausted_until",
+    )
+
+    request_count: int
+    """Number of requests sent to the shard, including the failed ones."""
+
+    message_count: int
+    """Number of messages published or enqueued on the shard."""
+
+    error_count: int
+    """Number of requests failed with errors other than the limit errors."""
+
+    rate_limited_count: int
+    """Number of requests failed with `RateLimitExceededError`."""
+
+    daily_limited_count: int
+    """Number of requests failed with `DailyMessageLimitExceededError`."""
+
+    exhausted_until: float
+    """
+    Unix time in seconds until which the shard is skipped, because it
+    reported limit exhaustion, or `0` if it is available.
+    """
+
+
+def hash_point(value: str) -> int:
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], "big")
+
+
+class ShardRouter:
+    """
+    Picks the shards to send the requests to, by smooth weighted
+    round-robin, or consistent hashing on a key, skipping the shards
+    that reported limit exhaustion, and keeps the stats of the shards.
+    """
+
+    def __init__(
+        self,
+        weights: Sequence[int],
+        *,
+        virtual_nodes: int = DEFAULT_VIRTUAL_NODES,
+    ) -> None:
+        if not weights:
+            raise QStashError("At least one shard is required.")
+
+        if any(weight < 1 for weight in weights):
+            raise QStashError("Shard weights must be at least 1.")
+
+        self._weights = list(weights)
+        self._current = [0] * len(weights)
+        self._lock = threading.Lock()
+
+        ring = sorted(
+            (hash_point(f"{shard}-{node}"), shard)
+            for shard, weight in enumerate(weights)
+            for node in range(weight * virtual_nodes)
+        )
+        self._ring_points = [point for point, _ in ring]
+        self._ring_shards = [shard for _, shard in ring]
+
+        self.stats = [ShardStats(0, 0, 0, 0, 0, 0.0) for _ in weights]
+        """Stats of the shards, in the order they are given."""
+
+    def order(self, key: Optional[str] = None, *, pinned: bool = False) -> List[int]:
+        """
+        Returns the indexes of the shards to try, in order.
+
+        The shards that reported limit exhaustion are left out, unless
+        all of them did, in which case the one that becomes available
+        first is returned.
+
+        When `pinned` is true, only the shard the key is hashed to is
+        returned, even if it reported limit exhaustion.
+        """
+        if pinned and key is not None:
+            return self._ring_order(key, set(range(len(self.stats))))[:1]
+
+        now = time.time()
+        with self._lock:
+            available = [
+                shard
+                for shard, stats in enumerate(self.stats)
+                if stats.exhausted_until <= now
+            ]
+            if not available:
+                shard = min(
+                    range(len(self.stats)),
+                    key=lambda s: self.stats[s].exhausted_until,
+                )
+                return [shard]
+
+            if key is None:
+                first = self._next_round_robin(available)
+                return [first] + [shard for shard in available if shard != first]
+
+        return self._ring_order(key, set(available))
+
+    def snapshot(self) -> List[ShardStats]:
+        """Returns a copy of the stats of the shards."""
+        with self._lock:
+            return [dataclasses.replace(stats) for stats in self.stats]
+
+    def record_success(self, shard: int, message_count: int) -> None:
+        with self._lock:
+            stats = self.stats[shard]
+            stats.request_count += 1
+            stats.message_count += message_count
+            stats.exhausted_until = 0.0
+
+    def record_error(self, shard: int, error: Exception) -> None:
+        """
+        Records the failed request, and marks the shard as exhausted until
+        its limit resets, if the error is a limit error.
+        """
+        now = time.time()
+        with self._lock:
+            stats = self.stats[shard]
+            stats.request_count += 1
+
+            if isinstance(error, RateLimitExceededError):
+                stats.rate_limited_count += 1
+                backoff = BURST_LIMIT_BACKOFF
+            elif isinstance(error, DailyMessageLimitExceededError):
+                stats.daily_limited_count += 1
+                backoff = DAILY_LIMIT_BACKOFF
+            else:
+                stats.error_count += 1
+                return
+
+            reset = parse_reset(error.reset, now) if error.reset else None
+            stats.exhausted_until = max(
+                stats.exhausted_until,
+                reset if reset is not None and reset > now else now + backoff,
+            )
+
+    def _next_round_robin(self, available: List[int]) -> int:
+        total = 0
+        best = available[0]
+        for shard in available:
+            self._current[shard] += self._weights[shard]
+            total += self._weights[shard]
+            if self._current[shard] > self._current[best]:
+                best = shard
+
+        self._current[best] -= total
+        return best
+
+    def _ring_order(self, key: str, available: Set[int]) -> List[int]:
+        order: List[int] = []
+        start = bisect.bisect(self._ring_points, hash_point(key))
+        size = len(self._ring_shards)
+        for offset in range(size):
+            shard = self._ring_shards[(start + offset) % size]
+            if shard in available and shard not in order:
+                order.append(shard)
+                if len(order) == len(available):
+                    break
+
+        return order
+
+
+def get_shard_key(
+    key: Optional[str],
+    *,
+    queue: Optional[str] = None,
+    url_group: Optional[str] = None,
+) -> Tuple[Optional[str], bool]:
+    """
+    Returns the key to choose the shard by, which is the name of the
+    queue or url group, if there is no key, and whether the request is
+    pinned to the shard of the key.
+
+    Requests are pinned to the shard of their queue or url group, as
+    they belong to a single account.
+    """
+    if key is not None:
+        return key, False
+
+    shard_key = queue or url_group
+    return shard_key, shard_key is not None
+
+
+def get_batch_shard_key(
+    key: Optional[str], messages: Iterable[Mapping[str, Any]]
+) -> Tuple[Optional[str], bool]:
+    """
+    Returns the key to choose the shard of a batch by, which is the name
+    of the queue or url group of its messages, if there is no key, and
+    whether the batch is pinned to the shard of the key.
+    """
+    if key is not None:
+        return key, False
+
+    keys = {message.get("queue") or message.get("url_group") for message in messages}
+    keys.discard(None)
+    if len(keys) > 1:
+        raise QStashError(
+            "'key' must be given for the messages of multiple queues or url groups."
+        )
+
+    if not keys:
+        return None, False
+
+    return keys.pop(), True
+
+
+def is_limit_error(error: Exception) -> bool:
+    return isinstance(error, (RateLimitExceededError, DailyMessageLimitExceededError))
+
+
+class ShardedQStash:
+    """
+    Spreads the publish, enqueue, and batch requests across multiple
+    clients, such as the clients of different QStash accounts, to go
+    beyond the burst and daily limits of a single token.
+
+    Requests are sent to the shards by smooth weighted round-robin, or by
+    consistent hashing when a `key` is given, so that the requests with
+    the same key go to the same shard as long as it is available. As the
+    queues and url groups belong to a single account, the messages using
+    them are sent only to the shard of the name of their queue or url
+    group when there is no key.
+
+    A shard that fails with `RateLimitExceededError` or
+    `DailyMessageLimitExceededError` is skipped until its limit resets,
+    and the request is sent to the next shard, except for the requests
+    pinned to the shard of their queue or url group, which raise the
+    error. Requests rejected with these errors are not accepted by QStash,
+    so they are safe to resend. Other errors are raised as they are.
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[QStash],
+        *,
+        weights: Optional[Sequence[int]] = None,
+    ) -> None:
+        """
+        :param clients: Clients of the shards.
+        :param weights: Relative share of the requests each shard gets,
+            in the order of the clients. All the shards have the same
+            weight by default.
+        """
+        if weights is not None and len(weights) != len(clients):
+            raise QStashError("'weights' must have one weight for each client.")
+
+        self.clients = list(clients)
+        """Clients of the shards."""
+
+        self._router = ShardRouter(weights or [1] * len(self.clients))
+
+    @property
+    def stats(self) -> List[ShardStats]:
+        """Stats of the shards, in the order of the clients."""
+        return self._router.snapshot()
+
+    def run(
+        self,
+        fn: Callable[[QStash], R],
+        *,
+        key: Optional[str] = None,
+        pinned: bool = False,
+        message_count: int = 1,
+    ) -> R:
+        """
+        Calls `fn` with the client of the chosen shard, and with the client
+        of the next one while it fails with a limit error.
+
+        It can be used for the methods of the client that are not
+        covered by this class, such as `publish` with a hedged request.
+
+        :param fn: Function sending a request to QStash with the client.
+        :param key: Key to choose the shard by. Round-robin is used if not given.
+        :param pinned: Whether only the shard chosen by the key is tried,
+            raising its limit errors, as for the requests using a queue or
+            url group, which can't be sent to the other accounts.
+        :param message_count: Number of messages published by `fn`, for the stats.
+        """
+        last_error: Optional[Exception] = None
+        for shard in self._router.order(key, pinned=pinned):
+            try:
+                result = fn(self.clients[shard])
+            except Exception as e:
+                self._router.record_error(shard, e)
+                if not is_limit_error(e):
+                    raise
+
+                last_error = e
+                continue
+
+            self._router.record_success(shard, message_count)
+            return result
+
+        # Can't be None at this point
+        raise last_error  # type:ignore[misc]
+
+    def publish(
+        self,
+        *,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[RequestBody] = None,
+        content_type: Optional[str] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        flow_control: Optional[FlowControl] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message on one of the shards.
+
+        Messages to a `url_group` are sent to the shard chosen by the name
+        of the url group, unless a `key` is given, as the url groups belong
+        to a single account.
+
+        See `MessageApi.publish` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, url_group=url_group)
+        return self.run(
+            lambda client: client.message.publish(
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                content_type=content_type,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                delay=delay,
+                not_before=not_before,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                flow_control=flow_control,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    def publish_json(
+        self,
+        *,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[Any] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        delay: Optional[Union[str, int]] = None,
+        not_before: Optional[int] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        flow_control: Optional[FlowControl] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[PublishResponse, List[PublishUrlGroupResponse]]:
+        """
+        Publishes a message on one of the shards, automatically serializing
+        the body as JSON string, and setting content type to `application/json`.
+
+        Messages to a `url_group` are sent to the shard chosen by the name
+        of the url group, unless a `key` is given, as the url groups belong
+        to a single account.
+
+        See `MessageApi.publish_json` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, url_group=url_group)
+        return self.run(
+            lambda client: client.message.publish_json(
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                delay=delay,
+                not_before=not_before,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                flow_control=flow_control,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    def enqueue(
+        self,
+        *,
+        queue: str,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[RequestBody] = None,
+        content_type: Optional[str] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message on one of the shards.
+
+        Messages are sent to the shard chosen by the name of the queue,
+        unless a `key` is given, as the queues belong to a single account,
+        and splitting a queue across the shards would change its
+        parallelism and ordering.
+
+        See `MessageApi.enqueue` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, queue=queue)
+        return self.run(
+            lambda client: client.message.enqueue(
+                queue=queue,
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                content_type=content_type,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    def enqueue_json(
+        self,
+        *,
+        queue: str,
+        url: Optional[str] = None,
+        url_group: Optional[str] = None,
+        api: Optional[ApiT] = None,
+        body: Optional[Any] = None,
+        method: Optional[HttpMethod] = None,
+        headers: Optional[Dict[str, str]] = None,
+        callback_headers: Optional[Dict[str, str]] = None,
+        failure_callback_headers: Optional[Dict[str, str]] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[str] = None,
+        callback: Optional[str] = None,
+        failure_callback: Optional[str] = None,
+        deduplication_id: Optional[str] = None,
+        content_based_deduplication: Optional[bool] = None,
+        timeout: Optional[Union[str, int]] = None,
+        label: Optional[str] = None,
+        redact: Optional[Redact] = None,
+        hedge_after: Optional[float] = None,
+        key: Optional[str] = None,
+    ) -> Union[EnqueueResponse, List[EnqueueUrlGroupResponse]]:
+        """
+        Enqueues a message on one of the shards, automatically serializing
+        the body as JSON string, and setting content type to `application/json`.
+
+        Messages are sent to the shard chosen by the name of the queue,
+        unless a `key` is given, as the queues belong to a single account,
+        and splitting a queue across the shards would change its
+        parallelism and ordering.
+
+        See `MessageApi.enqueue_json` for the other options.
+
+        :param key: Key to choose the shard by. Round-robin is used if not
+            given, and there is no queue or url group.
+        """
+        shard_key, pinned = get_shard_key(key, queue=queue)
+        return self.run(
+            lambda client: client.message.enqueue_json(
+                queue=queue,
+                url=url,
+                url_group=url_group,
+                api=api,
+                body=body,
+                method=method,
+                headers=headers,
+                callback_headers=callback_headers,
+                failure_callback_headers=failure_callback_headers,
+                retries=retries,
+                retry_delay=retry_delay,
+                callback=callback,
+                failure_callback=failure_callback,
+                deduplication_id=deduplication_id,
+                content_based_deduplication=content_based_deduplication,
+                timeout=timeout,
+                label=label,
+                redact=redact,
+                hedge_after=hedge_after,
+            ),
+            key=shard_key,
+            pinned=pinned,
+        )
+
+    def batch(
+        self,
+        messages: List[BatchRequest],
+        *,
+        key: Optional[str] = None,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """
+        Publishes or enqueues the messages in a single request, on one
+        of the shards.
+
+        :param messages: Messages to publish or enqueue.
+        :param key: Key to choose the shard by. If not given, the name of the
+            queue or url group of the messages is used, and round-robin if
+            they have none. It is required for the messages of multiple
+            queues or url groups.
+        """
+        shard_key, pinned = get_batch_shard_key(key, messages)
+        return self.run(
+            lambda client: client.message.batch(messages),
+            key=shard_key,
+            pinned=pinned,
+            message_count=len(messages),
+        )
+
+    def batch_json(
+        self,
+        messages: List[BatchJsonRequest],
+        *,
+        key: Optional[str] = None,
+    ) -> List[Union[BatchResponse, List[BatchUrlGroupResponse]]]:
+        """
+        Publishes or enqueues the messages in a single request, on one
+        of the shards, after serializing their bodies as JSON strings.
+
+        :param messages: Messages to publish or enqueue.
+        :param key: Key to choose the shard by. If not given, the name of the
+            queue or url group of the messages is used, and round-robin if
+            they have none. It is required for the messages of multiple
+            queues or url groups.
+        """
+        shard_key, pinned = get_batch_shard_key(key, messages)
+        return self.run(
+            lambda client: client.message.batch_json(messages),
+            key=shard_key,
+            pinned=pinned,
+            message_count=len(messages),
+        )
@@ -0,0 +1,447 @@
+"""
+Sidecar mode, where many processes on a host hand their messages over
+a Unix socket to a single publisher process, which sends them to QStash
+in batches over one connection pool.
+
+Start the publisher process with::
+
+    QSTASH_TOKEN=... python -m qstash.sidecar /tmp/qstash.sock
+
+and publish from the other processes with `SidecarPublisher`.
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from os import environ
+from typing import Any, Callable, Dict, List, Optional
+
+from qstash.client import QStash
+from qstash.errors import QStashError
+from qstash.message import (
+    BatchJsonRequest,
+    BatchRequest,
+    convert_to_batch_messages,
+    ensure_deduplication_id,
+    prepare_batch_messages,
+    send_batch_isolating_rejected,
+)
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct("!I")
+
+DEFAULT_SIDECAR_BATCH_SIZE = 100
+DEFAULT_SIDECAR_LINGER = 0.005
+
+
+def encode_frames(messages: List[BatchRequest]) -> bytes:
+    """
+    Prepares the messages for the batch api, and encodes each of them
+    as a length-prefixed frame.
+
+    A deduplication id is given to the messages without one, so that
+    the publisher can retry the batches safely.
+    """
+    frames = bytearray()
+    for batch_message in prepare_batch_messages(messages):
+        ensure_deduplication_id(batch_message)
+
+        payload = json.dumps(batch_message).encode()
+        frames += FRAME_HEADER.pack(len(payload))
+        frames += payload
+
+    return bytes(frames)
+
+
+def decode_frame(frame: bytes) -> Dict[str, Any]:
+    try:
+        message: Dict[str, Any] = json.loads(frame)
+        return message
+    except ValueError:
+        return {"frame": frame.decode(errors="replace")}
+
+
+def log_dropped_messages(error: Exception, messages: List[Dict[str, Any]]) -> None:
+    """Logs the error, and the messages that could not be sent as JSON."""
+    logger.error(
+        "Could not send %d messages to QStash: %s\n%s",
+        len(messages),
+        error,
+        "\n".join(json.dumps(message) for message in messages),
+    )
+
+
+def dead_letter_writer(
+    path: str,
+) -> Callable[[Exception, List[Dict[str, Any]]], None]:
+    """
+    Returns an error handler that logs the error, and appends the
+    messages that could not be sent to the file, one JSON per line.
+    """
+    lock = threading.Lock()
+
+    def on_error(error: Exception, messages: List[Dict[str, Any]]) -> None:
+        logger.error(
+            "Could not send %d messages to QStash, writing them to %s: %s",
+            len(messages),
+            path,
+            error,
+        )
+        with lock, open(path, "a") as f:
+            for message in messages:
+                f.write(json.dumps(message) + "\n")
+
+    return on_error
+
+
+class SidecarPublisher:
+    """
+    Hands the messages over to the sidecar publisher process listening
+    on a Unix socket, without waiting for them to be sent to QStash.
+
+    It is safe to use from multiple threads, and from processes forked
+    after it is created, such as pre-forking web server workers.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Path of the Unix socket the sidecar listens on.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._socket: Optional[socket.socket] = None
+        self._pid = os.getpid()
+
+    def publish(self, message: BatchRequest) -> None:
+        """
+        Hands over the message to be published, or enqueued if it has
+        a `queue`.
+        """
+        self.batch([message])
+
+    def publish_json(self, message: BatchJsonRequest) -> None:
+        """
+        Hands over the message to be published, or enqueued if it has
+        a `queue`, after serializing its body as JSON string.
+        """
+        self.batch_json([message])
+
+    def enqueue(self, queue: str, message: BatchRequest) -> None:
+        """Hands over the message to be enqueued on the queue."""
+        self.batch([{**message, "queue": queue}])
+
+    def enqueue_json(self, queue: str, message: BatchJsonRequest) -> None:
+        """
+        Hands over the message to be enqueued on the queue, after
+        serializing its body as JSON string.
+        """
+        self.batch_json([{**message, "queue": queue}])
+
+    def batch(self, messages: List[BatchRequest]) -> None:
+        """Hands over the messages to be published or enqueued."""
+        frames = encode_frames(messages)
+
+        with self._lock:
+            try:
+                self._connection().sendall(frames)
+            except OSError:
+                # The sidecar might have been restarted, try once more
+                # on a new connection.
+                self._disconnect()
+                try:
+                    self._connection().sendall(frames)
+                except OSError as e:
+                    self._disconnect()
+                    raise QStashError(
+                        f"Could not hand over the messages to the sidecar at {self._path}: {e}"
+                    ) from e
+
+    def batch_json(self, messages: List[BatchJsonRequest]) -> None:
+        """
+        Hands over the messages to be published or enqueued, after
+        serializing their bodies as JSON strings.
+        """
+        self.batch(convert_to_batch_messages(messages))
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+    def _connection(self) -> socket.socket:
+        if self._pid != os.getpid():
+            # The socket is shared with the parent process after a fork.
+            self._socket = None
+            self._pid = os.getpid()
+
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self._path)
+            self._socket = sock
+
+        return self._socket
+
+    def _disconnect(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class SidecarServer:
+    """
+    Publisher process of the sidecar mode.
+
+    It accepts the messages handed over by `SidecarPublisher`s on a Unix
+    socket, and sends them to QStash in batches of at most `batch_size`
+    messages. A batch is sent when it is full, or `linger` seconds after
+    its first message is received.
+
+    When QStash rejects a batch for its content, such as an invalid
+    destination or a malformed message, the batch is split in halves
+    which are sent on their own, so that only the rejected messages fail.
+    """
+
+    def __init__(
+        self,
+        client: QStash,
+        path: str,
+        *,
+        batch_size: int = DEFAULT_SIDECAR_BATCH_SIZE,
+        linger: float = DEFAULT_SIDECAR_LINGER,
+        on_error: Optional[Callable[[Exception, List[Dict[str, Any]]], None]] = None,
+    ) -> None:
+        """
+        :param client: Client used to send the messages.
+        :param path: Path of the Unix socket to listen on.
+        :param batch_size: Maximum number of messages sent in a single batch.
+        :param linger: Maximum number of seconds to wait for more messages
+            before sending a batch.
+        :param on_error: Called with the error and the messages that could
+            not be sent, after the retries of the client. Messages that are
+            not valid JSON are given as their text under the `frame` key.
+            By default, the error and the messages are logged.
+        """
+        self._client = client
+        self._path = path
+        self._batch_size = batch_size
+        self._linger = linger
+        self._on_error = on_error or log_dropped_messages
+
+        self._messages: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._listener: Optional[socket.socket] = None
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self.sent_count = 0
+        """Number of messages sent to QStash."""
+
+        self.failed_count = 0
+        """Number of messages that could not be sent to QStash."""
+
+        self.request_count = 0
+        """Number of batch requests sent to QStash."""
+
+    def start(self) -> None:
+        """Starts accepting and sending the messages in the background."""
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self._path)
+        listener.listen()
+        # Wake up periodically to notice when the server is closed.
+        listener.settimeout(0.1)
+        self._listener = listener
+
+        self._stopped.clear()
+        for target in (self._accept, self._send):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def serve_forever(self) -> None:
+        """Starts the server, and blocks until it is closed."""
+        self.start()
+        self._stopped.wait()
+
+    def close(self) -> None:
+        """
+        Stops accepting messages, and sends the messages that are
+        already received.
+        """
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+        self._messages.put(None)
+        for thread in self._threads:
+            thread.join()
+
+        self._threads = []
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+    def __enter__(self) -> "SidecarServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _accept(self) -> None:
+        listener = self._listener
+        while listener is not None and not self._stopped.is_set():
+            try:
+                connection, _ = listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+
+            connection.settimeout(None)
+            threading.Thread(
+                target=self._receive,
+                args=(connection,),
+                daemon=True,
+            ).start()
+
+    def _receive(self, connection: socket.socket) -> None:
+        buffer = bytearray()
+        with connection:
+            while True:
+                try:
+                    data = connection.recv(64 * 1024)
+                except OSError:
+                    return
+
+                if not data:
+                    return
+
+                buffer += data
+                offset = 0
+                while len(buffer) - offset >= FRAME_HEADER.size:
+                    (size,) = FRAME_HEADER.unpack_from(buffer, offset)
+                    end = offset + FRAME_HEADER.size + size
+                    if len(buffer) < end:
+                        break
+
+                    self._messages.put(bytes(buffer[offset + FRAME_HEADER.size : end]))
+                    offset = end
+
+                del buffer[:offset]
+
+    def _send(self) -> None:
+        closing = False
+        while not closing:
+            first = self._messages.get()
+            if first is None:
+                closing = True
+                batch = []
+            else:
+                batch = [first]
+
+            deadline = time.monotonic() + self._linger
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    if closing or timeout <= 0:
+                        message = self._messages.get_nowait()
+                    else:
+                        message = self._messages.get(timeout=timeout)
+                except queue.Empty:
+                    if closing or timeout <= 0:
+                        break
+                    continue
+
+                if message is None:
+                    closing = True
+                    continue
+
+                batch.append(message)
+
+            if batch:
+                self._send_batch(batch)
+
+    def _send_batch(self, batch: List[bytes]) -> None:
+        unsent = set(range(len(batch)))
+
+        def encode(indices: List[int]) -> bytes:
+            self.request_count += 1
+            return b"[" + b",".join(batch[i] for i in indices) + b"]"
+
+        def on_sent(indices: List[int]) -> None:
+            unsent.difference_update(indices)
+            self.sent_count += len(indices)
+
+        def on_rejected(index: int, error: Exception) -> None:
+            unsent.discard(index)
+            self._fail(error, [batch[index]])
+
+        try:
+            send_batch_isolating_rejected(
+                self._client.http,
+                list(range(len(batch))),
+                encode,
+                on_sent,
+                on_rejected,
+            )
+        except Exception as e:
+            self._fail(e, [batch[i] for i in sorted(unsent)])
+
+    def _fail(self, error: Exception, frames: List[bytes]) -> None:
+        self.failed_count += len(frames)
+        self._on_error(error, [decode_frame(frame) for frame in frames])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Sends the messages handed over by SidecarPublishers to QStash."
+    )
+    parser.add_argument("path", help="Path of the Unix socket to listen on.")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_SIDECAR_BATCH_SIZE,
+        help="Maximum number of messages sent in a single batch.",
+    )
+    parser.add_argument(
+        "--linger",
+        type=float,
+        default=DEFAULT_SIDECAR_LINGER,
+        help="Maximum number of seconds to wait for more messages.",
+    )
+    parser.add_argument(
+        "--dead-letter",
+        help="Path of a file to append the messages that could not be sent to, "
+        "one JSON per line. By default, they are logged.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    client = QStash(environ["QSTASH_TOKEN"])
+    server = SidecarServer(
+        client,
+        args.path,
+        batch_size=args.batch_size,
+        linger=args.linger,
+        on_error=dead_letter_writer(args.dead_letter)
+        if args.dead_letter
+        else log_dropped_messages,
+    )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ from qstash.http import HttpClient
 
 @dataclasses.dataclass
 class SigningKey:
+    __slots__ = ("current", "next")
+
     current: str
     """Current signing key."""
 
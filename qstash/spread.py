@@ -0,0 +1,84 @@
+import math
+import re
+from typing import Callable, List, Optional, Union
+
+from qstash.errors import QStashError
+
+SpreadProfile = Callable[[float], float]
+"""
+Shape of the arrival rate of a spread burst.
+
+Maps the position of a message in the burst to its position in the
+window, both between `0` and `1`. It should be non-decreasing.
+"""
+
+
+def uniform(position: float) -> float:
+    """Delivers the messages at a constant rate over the window."""
+    return position
+
+
+def ramp_up(position: float) -> float:
+    """
+    Delivers the messages at a rate increasing linearly from zero, such
+    as to give the consumers time to scale up.
+    """
+    return math.sqrt(position)
+
+
+def ramp_down(position: float) -> float:
+    """Delivers the messages at a rate decreasing linearly to zero."""
+    return 1 - math.sqrt(1 - position)
+
+
+_DELAY_PATTERN = re.compile(r"(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?")
+
+
+def delay_seconds(delay: Union[str, int]) -> int:
+    """
+    Returns the delay in seconds, from an integer number of seconds
+    or a duration string, such as `50s`, `3m`, or `1h30m`.
+    """
+    if isinstance(delay, int):
+        return delay
+
+    match = _DELAY_PATTERN.fullmatch(delay)
+    if not delay or match is None:
+        raise QStashError(f"Can not spread over the delay {delay!r}.")
+
+    days, hours, minutes, seconds = (int(g or 0) for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def check_spread_window(window: int) -> None:
+    if window < 0:
+        raise QStashError("'spread_over' must not be negative.")
+
+
+def spread_delay(
+    index: int,
+    count: int,
+    window: int,
+    profile: Optional[SpreadProfile] = None,
+) -> int:
+    """
+    Returns the delay, in seconds, of the message at the index of
+    a burst of `count` messages spread over `window` seconds.
+    """
+    position = (profile or uniform)(index / count)
+    return min(int(position * window), window)
+
+
+def spread_delays(
+    count: int,
+    window: int,
+    profile: Optional[SpreadProfile] = None,
+) -> List[int]:
+    """
+    Returns the delays, in seconds, to spread a burst of `count` messages
+    over `window` seconds, along the profile. Uniform by default.
+
+    The result can be given as the `delays` column of `batch_columns`.
+    """
+    check_spread_window(window)
+    return [spread_delay(i, count, window, profile) for i in range(count)]
@@ -24,6 +24,8 @@ class RemoveEndpointRequest(TypedDict, total=False):
 
 @dataclasses.dataclass
 class Endpoint:
+    __slots__ = ("url", "name")
+
     url: str
     """Url of the endpoint"""
 
@@ -33,6 +35,8 @@ class Endpoint:
 
 @dataclasses.dataclass
 class UrlGroup:
+    __slots__ = ("name", "created_at", "updated_at", "endpoints")
+
     name: str
     """Name of the url group."""
 
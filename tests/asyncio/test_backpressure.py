@@ -0,0 +1,42 @@
+from typing import Callable
+
+import pytest
+
+from qstash import AsyncQStash
+from qstash.asyncio.backpressure import AsyncBackpressureEnqueuer
+from qstash.errors import QStashError
+from qstash.message import BatchRequest, BatchResponse
+
+
+@pytest.mark.asyncio
+async def test_backpressure_enqueue_async(
+    async_client: AsyncQStash,
+    cleanup_queue_async: Callable[[AsyncQStash, str], None],
+) -> None:
+    name = "test_queue"
+    cleanup_queue_async(async_client, name)
+    await async_client.queue.upsert(name, paused=True)
+
+    async with AsyncBackpressureEnqueuer(
+        async_client,
+        name,
+        high_watermark=2,
+        low_watermark=0,
+        timeout=1,
+    ) as enqueuer:
+        res = await enqueuer.batch(
+            [
+                BatchRequest(url="https://mock.httpstatus.io/200", body="0"),
+                BatchRequest(url="https://mock.httpstatus.io/200", body="1"),
+            ]
+        )
+
+        assert len(res) == 2
+        assert all(isinstance(r, BatchResponse) for r in res)
+        assert enqueuer.paused
+
+        # The paused queue does not drain, so the producer times out
+        with pytest.raises(QStashError):
+            await enqueuer.enqueue(
+                BatchRequest(url="https://mock.httpstatus.io/200", body="2")
+            )
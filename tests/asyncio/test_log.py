@@ -0,0 +1,25 @@
+import pytest
+
+from qstash import AsyncQStash
+from qstash.log import LogState
+from qstash.message import PublishResponse
+
+
+@pytest.mark.asyncio
+async def test_latest_states_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+    )
+
+    assert isinstance(res, PublishResponse)
+
+    await async_client.message.wait_for([res.message_id], timeout=30)
+
+    states = await async_client.log.latest_states(
+        [res.message_id, "msg_missing"], concurrency=2
+    )
+
+    assert len(states) == 1
+    assert states[res.message_id] == LogState.DELIVERED
+    assert states.missing() == ["msg_missing"]
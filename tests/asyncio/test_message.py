@@ -1,10 +1,16 @@
-from typing import Callable
+import io
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, Tuple
 
 import pytest
 
 from qstash import AsyncQStash
+from qstash.asyncio.http import AsyncRequestBody
+from qstash.cache import LruCache
 from qstash.chat import openai
-from qstash.errors import QStashError
+from qstash.errors import BatchChunkError, QStashError
 from qstash.log import LogState
 from qstash.message import (
     BatchJsonRequest,
@@ -13,8 +19,11 @@ from qstash.message import (
     EnqueueResponse,
     PublishResponse,
     FlowControl,
+    Message,
+    RawJson,
 )
-from tests import assert_eventually_async, OPENAI_API_KEY
+from qstash.spread import ramp_up
+from tests import assert_eventually_async, OPENAI_API_KEY, QSTASH_TOKEN
 
 
 async def assert_delivered_eventually_async(
@@ -74,6 +83,78 @@ async def test_publish_to_url_json_async(async_client: AsyncQStash) -> None:
     await assert_delivered_eventually_async(async_client, res.message_id)
 
 
+@pytest.mark.asyncio
+async def test_publish_raw_json_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.publish_json(
+        body=RawJson('{"ex_key": "ex_value"}'),
+        url="https://mock.httpstatus.io/200",
+        delay=60,
+    )
+
+    assert isinstance(res, PublishResponse)
+
+    message = await async_client.message.get(res.message_id)
+    assert message.body == '{"ex_key": "ex_value"}'
+
+    await async_client.message.cancel(res.message_id)
+
+
+@pytest.mark.asyncio
+async def test_publish_with_template_async(async_client: AsyncQStash) -> None:
+    template = async_client.message.template(
+        url="https://mock.httpstatus.io/200",
+        method="GET",
+        retries=0,
+        headers={
+            "test-header": "test-value",
+        },
+    )
+
+    res = await template.publish("test-body")
+    assert isinstance(res, PublishResponse)
+    assert len(res.message_id) > 0
+
+    res_json = await template.publish_json({"ex_key": "ex_value"}, delay=60)
+    assert isinstance(res_json, PublishResponse)
+
+    message = await async_client.message.get(res_json.message_id)
+    assert message.body == '{"ex_key": "ex_value"}'
+
+    await async_client.message.cancel(res_json.message_id)
+
+    await assert_delivered_eventually_async(async_client, res.message_id)
+
+
+@pytest.mark.asyncio
+async def test_publish_streamed_bodies_async(async_client: AsyncQStash) -> None:
+    async def chunks() -> AsyncIterator[bytes]:
+        yield b"test-"
+        yield b"iterator-"
+        yield b"body"
+
+    bodies: List[AsyncRequestBody] = [
+        memoryview(b"test-memoryview-body"),
+        io.BytesIO(b"test-file-body"),
+        chunks(),
+    ]
+
+    expected = ["test-memoryview-body", "test-file-body", "test-iterator-body"]
+
+    for body, expected_body in zip(bodies, expected):
+        res = await async_client.message.publish(
+            body=body,
+            url="https://mock.httpstatus.io/200",
+            delay=60,
+        )
+
+        assert isinstance(res, PublishResponse)
+
+        message = await async_client.message.get(res.message_id)
+        assert message.body == expected_body
+
+        await async_client.message.cancel(res.message_id)
+
+
 @pytest.mark.asyncio
 async def test_disallow_multiple_destinations_async(async_client: AsyncQStash) -> None:
     with pytest.raises(QStashError):
@@ -150,6 +231,427 @@ async def test_batch_json_async(async_client: AsyncQStash) -> None:
         assert len(r.message_id) > 0
 
 
+@pytest.mark.asyncio
+async def test_batch_json_raw_json_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.batch_json(
+        [
+            BatchJsonRequest(
+                body=RawJson('{"hi": 0}'),
+                url="https://mock.httpstatus.io/200",
+                delay=60,
+            ),
+            BatchJsonRequest(
+                body=b'{"hi": 1}',
+                url="https://mock.httpstatus.io/200",
+                delay=60,
+            ),
+        ]
+    )
+
+    assert len(res) == 2
+
+    for i, r in enumerate(res):
+        assert isinstance(r, BatchResponse)
+
+        message = await async_client.message.get(r.message_id)
+        assert message.body == f'{{"hi": {i}}}'
+
+        await async_client.message.cancel(r.message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_with_defaults_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.batch_json(
+        [
+            BatchJsonRequest(body={"hi": 0}),
+            BatchJsonRequest(body={"hi": 1}, label="batch-defaults-override"),
+        ],
+        defaults=BatchJsonRequest(
+            url="https://mock.httpstatus.io/200",
+            retries=0,
+            delay=60,
+            label="batch-defaults",
+        ),
+    )
+
+    assert len(res) == 2
+
+    labels = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+
+        message = await async_client.message.get(r.message_id)
+        assert message.url == "https://mock.httpstatus.io/200"
+        assert message.max_retries == 0
+        labels.append(message.label)
+
+        await async_client.message.cancel(r.message_id)
+
+    assert labels == ["batch-defaults", "batch-defaults-override"]
+
+
+@pytest.mark.asyncio
+async def test_batch_auto_deduplication_id_async(async_client: AsyncQStash) -> None:
+    messages = [
+        BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+        BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+    ]
+
+    res = await async_client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=True,
+    )
+    replayed = await async_client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=True,
+    )
+
+    assert len(res) == len(replayed) == 2
+
+    for r, replay in zip(res, replayed):
+        assert isinstance(r, BatchResponse)
+        assert isinstance(replay, BatchResponse)
+
+        assert not r.deduplicated
+        assert replay.deduplicated
+
+        await async_client.message.cancel(r.message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_auto_deduplication_key_async(async_client: AsyncQStash) -> None:
+    messages = [
+        BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+    ]
+    key = uuid.uuid4().hex
+
+    res = await async_client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=key,
+    )
+    replayed = await async_client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=key,
+    )
+    other = await async_client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=uuid.uuid4().hex,
+    )
+
+    assert isinstance(res[0], BatchResponse)
+    assert isinstance(replayed[0], BatchResponse)
+    assert isinstance(other[0], BatchResponse)
+
+    # Only the batch sent again with the same key is deduplicated
+    assert not res[0].deduplicated
+    assert replayed[0].deduplicated
+    assert not other[0].deduplicated
+
+    await async_client.message.cancel(res[0].message_id)
+    await async_client.message.cancel(other[0].message_id)
+
+
+@pytest.mark.asyncio
+async def test_publish_hedged_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+        delay=60,
+        hedge_after=0.001,
+    )
+
+    assert isinstance(res, PublishResponse)
+    assert not res.deduplicated
+
+    message = await async_client.message.get(res.message_id)
+    assert message.body == '{"ex_key": "ex_value"}'
+
+    await async_client.message.cancel(res.message_id)
+
+
+@pytest.mark.asyncio
+async def test_publish_with_cache_async() -> None:
+    client = AsyncQStash(token=QSTASH_TOKEN, publish_cache=LruCache(ttl=60))
+
+    res = await client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+        delay=60,
+    )
+    cached = await client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+        delay=60,
+    )
+
+    # Cached responses are returned as copies
+    assert cached == res
+    assert cached is not res
+
+    with pytest.raises(QStashError):
+        AsyncQStash(token=QSTASH_TOKEN, publish_cache=LruCache())
+
+    batch_res = await client.message.batch_json(
+        [
+            BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+            BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+        ],
+        defaults=BatchJsonRequest(delay=60),
+    )
+
+    assert len(batch_res) == 2
+    assert isinstance(batch_res[0], BatchResponse)
+    assert isinstance(batch_res[1], BatchResponse)
+    assert batch_res[0].message_id == batch_res[1].message_id
+
+    assert isinstance(res, PublishResponse)
+    await client.message.cancel(res.message_id)
+    await client.message.cancel(batch_res[0].message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_with_executor_async(async_client: AsyncQStash) -> None:
+    N = 3
+    with ThreadPoolExecutor(2) as executor:
+        res = await async_client.message.batch_json(
+            [BatchJsonRequest(body={"hi": i}) for i in range(N)],
+            defaults=BatchJsonRequest(url="https://mock.httpstatus.io/200", delay=60),
+            executor=executor,
+        )
+
+    assert len(res) == N
+
+    for i, r in enumerate(res):
+        assert isinstance(r, BatchResponse)
+
+        message = await async_client.message.get(r.message_id)
+        assert message.body == f'{{"hi": {i}}}'
+
+        await async_client.message.cancel(r.message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_with_bulk_concurrency_async() -> None:
+    async_client = AsyncQStash(token=QSTASH_TOKEN, bulk_concurrency=1)
+
+    res = await async_client.message.batch_json(
+        [
+            BatchJsonRequest(
+                url="https://mock.httpstatus.io/200", body={"hi": i}, delay=60
+            )
+            for i in range(2)
+        ]
+    )
+
+    assert len(res) == 2
+
+    # Interactive requests do not wait for the bulk lane
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        await async_client.message.cancel(r.message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_spread_async(async_client: AsyncQStash) -> None:
+    N = 3
+    res = await async_client.message.batch_json(
+        [BatchJsonRequest(body={"hi": i}) for i in range(N)],
+        defaults=BatchJsonRequest(url="https://mock.httpstatus.io/200", delay=60),
+        spread_over=120,
+        spread_profile=ramp_up,
+    )
+
+    assert len(res) == N
+
+    not_befores = []
+    created_ats = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+
+        message = await async_client.message.get(r.message_id)
+        not_befores.append(message.not_before)
+        created_ats.append(message.created_at)
+
+        await async_client.message.cancel(r.message_id)
+
+    # The messages are spread over the window, after the default delay
+    assert not_befores == sorted(not_befores)
+    assert not_befores[-1] - not_befores[0] >= 60_000
+    assert all(n - c >= 59_000 for n, c in zip(not_befores, created_ats))
+
+
+@pytest.mark.asyncio
+async def test_batch_json_columns_spread_with_not_before_async(
+    async_client: AsyncQStash,
+) -> None:
+    not_before = int(time.time()) + 3600
+    res = await async_client.message.batch_json_columns(
+        bodies=[{"hi": i} for i in range(3)],
+        spread_over=120,
+        defaults=BatchJsonRequest(
+            url="https://mock.httpstatus.io/200", not_before=not_before
+        ),
+    )
+
+    not_befores = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+
+        message = await async_client.message.get(r.message_id)
+        not_befores.append(message.not_before)
+
+        await async_client.message.cancel(r.message_id)
+
+    # The offsets are added to the default not before
+    assert not_befores[0] == not_before * 1000
+    assert not_befores[-1] - not_befores[0] >= 60_000
+
+
+@pytest.mark.asyncio
+async def test_wait_for_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.batch_json(
+        [
+            BatchJsonRequest(
+                url="https://mock.httpstatus.io/200", body={"ex_key": "ex_value"}
+            ),
+            BatchJsonRequest(
+                url="https://mock.httpstatus.io/500",
+                body={"ex_key": "ex_value"},
+                retries=0,
+            ),
+        ]
+    )
+
+    ids = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        ids.append(r.message_id)
+
+    logs = await async_client.message.wait_for(ids, timeout=30, poll_interval=1)
+
+    assert logs[ids[0]].state == LogState.DELIVERED
+    assert logs[ids[1]].state == LogState.FAILED
+
+
+@pytest.mark.asyncio
+async def test_publish_many_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.publish_many(
+        [
+            BatchRequest(url="https://mock.httpstatus.io/200", body="0", delay=60),
+            BatchRequest(url="invalid-url", body="1"),
+            BatchRequest(url="https://mock.httpstatus.io/200", body="2", delay=60),
+        ],
+        concurrency=2,
+    )
+
+    assert len(res) == 3
+    assert isinstance(res[1], QStashError)
+
+    for i in (0, 2):
+        r = res[i]
+        assert isinstance(r, PublishResponse)
+
+        message = await async_client.message.get(r.message_id)
+        assert message.body == str(i)
+
+        await async_client.message.cancel(r.message_id)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_many_async(
+    async_client: AsyncQStash,
+    cleanup_queue_async: Callable[[AsyncQStash, str], None],
+) -> None:
+    name = "test_queue"
+    cleanup_queue_async(async_client, name)
+
+    res = await async_client.message.enqueue_many(
+        [
+            BatchRequest(url="https://mock.httpstatus.io/200", body="0"),
+            # Delays are not used for the enqueued messages, like in enqueue
+            BatchRequest(url="https://mock.httpstatus.io/200", body="1", delay=600),
+        ],
+        queue=name,
+    )
+
+    assert len(res) == 2
+
+    for r in res:
+        assert isinstance(r, EnqueueResponse)
+        await assert_delivered_eventually_async(async_client, r.message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_json_columns_async(async_client: AsyncQStash) -> None:
+    N = 3
+    res = await async_client.message.batch_json_columns(
+        bodies=[{"hi": i} for i in range(N)],
+        deduplication_ids=[f"batch-columns-async-{i}" for i in range(N)],
+        delays=[None, 90, "2m"],
+        defaults=BatchJsonRequest(
+            url="https://mock.httpstatus.io/200",
+            retries=0,
+            delay=60,
+        ),
+        chunk_size=2,
+    )
+
+    assert len(res) == N
+
+    for i, message_id in enumerate(res.message_ids):
+        message = await async_client.message.get(message_id)
+        assert message.body == f'{{"hi": {i}}}'
+        assert message.max_retries == 0
+
+        await async_client.message.cancel(message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_columns_partial_failure_async(async_client: AsyncQStash) -> None:
+    with pytest.raises(BatchChunkError) as exc_info:
+        await async_client.message.batch_columns(
+            urls=["https://mock.httpstatus.io/200"] * 2 + ["invalid-url"],
+            bodies=[f"hi-{i}" for i in range(3)],
+            defaults=BatchRequest(delay=60),
+            chunk_size=2,
+        )
+
+    # The messages of the chunks accepted before the failure are kept
+    result = exc_info.value.result
+    assert len(result) == 2
+
+    for message_id in result.message_ids:
+        await async_client.message.cancel(message_id)
+
+
+@pytest.mark.asyncio
+async def test_batch_compact_async(async_client: AsyncQStash) -> None:
+    N = 3
+    res = await async_client.message.batch(
+        [BatchRequest(body=f"hi-{i}") for i in range(N)],
+        defaults=BatchRequest(
+            url="https://mock.httpstatus.io/200",
+            delay=60,
+        ),
+        compact=True,
+    )
+
+    assert len(res) == N
+    assert res.message_count == N
+
+    for i, r in enumerate(res):
+        assert isinstance(r, BatchResponse)
+        assert r.message_id == res.message_id(i)
+        assert not res.is_deduplicated(i)
+
+        await async_client.message.cancel(r.message_id)
+
+
 @pytest.mark.asyncio
 async def test_publish_to_api_llm_async(async_client: AsyncQStash) -> None:
     res = await async_client.message.publish_json(
@@ -338,6 +840,107 @@ async def test_cancel_many_async(async_client: AsyncQStash) -> None:
     assert cancelled == 2
 
 
+@pytest.mark.asyncio
+async def test_cancel_many_in_chunks_async(async_client: AsyncQStash) -> None:
+    res = await async_client.message.batch(
+        [BatchRequest(url="https://mock.httpstatus.io/200", delay=60) for _ in range(3)]
+    )
+
+    message_ids = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        message_ids.append(r.message_id)
+
+    progress: List[Tuple[int, int, int]] = []
+    cancelled = await async_client.message.cancel_many(
+        message_ids,
+        chunk_size=2,
+        concurrency=2,
+        on_progress=lambda processed, total, cancelled: progress.append(
+            (processed, total, cancelled)
+        ),
+    )
+
+    assert cancelled == 3
+    assert len(progress) == 2
+    assert progress[-1] == (3, 3, 3)
+
+
+@pytest.mark.asyncio
+async def test_get_many_with_cache_async() -> None:
+    client = AsyncQStash(token=QSTASH_TOKEN, message_cache=LruCache(ttl=60))
+
+    res = await client.message.batch(
+        [BatchRequest(url="https://mock.httpstatus.io/200", delay=60) for _ in range(2)]
+    )
+
+    message_ids = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        message_ids.append(r.message_id)
+
+    messages = await client.message.get_many(
+        [*message_ids, "invalid-id", message_ids[0]],
+        concurrency=2,
+    )
+
+    assert len(messages) == 4
+    for message_id, message in zip(message_ids, messages):
+        assert isinstance(message, Message)
+        assert message.message_id == message_id
+
+    assert isinstance(messages[2], QStashError)
+    assert messages[3] is messages[0]
+
+    # Cached messages are returned as copies
+    cached = await client.message.get(message_ids[1])
+    assert cached == messages[1]
+    assert cached is not messages[1]
+
+    assert await client.message.cancel_many(message_ids) == 2
+    with pytest.raises(QStashError):
+        await client.message.get(message_ids[0])
+
+    with pytest.raises(QStashError):
+        AsyncQStash(token=QSTASH_TOKEN, message_cache=LruCache())
+
+
+@pytest.mark.asyncio
+async def test_cancel_where_async(async_client: AsyncQStash) -> None:
+    label = "test_cancel_where_async"
+    await async_client.message.batch(
+        [
+            BatchRequest(url="https://mock.httpstatus.io/200", delay=60, label=label)
+            for _ in range(3)
+        ]
+        + [BatchRequest(url="https://mock.httpstatus.io/200", label=label)]
+    )
+
+    async def assertion() -> None:
+        assert (
+            await async_client.message.cancel_where({"label": label}, dry_run=True) == 3
+        )
+
+    await assert_eventually_async(
+        assertion,
+        initial_delay=1,
+        retry_delay=1,
+        timeout=30.0,
+    )
+
+    cancelled = await async_client.message.cancel_where({"label": label}, chunk_size=2)
+
+    assert cancelled == 3
+
+    with pytest.raises(QStashError):
+        await async_client.message.cancel_where({"label": label}, chunk_size=0)
+
+    with pytest.raises(QStashError):
+        await async_client.message.cancel_where(
+            {"label": label, "state": LogState.CREATED}
+        )
+
+
 @pytest.mark.asyncio
 async def test_cancel_all_async(async_client: AsyncQStash) -> None:
     res0 = await async_client.message.publish(
@@ -0,0 +1,47 @@
+from typing import Callable
+
+import pytest
+
+from qstash import AsyncQStash
+from qstash.asyncio.sharding import AsyncShardedQStash
+from qstash.message import EnqueueResponse, PublishResponse
+from tests import QSTASH_TOKEN
+
+
+@pytest.mark.asyncio
+async def test_sharded_publish_async() -> None:
+    clients = [AsyncQStash(token=QSTASH_TOKEN), AsyncQStash(token=QSTASH_TOKEN)]
+    sharded = AsyncShardedQStash(clients, weights=[1, 2])
+
+    for i in range(3):
+        res = await sharded.publish(
+            url="https://mock.httpstatus.io/200", body=str(i), delay=60
+        )
+
+        assert isinstance(res, PublishResponse)
+        await clients[0].message.cancel(res.message_id)
+
+    assert [stats.message_count for stats in sharded.stats] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_sharded_enqueue_async(
+    cleanup_queue_async: Callable[[AsyncQStash, str], None],
+) -> None:
+    clients = [AsyncQStash(token=QSTASH_TOKEN), AsyncQStash(token=QSTASH_TOKEN)]
+    sharded = AsyncShardedQStash(clients)
+
+    name = "test_sharded_queue_async"
+    cleanup_queue_async(clients[0], name)
+
+    for i in range(4):
+        res = await sharded.enqueue_json(
+            queue=name,
+            url="https://mock.httpstatus.io/200",
+            body={"hi": i},
+        )
+
+        assert isinstance(res, EnqueueResponse)
+
+    # Messages of a queue are not split across the shards
+    assert sorted(stats.message_count for stats in sharded.stats) == [0, 4]
@@ -0,0 +1,58 @@
+from typing import Callable
+
+import pytest
+
+from qstash import QStash
+from qstash.backpressure import BackpressureEnqueuer, BackpressureState
+from qstash.errors import QStashError
+from qstash.message import BatchRequest, BatchResponse
+
+
+def test_backpressure_enqueue(
+    client: QStash,
+    cleanup_queue: Callable[[QStash, str], None],
+) -> None:
+    name = "test_queue"
+    cleanup_queue(client, name)
+    client.queue.upsert(name, paused=True)
+
+    with BackpressureEnqueuer(
+        client,
+        name,
+        high_watermark=2,
+        low_watermark=0,
+        timeout=1,
+    ) as enqueuer:
+        res = enqueuer.batch(
+            [
+                BatchRequest(url="https://mock.httpstatus.io/200", body="0"),
+                BatchRequest(url="https://mock.httpstatus.io/200", body="1"),
+            ]
+        )
+
+        assert len(res) == 2
+        assert all(isinstance(r, BatchResponse) for r in res)
+        assert enqueuer.paused
+
+        # The paused queue does not drain, so the producer times out
+        with pytest.raises(QStashError):
+            enqueuer.enqueue(
+                BatchRequest(url="https://mock.httpstatus.io/200", body="2")
+            )
+
+
+def test_backpressure_state() -> None:
+    state = BackpressureState(high_watermark=10, low_watermark=5)
+
+    state.update(8)
+    assert not state.paused
+
+    state.add(2)
+    assert state.paused
+
+    # Stays paused until the low watermark
+    state.update(6)
+    assert state.paused
+
+    state.update(5)
+    assert not state.paused
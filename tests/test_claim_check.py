@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import pytest
+
+from qstash import QStash, Receiver
+from qstash.claim_check import ClaimCheck, FileSystemBlobStore
+from qstash.errors import ClaimCheckError, QStashError
+from qstash.message import PublishResponse
+from tests import QSTASH_CURRENT_SIGNING_KEY, QSTASH_NEXT_SIGNING_KEY, QSTASH_TOKEN
+
+
+def test_publish_with_claim_check(tmp_path: Path) -> None:
+    store = FileSystemBlobStore(str(tmp_path))
+    client = QStash(token=QSTASH_TOKEN, claim_check=ClaimCheck(store, threshold=16))
+
+    res = client.message.publish(
+        url="https://mock.httpstatus.io/200",
+        body="a" * 1024,
+        content_type="text/plain",
+        delay=60,
+    )
+
+    assert isinstance(res, PublishResponse)
+
+    message = client.message.get(res.message_id)
+    assert message.body is not None
+    assert len(message.body) < 1024
+
+    receiver = Receiver(
+        current_signing_key=QSTASH_CURRENT_SIGNING_KEY,
+        next_signing_key=QSTASH_NEXT_SIGNING_KEY,
+    )
+    resolved = receiver.resolve_body(body=message.body, store=store)
+    assert resolved.reference is not None
+    assert resolved.content_type == "text/plain"
+    assert resolved.text() == "a" * 1024
+
+    client.message.cancel(res.message_id)
+
+    # Invalid requests do not leave blobs behind
+    blobs = set(tmp_path.iterdir())
+    with pytest.raises(QStashError):
+        client.message.publish(body="b" * 1024)
+
+    assert set(tmp_path.iterdir()) == blobs
+
+    template = client.message.template(url="https://mock.httpstatus.io/200", delay=60)
+    res = template.publish("c" * 1024)
+    assert isinstance(res, PublishResponse)
+
+    message = client.message.get(res.message_id)
+    assert message.body is not None
+    assert len(message.body) < 1024
+
+    client.message.cancel(res.message_id)
+
+
+def test_resolve_body(tmp_path: Path) -> None:
+    store = FileSystemBlobStore(str(tmp_path))
+    claim_check = ClaimCheck(store, threshold=16)
+    receiver = Receiver(
+        current_signing_key=QSTASH_CURRENT_SIGNING_KEY,
+        next_signing_key=QSTASH_NEXT_SIGNING_KEY,
+    )
+
+    assert claim_check.offload("small", "text/plain") is None
+
+    resolved = receiver.resolve_body(body="small", store=store)
+    assert resolved.reference is None
+    assert resolved.text() == "small"
+
+    reference = claim_check.offload(b"b" * 1024, None)
+    assert reference is not None
+
+    resolved = receiver.resolve_body(body=reference, store=store)
+    assert resolved.reference is not None
+    assert resolved.reference.size == 1024
+    assert resolved.read() == b"b" * 1024
+
+    # Blobs that do not match the reference are rejected
+    path = tmp_path / resolved.reference.key
+    path.write_bytes(b"c" * 1024)
+
+    resolved = receiver.resolve_body(body=reference, store=store)
+    with pytest.raises(ClaimCheckError):
+        resolved.read()
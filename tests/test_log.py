@@ -0,0 +1,20 @@
+from qstash import QStash
+from qstash.log import LogState
+from qstash.message import PublishResponse
+
+
+def test_latest_states(client: QStash) -> None:
+    res = client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+    )
+
+    assert isinstance(res, PublishResponse)
+
+    client.message.wait_for([res.message_id], timeout=30)
+
+    states = client.log.latest_states([res.message_id, "msg_missing"], concurrency=2)
+
+    assert len(states) == 1
+    assert states[res.message_id] == LogState.DELIVERED
+    assert states.missing() == ["msg_missing"]
@@ -1,10 +1,17 @@
-from typing import Callable
+import io
+import pickle
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
 
 import pytest
 
 from qstash import QStash
+from qstash.cache import LruCache
 from qstash.chat import openai
-from qstash.errors import QStashError
+from qstash.errors import BatchChunkError, QStashError
+from qstash.http import RequestBody
 from qstash.log import LogState
 from qstash.message import (
     BatchJsonRequest,
@@ -13,8 +20,12 @@ from qstash.message import (
     EnqueueResponse,
     PublishResponse,
     FlowControl,
+    Message,
+    RawJson,
+    prepare_batch_messages,
 )
-from tests import assert_eventually, OPENAI_API_KEY
+from qstash.spread import ramp_up
+from tests import assert_eventually, OPENAI_API_KEY, QSTASH_TOKEN
 
 
 def assert_delivered_eventually(client: QStash, msg_id: str) -> None:
@@ -84,6 +95,76 @@ def test_publish_to_url_json(client: QStash) -> None:
     assert_delivered_eventually(client, res.message_id)
 
 
+def test_publish_raw_json(client: QStash) -> None:
+    res = client.message.publish_json(
+        body=RawJson('{"ex_key": "ex_value"}'),
+        url="https://mock.httpstatus.io/200",
+        delay=60,
+    )
+
+    assert isinstance(res, PublishResponse)
+
+    message = client.message.get(res.message_id)
+    assert message.body == '{"ex_key": "ex_value"}'
+
+    client.message.cancel(res.message_id)
+
+
+def test_raw_json_pickle() -> None:
+    raw = RawJson('{"ex_key": "ex_value"}')
+
+    assert pickle.loads(pickle.dumps(raw)) == raw
+
+
+def test_publish_with_template(client: QStash) -> None:
+    template = client.message.template(
+        url="https://mock.httpstatus.io/200",
+        method="GET",
+        retries=0,
+        headers={
+            "test-header": "test-value",
+        },
+    )
+
+    res = template.publish("test-body")
+    assert isinstance(res, PublishResponse)
+    assert len(res.message_id) > 0
+
+    res_json = template.publish_json({"ex_key": "ex_value"}, delay=60)
+    assert isinstance(res_json, PublishResponse)
+
+    message = client.message.get(res_json.message_id)
+    assert message.body == '{"ex_key": "ex_value"}'
+
+    client.message.cancel(res_json.message_id)
+
+    assert_delivered_eventually(client, res.message_id)
+
+
+def test_publish_streamed_bodies(client: QStash) -> None:
+    bodies: List[RequestBody] = [
+        memoryview(b"test-memoryview-body"),
+        io.BytesIO(b"test-file-body"),
+        iter([b"test-", b"iterator-", b"body"]),
+    ]
+
+    expected = ["test-memoryview-body", "test-file-body", "test-iterator-body"]
+
+    for body, expected_body in zip(bodies, expected):
+        res = client.message.publish(
+            body=body,
+            url="https://mock.httpstatus.io/200",
+            delay=60,
+        )
+
+        assert isinstance(res, PublishResponse)
+
+        message = client.message.get(res.message_id)
+        assert message.body == expected_body
+
+        client.message.cancel(res.message_id)
+
+
 def test_disallow_multiple_destinations(client: QStash) -> None:
     with pytest.raises(QStashError):
         client.message.publish_json(
@@ -157,6 +238,428 @@ def test_batch_json(client: QStash) -> None:
         assert len(r.message_id) > 0
 
 
+def test_batch_json_raw_json(client: QStash) -> None:
+    res = client.message.batch_json(
+        [
+            BatchJsonRequest(
+                body=RawJson('{"hi": 0}'),
+                url="https://mock.httpstatus.io/200",
+                delay=60,
+            ),
+            BatchJsonRequest(
+                body=b'{"hi": 1}',
+                url="https://mock.httpstatus.io/200",
+                delay=60,
+            ),
+        ]
+    )
+
+    assert len(res) == 2
+
+    for i, r in enumerate(res):
+        assert isinstance(r, BatchResponse)
+
+        message = client.message.get(r.message_id)
+        assert message.body == f'{{"hi": {i}}}'
+
+        client.message.cancel(r.message_id)
+
+
+def test_batch_with_defaults(client: QStash) -> None:
+    res = client.message.batch_json(
+        [
+            BatchJsonRequest(body={"hi": 0}),
+            BatchJsonRequest(body={"hi": 1}, label="batch-defaults-override"),
+        ],
+        defaults=BatchJsonRequest(
+            url="https://mock.httpstatus.io/200",
+            retries=0,
+            delay=60,
+            label="batch-defaults",
+        ),
+    )
+
+    assert len(res) == 2
+
+    labels = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+
+        message = client.message.get(r.message_id)
+        assert message.url == "https://mock.httpstatus.io/200"
+        assert message.max_retries == 0
+        labels.append(message.label)
+
+        client.message.cancel(r.message_id)
+
+    assert labels == ["batch-defaults", "batch-defaults-override"]
+
+
+def test_batch_auto_deduplication_id(client: QStash) -> None:
+    messages = [
+        BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+        BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+    ]
+
+    res = client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=True,
+    )
+    replayed = client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=True,
+    )
+
+    assert len(res) == len(replayed) == 2
+
+    for r, replay in zip(res, replayed):
+        assert isinstance(r, BatchResponse)
+        assert isinstance(replay, BatchResponse)
+
+        assert not r.deduplicated
+        assert replay.deduplicated
+
+        client.message.cancel(r.message_id)
+
+
+def test_batch_auto_deduplication_key(client: QStash) -> None:
+    messages = [
+        BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+    ]
+    key = uuid.uuid4().hex
+
+    res = client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=key,
+    )
+    replayed = client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=key,
+    )
+    other = client.message.batch_json(
+        messages,
+        defaults=BatchJsonRequest(delay=60),
+        auto_deduplication_id=uuid.uuid4().hex,
+    )
+
+    assert isinstance(res[0], BatchResponse)
+    assert isinstance(replayed[0], BatchResponse)
+    assert isinstance(other[0], BatchResponse)
+
+    # Only the batch sent again with the same key is deduplicated
+    assert not res[0].deduplicated
+    assert replayed[0].deduplicated
+    assert not other[0].deduplicated
+
+    client.message.cancel(res[0].message_id)
+    client.message.cancel(other[0].message_id)
+
+
+def test_batch_auto_deduplication_options() -> None:
+    batch_messages = prepare_batch_messages(
+        [
+            BatchRequest(url="https://example.com", content_based_deduplication=False),
+            BatchRequest(url="https://example.com", content_based_deduplication=True),
+        ],
+        auto_deduplication_id=True,
+    )
+
+    # Only the messages with content based deduplication are left without an id
+    assert "Upstash-Deduplication-Id" in batch_messages[0]["headers"]
+    assert "Upstash-Deduplication-Id" not in batch_messages[1]["headers"]
+
+    with pytest.raises(QStashError):
+        prepare_batch_messages(
+            [BatchRequest(url="https://example.com")], auto_deduplication_id=""
+        )
+
+
+def test_publish_hedged(client: QStash) -> None:
+    res = client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+        delay=60,
+        hedge_after=0.001,
+    )
+
+    assert isinstance(res, PublishResponse)
+    assert not res.deduplicated
+
+    message = client.message.get(res.message_id)
+    assert message.body == '{"ex_key": "ex_value"}'
+
+    client.message.cancel(res.message_id)
+
+
+def test_publish_with_cache() -> None:
+    client = QStash(token=QSTASH_TOKEN, publish_cache=LruCache(ttl=60))
+
+    res = client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+        delay=60,
+    )
+    cached = client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+        delay=60,
+    )
+
+    # Cached responses are returned as copies
+    assert cached == res
+    assert cached is not res
+
+    with pytest.raises(QStashError):
+        QStash(token=QSTASH_TOKEN, publish_cache=LruCache())
+
+    batch_res = client.message.batch_json(
+        [
+            BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+            BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"hi": 0}),
+        ],
+        defaults=BatchJsonRequest(delay=60),
+    )
+
+    assert len(batch_res) == 2
+    assert isinstance(batch_res[0], BatchResponse)
+    assert isinstance(batch_res[1], BatchResponse)
+    assert batch_res[0].message_id == batch_res[1].message_id
+
+    assert isinstance(res, PublishResponse)
+    client.message.cancel(res.message_id)
+    client.message.cancel(batch_res[0].message_id)
+
+
+def test_batch_with_executor(client: QStash) -> None:
+    N = 3
+    with ThreadPoolExecutor(2) as executor:
+        res = client.message.batch_json(
+            [BatchJsonRequest(body={"hi": i}) for i in range(N)],
+            defaults=BatchJsonRequest(url="https://mock.httpstatus.io/200", delay=60),
+            executor=executor,
+        )
+
+    assert len(res) == N
+
+    for i, r in enumerate(res):
+        assert isinstance(r, BatchResponse)
+
+        message = client.message.get(r.message_id)
+        assert message.body == f'{{"hi": {i}}}'
+
+        client.message.cancel(r.message_id)
+
+
+def test_batch_with_bulk_concurrency() -> None:
+    client = QStash(token=QSTASH_TOKEN, bulk_concurrency=1)
+
+    res = client.message.batch_json(
+        [
+            BatchJsonRequest(
+                url="https://mock.httpstatus.io/200", body={"hi": i}, delay=60
+            )
+            for i in range(2)
+        ]
+    )
+
+    assert len(res) == 2
+
+    # Interactive requests do not wait for the bulk lane
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        client.message.cancel(r.message_id)
+
+
+def test_batch_spread(client: QStash) -> None:
+    N = 3
+    res = client.message.batch_json(
+        [BatchJsonRequest(body={"hi": i}) for i in range(N)],
+        defaults=BatchJsonRequest(url="https://mock.httpstatus.io/200", delay=60),
+        spread_over=120,
+        spread_profile=ramp_up,
+    )
+
+    assert len(res) == N
+
+    not_befores = []
+    created_ats = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+
+        message = client.message.get(r.message_id)
+        not_befores.append(message.not_before)
+        created_ats.append(message.created_at)
+
+        client.message.cancel(r.message_id)
+
+    # The messages are spread over the window, after the default delay
+    assert not_befores == sorted(not_befores)
+    assert not_befores[-1] - not_befores[0] >= 60_000
+    assert all(n - c >= 59_000 for n, c in zip(not_befores, created_ats))
+
+
+def test_batch_json_columns_spread_with_not_before(client: QStash) -> None:
+    not_before = int(time.time()) + 3600
+    res = client.message.batch_json_columns(
+        bodies=[{"hi": i} for i in range(3)],
+        spread_over=120,
+        defaults=BatchJsonRequest(
+            url="https://mock.httpstatus.io/200", not_before=not_before
+        ),
+    )
+
+    not_befores = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+
+        message = client.message.get(r.message_id)
+        not_befores.append(message.not_before)
+
+        client.message.cancel(r.message_id)
+
+    # The offsets are added to the default not before
+    assert not_befores[0] == not_before * 1000
+    assert not_befores[-1] - not_befores[0] >= 60_000
+
+
+def test_wait_for(client: QStash) -> None:
+    res = client.message.batch_json(
+        [
+            BatchJsonRequest(
+                url="https://mock.httpstatus.io/200", body={"ex_key": "ex_value"}
+            ),
+            BatchJsonRequest(
+                url="https://mock.httpstatus.io/500",
+                body={"ex_key": "ex_value"},
+                retries=0,
+            ),
+        ]
+    )
+
+    ids = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        ids.append(r.message_id)
+
+    logs = client.message.wait_for(ids, timeout=30, poll_interval=1)
+
+    assert logs[ids[0]].state == LogState.DELIVERED
+    assert logs[ids[1]].state == LogState.FAILED
+
+
+def test_publish_many(client: QStash) -> None:
+    res = client.message.publish_many(
+        [
+            BatchRequest(url="https://mock.httpstatus.io/200", body="0", delay=60),
+            BatchRequest(url="invalid-url", body="1"),
+            BatchRequest(url="https://mock.httpstatus.io/200", body="2", delay=60),
+        ],
+        concurrency=2,
+    )
+
+    assert len(res) == 3
+    assert isinstance(res[1], QStashError)
+
+    for i in (0, 2):
+        r = res[i]
+        assert isinstance(r, PublishResponse)
+
+        message = client.message.get(r.message_id)
+        assert message.body == str(i)
+
+        client.message.cancel(r.message_id)
+
+
+def test_enqueue_many(
+    client: QStash,
+    cleanup_queue: Callable[[QStash, str], None],
+) -> None:
+    name = "test_queue"
+    cleanup_queue(client, name)
+
+    res = client.message.enqueue_many(
+        [
+            BatchRequest(url="https://mock.httpstatus.io/200", body="0"),
+            # Delays are not used for the enqueued messages, like in enqueue
+            BatchRequest(url="https://mock.httpstatus.io/200", body="1", delay=600),
+        ],
+        queue=name,
+    )
+
+    assert len(res) == 2
+
+    for r in res:
+        assert isinstance(r, EnqueueResponse)
+        assert_delivered_eventually(client, r.message_id)
+
+
+def test_batch_json_columns(client: QStash) -> None:
+    N = 3
+    res = client.message.batch_json_columns(
+        bodies=[{"hi": i} for i in range(N)],
+        deduplication_ids=[f"batch-columns-{i}" for i in range(N)],
+        delays=[None, 90, "2m"],
+        defaults=BatchJsonRequest(
+            url="https://mock.httpstatus.io/200",
+            retries=0,
+            delay=60,
+        ),
+        chunk_size=2,
+    )
+
+    assert len(res) == N
+
+    for i, message_id in enumerate(res.message_ids):
+        message = client.message.get(message_id)
+        assert message.body == f'{{"hi": {i}}}'
+        assert message.max_retries == 0
+
+        client.message.cancel(message_id)
+
+
+def test_batch_columns_partial_failure(client: QStash) -> None:
+    with pytest.raises(BatchChunkError) as exc_info:
+        client.message.batch_columns(
+            urls=["https://mock.httpstatus.io/200"] * 2 + ["invalid-url"],
+            bodies=[f"hi-{i}" for i in range(3)],
+            defaults=BatchRequest(delay=60),
+            chunk_size=2,
+        )
+
+    # The messages of the chunks accepted before the failure are kept
+    result = exc_info.value.result
+    assert len(result) == 2
+
+    for message_id in result.message_ids:
+        client.message.cancel(message_id)
+
+
+def test_batch_compact(client: QStash) -> None:
+    N = 3
+    res = client.message.batch(
+        [BatchRequest(body=f"hi-{i}") for i in range(N)],
+        defaults=BatchRequest(
+            url="https://mock.httpstatus.io/200",
+            delay=60,
+        ),
+        compact=True,
+    )
+
+    assert len(res) == N
+    assert res.message_count == N
+
+    for i, r in enumerate(res):
+        assert isinstance(r, BatchResponse)
+        assert r.message_id == res.message_id(i)
+        assert not res.is_deduplicated(i)
+
+        client.message.cancel(r.message_id)
+
+
 def test_publish_to_api_llm(client: QStash) -> None:
     res = client.message.publish_json(
         api={"name": "llm", "provider": openai(OPENAI_API_KEY)},
@@ -335,6 +838,100 @@ def test_cancel_many(client: QStash) -> None:
     assert cancelled == 2
 
 
+def test_cancel_many_in_chunks(client: QStash) -> None:
+    res = client.message.batch(
+        [BatchRequest(url="https://mock.httpstatus.io/200", delay=60) for _ in range(3)]
+    )
+
+    message_ids = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        message_ids.append(r.message_id)
+
+    progress: List[Tuple[int, int, int]] = []
+    cancelled = client.message.cancel_many(
+        message_ids,
+        chunk_size=2,
+        concurrency=2,
+        on_progress=lambda processed, total, cancelled: progress.append(
+            (processed, total, cancelled)
+        ),
+    )
+
+    assert cancelled == 3
+    assert len(progress) == 2
+    assert progress[-1] == (3, 3, 3)
+
+
+def test_get_many_with_cache() -> None:
+    client = QStash(token=QSTASH_TOKEN, message_cache=LruCache(ttl=60))
+
+    res = client.message.batch(
+        [BatchRequest(url="https://mock.httpstatus.io/200", delay=60) for _ in range(2)]
+    )
+
+    message_ids = []
+    for r in res:
+        assert isinstance(r, BatchResponse)
+        message_ids.append(r.message_id)
+
+    messages = client.message.get_many(
+        [*message_ids, "invalid-id", message_ids[0]],
+        concurrency=2,
+    )
+
+    assert len(messages) == 4
+    for message_id, message in zip(message_ids, messages):
+        assert isinstance(message, Message)
+        assert message.message_id == message_id
+
+    assert isinstance(messages[2], QStashError)
+    assert messages[3] is messages[0]
+
+    # Cached messages are returned as copies
+    cached = client.message.get(message_ids[1])
+    assert cached == messages[1]
+    assert cached is not messages[1]
+
+    assert client.message.cancel_many(message_ids) == 2
+    with pytest.raises(QStashError):
+        client.message.get(message_ids[0])
+
+    with pytest.raises(QStashError):
+        QStash(token=QSTASH_TOKEN, message_cache=LruCache())
+
+
+def test_cancel_where(client: QStash) -> None:
+    label = "test_cancel_where"
+    client.message.batch(
+        [
+            BatchRequest(url="https://mock.httpstatus.io/200", delay=60, label=label)
+            for _ in range(3)
+        ]
+        + [BatchRequest(url="https://mock.httpstatus.io/200", label=label)]
+    )
+
+    def assertion() -> None:
+        assert client.message.cancel_where({"label": label}, dry_run=True) == 3
+
+    assert_eventually(
+        assertion,
+        initial_delay=1,
+        retry_delay=1,
+        timeout=30.0,
+    )
+
+    cancelled = client.message.cancel_where({"label": label}, chunk_size=2)
+
+    assert cancelled == 3
+
+    with pytest.raises(QStashError):
+        client.message.cancel_where({"label": label}, chunk_size=0)
+
+    with pytest.raises(QStashError):
+        client.message.cancel_where({"label": label, "state": LogState.CREATED})
+
+
 def test_cancel_all(client: QStash) -> None:
     res0 = client.message.publish(
         url="https://mock.httpstatus.io/404",
@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pytest
+
+from qstash import QStash
+from qstash.errors import QStashError
+from qstash.log import LogState
+from qstash.message import BatchJsonRequest
+from qstash.outbox import Outbox
+from tests import assert_eventually
+
+
+def test_outbox(client: QStash, tmp_path: Path) -> None:
+    path = str(tmp_path / "outbox.db")
+
+    outbox = Outbox(client, path, start=False)
+    outbox.publish_json(
+        BatchJsonRequest(
+            url="https://mock.httpstatus.io/200",
+            body={"ex_key": "ex_value"},
+            label="outbox",
+        )
+    )
+
+    assert outbox.pending_count == 1
+    assert outbox.lag >= 0
+    outbox.close()
+
+    # Messages stored before closing are sent by the next outbox
+    with Outbox(client, path) as outbox:
+        assert outbox.flush(timeout=10)
+        assert outbox.pending_count == 0
+        assert outbox.failed_count == 0
+
+    def assertion() -> None:
+        logs = client.log.list(
+            filter={
+                "label": "outbox",
+                "state": LogState.DELIVERED,
+            }
+        ).logs
+
+        assert len(logs) > 0
+
+    assert_eventually(
+        assertion,
+        initial_delay=1.0,
+        retry_delay=1.0,
+        timeout=60.0,
+    )
+
+
+def test_outbox_isolates_rejected_messages(client: QStash, tmp_path: Path) -> None:
+    path = str(tmp_path / "outbox.db")
+
+    with Outbox(client, path, max_attempts=1, start=False) as outbox:
+        outbox.batch_json(
+            [
+                BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"i": 0}),
+                BatchJsonRequest(url="invalid-url", body={"i": 1}),
+                BatchJsonRequest(url="https://mock.httpstatus.io/200", body={"i": 2}),
+            ]
+        )
+
+        # The messages are not sent before the outbox is started
+        with pytest.raises(QStashError):
+            outbox.flush()
+
+        outbox.start()
+        assert outbox.flush(timeout=10)
+
+        # Only the rejected message is failed
+        assert outbox.pending_count == 0
+        assert outbox.failed_count == 1
+
+        assert outbox.requeue_failed() == 1
+        assert outbox.flush(timeout=10)
+        assert outbox.failed_count == 1
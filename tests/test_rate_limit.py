@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+
+from qstash import QStash
+from qstash.message import PublishResponse
+from qstash.rate_limit import FileRateLimiter
+from tests import QSTASH_TOKEN
+
+
+def test_publish_with_rate_limiter(tmp_path: Path) -> None:
+    rate_limiter = FileRateLimiter(str(tmp_path / "rate_limit"))
+    client = QStash(token=QSTASH_TOKEN, rate_limiter=rate_limiter)
+
+    res = client.message.publish_json(
+        url="https://mock.httpstatus.io/200",
+        body={"ex_key": "ex_value"},
+        delay=60,
+    )
+
+    assert isinstance(res, PublishResponse)
+    assert rate_limiter.reserve() == 0
+
+    client.message.cancel(res.message_id)
+    rate_limiter.close()
+
+
+def test_rate_limiter_waits_for_reset(tmp_path: Path) -> None:
+    rate_limiter = FileRateLimiter(str(tmp_path / "rate_limit"))
+
+    rate_limiter.update(
+        429,
+        {
+            "Burst-RateLimit-Limit": "100",
+            "Burst-RateLimit-Remaining": "0",
+            "Burst-RateLimit-Reset": str(int(time.time()) + 60),
+        },
+    )
+
+    assert rate_limiter.reserve() > 0
+    rate_limiter.close()
+
+
+def test_rate_limiter_shares_budget(tmp_path: Path) -> None:
+    path = str(tmp_path / "rate_limit")
+    first = FileRateLimiter(path)
+    second = FileRateLimiter(path)
+
+    first.update(
+        200,
+        {
+            "Burst-RateLimit-Limit": "100",
+            "Burst-RateLimit-Remaining": "2",
+            "Burst-RateLimit-Reset": str(int(time.time()) + 60),
+        },
+    )
+
+    assert first.reserve() == 0
+    assert second.reserve() == 0
+
+    # The budget is drawn by both limiters
+    assert first.reserve() > 0
+    assert second.reserve() > 0
+
+    first.close()
+    second.close()
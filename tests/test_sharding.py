@@ -0,0 +1,97 @@
+from typing import Callable
+
+import pytest
+
+from qstash import QStash
+from qstash.errors import QStashError
+from qstash.message import (
+    BatchRequest,
+    BatchResponse,
+    EnqueueResponse,
+    PublishResponse,
+)
+from qstash.sharding import ShardedQStash, ShardRouter
+from tests import QSTASH_TOKEN
+
+
+def test_sharded_publish() -> None:
+    clients = [QStash(token=QSTASH_TOKEN), QStash(token=QSTASH_TOKEN)]
+    sharded = ShardedQStash(clients, weights=[1, 2])
+
+    for i in range(3):
+        res = sharded.publish(
+            url="https://mock.httpstatus.io/200", body=str(i), delay=60
+        )
+
+        assert isinstance(res, PublishResponse)
+        clients[0].message.cancel(res.message_id)
+
+    assert [stats.message_count for stats in sharded.stats] == [1, 2]
+
+    batch_res = sharded.batch(
+        [
+            BatchRequest(url="https://mock.httpstatus.io/200", body="a", delay=60),
+            BatchRequest(url="https://mock.httpstatus.io/200", body="b", delay=60),
+        ],
+        key="key",
+    )
+
+    assert len(batch_res) == 2
+    for r in batch_res:
+        assert isinstance(r, BatchResponse)
+        clients[0].message.cancel(r.message_id)
+
+    assert sum(stats.message_count for stats in sharded.stats) == 5
+
+
+def test_sharded_enqueue(cleanup_queue: Callable[[QStash, str], None]) -> None:
+    clients = [QStash(token=QSTASH_TOKEN), QStash(token=QSTASH_TOKEN)]
+    sharded = ShardedQStash(clients)
+
+    name = "test_sharded_queue"
+    cleanup_queue(clients[0], name)
+
+    for i in range(4):
+        res = sharded.enqueue_json(
+            queue=name,
+            url="https://mock.httpstatus.io/200",
+            body={"hi": i},
+        )
+
+        assert isinstance(res, EnqueueResponse)
+
+    # Messages of a queue are not split across the shards
+    assert sorted(stats.message_count for stats in sharded.stats) == [0, 4]
+
+    with pytest.raises(QStashError):
+        sharded.batch(
+            [
+                BatchRequest(url="https://mock.httpstatus.io/200", queue="a"),
+                BatchRequest(url="https://mock.httpstatus.io/200", queue="b"),
+            ]
+        )
+
+
+def test_shard_router() -> None:
+    router = ShardRouter([1, 1, 1])
+
+    # Same keys go to the same shard
+    assert router.order("key") == router.order("key")
+    first = router.order("key")[0]
+
+    # Shards that report limit exhaustion are skipped
+    router.stats[first].exhausted_until = float("inf")
+    assert first not in router.order("key")
+    assert first not in router.order()
+
+    # Pinned keys are not sent to the other shards
+    assert router.order("key", pinned=True) == [first]
+
+    snapshot = router.snapshot()
+    snapshot[first].exhausted_until = 0.0
+    assert router.stats[first].exhausted_until == float("inf")
+
+    for stats in router.stats:
+        stats.exhausted_until = float("inf")
+
+    assert len(router.order()) == 1
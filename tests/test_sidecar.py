@@ -0,0 +1,82 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from qstash import QStash
+from qstash.message import BatchJsonRequest
+from qstash.errors import QStashError
+from qstash.sidecar import SidecarPublisher, SidecarServer, dead_letter_writer
+
+
+def test_sidecar(client: QStash, tmp_path: Path) -> None:
+    path = str(tmp_path / "qstash.sock")
+
+    with SidecarServer(client, path, linger=0.1) as server:
+        publisher = SidecarPublisher(path)
+        for i in range(3):
+            publisher.publish_json(
+                BatchJsonRequest(
+                    url="https://mock.httpstatus.io/200",
+                    body={"hi": i},
+                    delay=60,
+                )
+            )
+
+        publisher.close()
+
+        deadline = time.time() + 10
+        while server.sent_count < 3 and time.time() < deadline:
+            time.sleep(0.1)
+
+    assert server.sent_count == 3
+    assert server.failed_count == 0
+    assert server.request_count == 1
+
+
+def test_sidecar_isolates_rejected_messages(client: QStash, tmp_path: Path) -> None:
+    path = str(tmp_path / "qstash.sock")
+    errors: List[Dict[str, Any]] = []
+
+    with SidecarServer(
+        client,
+        path,
+        linger=0.1,
+        on_error=lambda e, messages: errors.extend(messages),
+    ) as server:
+        publisher = SidecarPublisher(path)
+        publisher.batch_json(
+            [
+                BatchJsonRequest(
+                    url="https://mock.httpstatus.io/200", body={"hi": 0}, delay=60
+                ),
+                BatchJsonRequest(url="invalid-url", body={"hi": 1}),
+                BatchJsonRequest(
+                    url="https://mock.httpstatus.io/200", body={"hi": 2}, delay=60
+                ),
+            ]
+        )
+
+        publisher.close()
+
+        deadline = time.time() + 10
+        while server.sent_count + server.failed_count < 3 and time.time() < deadline:
+            time.sleep(0.1)
+
+    assert server.sent_count == 2
+    assert server.failed_count == 1
+    assert [message["destination"] for message in errors] == ["invalid-url"]
+
+
+def test_sidecar_dead_letter(tmp_path: Path) -> None:
+    path = tmp_path / "dead-letter.jsonl"
+    on_error = dead_letter_writer(str(path))
+
+    on_error(QStashError("rejected"), [{"destination": "invalid-url"}])
+    on_error(QStashError("rejected"), [{"frame": "{"}])
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"destination": "invalid-url"},
+        {"frame": "{"},
+    ]